@@ -0,0 +1,82 @@
+"""Горячие запросы лент до и после архивации старых записей.
+
+Создаёт во временной базе записи, из которых все, кроме свежих,
+старше года, и замеряет запросы главной страницы (подсчёт записей
+и первая страница ленты) до и после manage.py archive_posts.
+
+    python benchmarks/archive_posts.py --posts 50000 --fresh 2000
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.paginator import Paginator  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils.timezone import now  # noqa: E402
+from posts.archive import archive_posts, hot_posts  # noqa: E402
+from posts.models import Post, User  # noqa: E402
+from posts.views import POSTS_PER_PAGE  # noqa: E402
+
+
+def populate(total, fresh, text_size):
+    author = User.objects.create_user(username='bench_author')
+    text = 'x' * text_size
+    Post.objects.bulk_create(
+        Post(author=author, text=text) for _ in range(total))
+    old = Post.objects.order_by('pk').values_list(
+        'pk', flat=True)[total - fresh - 1]
+    Post.objects.filter(pk__lte=old).update(
+        pub_date=now() - timedelta(days=400))
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def index_page():
+    paginator = Paginator(hot_posts().select_related('author', 'group'),
+                          POSTS_PER_PAGE)
+    list(paginator.get_page(1))
+
+
+def text_bytes():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT SUM(LENGTH(text)) FROM posts_post')
+        return cursor.fetchone()[0] or 0
+
+
+def measure(label, repeat):
+    best = min(timeit.repeat(index_page, number=repeat, repeat=5)) / repeat
+    print(f'{label:>8}: {best * 1000:8.3f} мс на страницу, '
+          f'текста в posts_post {text_bytes() / 2 ** 20:8.1f} МБ')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=50000)
+    parser.add_argument('--fresh', type=int, default=2000)
+    parser.add_argument('--text-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        populate(args.posts, args.fresh, args.text_size)
+        measure('до', args.repeat)
+        archived = archive_posts(now() - timedelta(days=365))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        measure('после', args.repeat)
+        print(f'В архиве {archived} из {args.posts} записей')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Кеш лент в нескольких процессах: LocMem, файлы и разделяемая память.
+
+Несколько процессов, как рабочие gunicorn, отдают RSS-ленты: ключ
+ленты выбирается по закону Ципфа (популярные ленты запрашивают
+чаще), при промахе лента рендерится feedgenerator'ом и кладётся
+в кеш. Для каждого бэкенда выводятся запросы в секунду по всем
+процессам и доля попаданий.
+
+    python benchmarks/cache_backends.py --workers 4 --requests 5000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache.backends.filebased import FileBasedCache  # noqa: E402
+from django.core.cache.backends.locmem import LocMemCache  # noqa: E402
+from django.utils.feedgenerator import Rss201rev2Feed  # noqa: E402
+
+from core.shmcache import SharedMemoryCache  # noqa: E402
+from posts.feeds import FEED_ITEMS  # noqa: E402
+
+
+def render_feed(name):
+    feed = Rss201rev2Feed(title=f'Лента {name}', link='/',
+                          description='Последние обновления на сайте')
+    for number in range(FEED_ITEMS):
+        feed.add_item(
+            title=f'Запись {number}', link=f'/posts/{number}/',
+            description='<p>' + 'Текст записи. ' * 40 + '</p>',
+            pubdate=datetime(2020, 1, 1), author_name='author')
+    return feed.writeString('utf-8')
+
+
+def backends(directory):
+    return {
+        'LocMemCache': lambda: LocMemCache('feeds', {}),
+        'FileBasedCache': lambda: FileBasedCache(
+            os.path.join(directory, 'files'),
+            {'OPTIONS': {'MAX_ENTRIES': 100000}}),
+        'SharedMemoryCache': lambda: SharedMemoryCache(
+            os.path.join(directory, 'shm'),
+            {'OPTIONS': {'SLOTS': 4096, 'SLOT_SIZE': 32 * 1024}}),
+    }
+
+
+def serve(make_cache, keys, weights, requests, seed, results):
+    cache = make_cache()
+    chooser = random.Random(seed)
+    hits = 0
+    for name in chooser.choices(keys, weights, k=requests):
+        if cache.get(name) is None:
+            cache.set(name, render_feed(name), 600)
+        else:
+            hits += 1
+    results.put(hits)
+
+
+def measure(make_cache, args):
+    context = multiprocessing.get_context('fork')
+    keys = [f'feed:{number}' for number in range(args.feeds)]
+    weights = [1 / rank ** args.zipf for rank in range(1, args.feeds + 1)]
+    results = context.Queue()
+    processes = [
+        context.Process(target=serve, args=(
+            make_cache, keys, weights, args.requests, seed, results))
+        for seed in range(args.workers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    hits = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    total = args.workers * args.requests
+    return total / elapsed, hits / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=5000,
+                        help='Запросов на процесс.')
+    parser.add_argument('--feeds', type=int, default=1000,
+                        help='Число разных лент.')
+    parser.add_argument('--zipf', type=float, default=1.1)
+    args = parser.parse_args()
+    print(f'Размер ленты: {len(render_feed("x")) / 1024:.1f} КБ, '
+          f'процессов: {args.workers}')
+    directory = tempfile.mkdtemp()
+    try:
+        for label, make_cache in backends(directory).items():
+            rate, hit_rate = measure(make_cache, args)
+            print(f'{label:>18}: {rate:10.0f} запросов/с, '
+                  f'попаданий {hit_rate:6.1%}')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
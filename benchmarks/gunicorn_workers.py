@@ -0,0 +1,122 @@
+"""Время импорта приложения и память рабочих процессов gunicorn.
+
+Запускает gunicorn с конфигурацией yatube/gunicorn.conf.py с preload
+и без него, ждёт, пока /ready/ ответит 200, и выводит для каждого
+рабочего процесса RSS, PSS (доля общих страниц) и приватную память
+из /proc/<pid>/smaps_rollup. Только для Linux.
+
+    python benchmarks/gunicorn_workers.py --workers 4
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+PROJECT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                       'yatube')
+IMPORT_SNIPPET = (
+    'import os, time\n'
+    'os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")\n'
+    'started = time.perf_counter()\n'
+    'import yatube.wsgi\n'
+    'print(time.perf_counter() - started)\n'
+)
+
+
+def import_time(repeat):
+    times = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', IMPORT_SNIPPET], cwd=PROJECT)
+        times.append(float(output))
+    return min(times)
+
+
+def children(pid):
+    found = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as stat:
+                # Имя процесса в скобках может содержать пробелы
+                fields = stat.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            found.append(int(name))
+    return sorted(found)
+
+
+def memory(pid):
+    """RSS, PSS и приватная память процесса в МБ."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    private = values['Private_Clean'] + values['Private_Dirty']
+    return values['Rss'], values['Pss'], private
+
+
+def wait_ready(url, workers, timeout):
+    """Ждёт, пока /ready/ ответит 200 несколько раз подряд."""
+    deadline = time.monotonic() + timeout
+    answered = 0
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                answered += 1
+        except (urllib.error.URLError, ConnectionError):
+            answered = 0
+            time.sleep(0.1)
+        if answered >= workers * 3:
+            return True
+    return False
+
+
+def measure(workers, preload, port):
+    env = dict(os.environ, GUNICORN_WORKERS=str(workers),
+               GUNICORN_BIND=f'127.0.0.1:{port}',
+               GUNICORN_PRELOAD='1' if preload else '0')
+    started = time.monotonic()
+    master = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'yatube.wsgi'], cwd=PROJECT,
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_ready(f'http://127.0.0.1:{port}/ready/', workers, 60):
+            print('gunicorn не ответил готовностью за 60 с')
+            return
+        ready = time.monotonic() - started
+        label = 'с preload' if preload else 'без preload'
+        print(f'\n{label}: готов через {ready:.2f} с')
+        print(f'{"pid":>8} {"RSS, МБ":>9} {"PSS, МБ":>9} {"своя, МБ":>9}')
+        total = 0
+        for pid in children(master.pid):
+            rss, pss, private = memory(pid)
+            total += pss
+            print(f'{pid:>8} {rss:9.1f} {pss:9.1f} {private:9.1f}')
+        print(f'{"PSS всех рабочих":>28}: {total:.1f} МБ')
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(f'Импорт yatube.wsgi: {import_time(args.repeat) * 1000:.0f} мс')
+    for preload in (False, True):
+        measure(args.workers, preload, args.port)
+
+
+if __name__ == '__main__':
+    main()
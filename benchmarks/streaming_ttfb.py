@@ -0,0 +1,93 @@
+"""Время до первого байта лент с потоковой отдачей и без неё.
+
+Создаёт временную базу с записями и запрашивает главную страницу,
+страницу группы и профиль через WSGI-обработчик Django в этом же
+процессе: TTFB — время до первой части ответа, «всего» — до последней.
+Кеш страниц отключён, чтобы каждая страница рендерилась заново.
+
+    python benchmarks/streaming_ttfb.py --posts 2000 --per-page 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.handlers.wsgi import WSGIHandler  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from posts import views  # noqa: E402
+from posts.models import Group, Post, User  # noqa: E402
+
+NO_PAGE_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'pages': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    'ratelimit': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    'metrics': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+def populate(total):
+    author = User.objects.create_user(username='bench_author')
+    group = Group.objects.create(title='Группа', slug='bench')
+    for number in range(total):
+        Post.objects.create(author=author, group=group,
+                            text=f'Запись **{number}** ' * 20)
+
+
+def request(handler, path):
+    """(TTFB, полное время) одного запроса в секундах."""
+    environ = {'PATH_INFO': path}
+    setup_testing_defaults(environ)
+    started = time.perf_counter()
+    chunks = iter(handler(environ, lambda status, headers: None))
+    next(chunks, b'')
+    first = time.perf_counter() - started
+    for _ in chunks:
+        pass
+    return first, time.perf_counter() - started
+
+
+def measure(handler, path, repeat):
+    results = [request(handler, path) for _ in range(repeat)]
+    return (statistics.median(first for first, _ in results),
+            statistics.median(total for _, total in results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--per-page', type=int, default=views.POSTS_PER_PAGE)
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+    views.POSTS_PER_PAGE = args.per_page
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        populate(args.posts)
+        handler = WSGIHandler()
+        paths = ('/', '/group/bench/', '/profile/bench_author/')
+        print(f'{"страница":>24} {"режим":>8} {"TTFB, мс":>9} '
+              f'{"всего, мс":>10}')
+        for path in paths:
+            for streaming in (False, True):
+                with override_settings(CACHES=NO_PAGE_CACHE,
+                                       STREAMING_PAGES=streaming):
+                    request(handler, path)
+                    first, total = measure(handler, path, args.repeat)
+                mode = 'поток' if streaming else 'render'
+                print(f'{path:>24} {mode:>8} {first * 1000:9.2f} '
+                      f'{total * 1000:10.2f}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,14 @@
 from django.urls import path
 
+from core.shell import cache_page_shell
+
 from . import views
 
 app_name = 'about'
 
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech'),
+    path('author/', cache_page_shell(views.AboutAuthorView.as_view()),
+         name='author'),
+    path('tech/', cache_page_shell(views.AboutTechView.as_view()),
+         name='tech'),
 ]
@@ -0,0 +1,218 @@
+"""Шина инвалидации кешей между процессами и машинами.
+
+Кеши внутри процесса (и LocMem) ничего не знают о записях, сделанных
+другими процессами. Поэтому сигналы записи моделей публикуют события
+в общий журнал изменений, а каждый процесс читает журнал с последней
+применённой версии и вызывает подписчиков темы::
+
+    @bus.subscribe('group')
+    def forget_group(key, data):
+        _groups.pop(key, None)
+
+Журнал читается из InvalidationBusMiddleware не чаще раза в
+INVALIDATION_BUS_POLL_INTERVAL секунд, перед обработкой запроса: ни
+один запрос не видит кеш, отстающий от журнала дольше интервала.
+
+Журнал по умолчанию — таблица InvalidationEvent в основной базе,
+другой можно подключить настройкой INVALIDATION_BUS_BACKEND. Процесс
+после старта начинает с конца журнала: его кеши пусты, догонять нечего.
+Если процесс отстал так, что нужную ему часть журнала уже удалили
+(manage.py prune_invalidation_log), подписчики on_reset сбрасывают
+кеши целиком.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Сколько событий читать за один опрос
+BATCH_SIZE = 500
+
+_backend = None
+_handlers = defaultdict(list)
+_reset_handlers = []
+_lock = threading.Lock()
+_last_seen = None
+_polled_at = 0
+# С какого момента в журнале видна дыра перед прочитанными событиями
+_gap_since = None
+_source = None
+_source_pid = None
+
+
+Event = namedtuple('Event', 'pk topic key data source')
+
+
+class DatabaseChangeLog:
+    """Журнал в таблице InvalidationEvent."""
+
+    def _events(self):
+        from .models import InvalidationEvent
+        return InvalidationEvent.objects
+
+    def append(self, topic, key, data, source):
+        return self._events().create(topic=topic, key=key, data=data,
+                                     source=source).pk
+
+    def read_after(self, version, limit):
+        rows = (self._events().filter(pk__gt=version).order_by('pk')
+                .values_list('pk', 'topic', 'key', 'data', 'source')
+                [:limit])
+        return [Event(*row) for row in rows]
+
+    def last_version(self):
+        return self._events().order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def first_version(self):
+        return self._events().order_by('pk').values_list(
+            'pk', flat=True).first()
+
+    def prune(self, before):
+        # Последнее событие остаётся: по нему новый процесс узнаёт,
+        # с какой версии читать
+        deleted, _ = self._events().filter(created__lt=before).exclude(
+            pk=self.last_version()).delete()
+        return deleted
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.INVALIDATION_BUS_BACKEND)()
+    return _backend
+
+
+def source():
+    """Имя текущего процесса; после fork у потомка оно своё."""
+    global _source, _source_pid
+    if _source_pid != os.getpid():
+        _source_pid = os.getpid()
+        _source = (f'{socket.gethostname()}:{_source_pid}:'
+                   f'{uuid.uuid4().hex[:8]}')
+    return _source
+
+
+def subscribe(*topics):
+    """Подписывает handler(key, data) на события тем."""
+    def decorator(handler):
+        for topic in topics:
+            _handlers[topic].append(handler)
+        return handler
+    return decorator
+
+
+def on_reset(handler):
+    """handler() сбрасывает кеш целиком, когда журнал потерян."""
+    _reset_handlers.append(handler)
+    return handler
+
+
+def publish(topic, key='', **data):
+    """Публикует событие после коммита текущей транзакции.
+
+    Свой процесс событие не получает: писавший код сбрасывает
+    свои кеши сам.
+    """
+    transaction.on_commit(partial(
+        get_backend().append, topic, str(key),
+        json.dumps(data, sort_keys=True), source()))
+
+
+def _call(handler, *args):
+    try:
+        handler(*args)
+    except Exception:
+        logger.exception('Подписчик шины %r упал', handler)
+
+
+def _dispatch(event):
+    data = json.loads(event.data) if event.data else {}
+    for handler in _handlers.get(event.topic, ()):
+        _call(handler, event.key, data)
+
+
+def _reset():
+    for handler in _reset_handlers:
+        _call(handler)
+
+
+def poll():
+    """Применяет новые события журнала, возвращает их число."""
+    global _last_seen, _gap_since
+    with _lock:
+        log = get_backend()
+        if _last_seen is None:
+            _last_seen = log.last_version()
+            return 0
+        events = log.read_after(_last_seen, BATCH_SIZE)
+        if not events:
+            _gap_since = None
+            return 0
+        first = log.first_version() if events[0].pk > _last_seen + 1 else 0
+        if first and first > _last_seen + 1:
+            # Нужные нам события удалены: догнать нельзя
+            logger.warning('Журнал инвалидации потерян после версии %s',
+                           _last_seen)
+            _reset()
+            _last_seen = events[-1].pk
+            _gap_since = None
+            return len(events)
+        for event in events:
+            if event.source != source():
+                _dispatch(event)
+        _last_seen = _advance(_last_seen, events)
+        return len(events)
+
+
+def _advance(version, events):
+    """Версия, до которой журнал прочитан без дыр.
+
+    Версии выдаются при вставке, а видны после коммита: событие
+    с меньшей версией может появиться позже большей. Перед дырой
+    останавливаемся и перечитываем хвост, пока она не заполнится
+    или не выйдет INVALIDATION_BUS_GAP_TIMEOUT (откат транзакции).
+    """
+    global _gap_since
+    for event in events:
+        if event.pk != version + 1:
+            break
+        version = event.pk
+    if version == events[-1].pk:
+        _gap_since = None
+    elif _gap_since is None:
+        _gap_since = time.monotonic()
+    elif (time.monotonic() - _gap_since
+          > settings.INVALIDATION_BUS_GAP_TIMEOUT):
+        _gap_since = None
+        return events[-1].pk
+    return version
+
+
+def poll_if_due():
+    """Опрашивает журнал, если с прошлого опроса прошёл интервал."""
+    global _polled_at
+    interval = settings.INVALIDATION_BUS_POLL_INTERVAL
+    if interval is None:
+        return 0
+    now = time.monotonic()
+    if now - _polled_at < interval:
+        return 0
+    _polled_at = now
+    return poll()
+
+
+def version():
+    """Версия последнего применённого события."""
+    return _last_seen
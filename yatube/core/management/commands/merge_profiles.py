@@ -0,0 +1,44 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = ('Складывает профили запросов по view в свёрнутые стеки '
+            'для flamegraph.pl и speedscope.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir', default=settings.PROFILING_DIR,
+            help='Каталог профилей (по умолчанию PROFILING_DIR).')
+        parser.add_argument(
+            '--output', default='.',
+            help='Куда писать файлы <view>.collapsed.')
+        parser.add_argument(
+            '--view', action='append', dest='views',
+            help='Только эта view; можно указать несколько раз.')
+
+    def handle(self, *args, **options):
+        if not options['dir'] or not os.path.isdir(options['dir']):
+            raise CommandError('Нет каталога профилей, укажите --dir.')
+        merged = profiling.merge(profiling.load(options['dir']),
+                                 options['views'])
+        os.makedirs(options['output'], exist_ok=True)
+        for view, profile in sorted(merged.items()):
+            path = os.path.join(options['output'],
+                                f'{view.replace(":", ".")}.collapsed')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.writelines(f'{line}\n' for line in profile.collapsed())
+            durations = sorted(profile.durations)
+            self.stdout.write(
+                f'{view}: запросов {profile.requests}, '
+                f'медиана {durations[len(durations) // 2]:.1f} мс, '
+                f'максимум {durations[-1]:.1f} мс, '
+                f'SQL {profile.sql_count / profile.requests:.1f} '
+                f'запросов и {profile.sql_ms / profile.requests:.1f} мс '
+                f'на запрос -> {path}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Сведено view: {len(merged)}'))
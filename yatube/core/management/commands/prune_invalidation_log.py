@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from core.bus import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Удаляет старые события из журнала шины инвалидации.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=24,
+            help='Хранить события за столько последних часов.')
+
+    def handle(self, *args, **options):
+        before = now() - timedelta(hours=options['hours'])
+        deleted = get_backend().prune(before)
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено событий: {deleted}'))
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replay
+
+COLUMNS = ('requests', 'rps', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms',
+           'errors')
+
+
+class Command(BaseCommand):
+    help = ('Воспроизводит журнал доступа (common/combined) против '
+            'yatube.wsgi и сводит задержки по шаблонам адресов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help='Файл журнала доступа.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Сколько запросов выполнять одновременно.')
+        parser.add_argument(
+            '--mode', choices=('thread', 'process'), default='thread',
+            help='Исполнители — потоки или процессы (fork).')
+        parser.add_argument(
+            '--speed', type=float, default=0.0,
+            help='Во сколько раз сжать время журнала; 0 — без пауз.')
+        parser.add_argument(
+            '--limit', type=int,
+            help='Воспроизвести не больше стольких запросов.')
+        parser.add_argument(
+            '--methods', default='GET,HEAD',
+            help='Какие методы воспроизводить, через запятую.')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument(
+            '--accept-encoding', default='br, gzip',
+            help='Accept-Encoding запросов; пустая строка — без сжатия.')
+        parser.add_argument(
+            '--client-ips', action='store_true',
+            help='Брать REMOTE_ADDR из журнала (лимиты по адресам).')
+        parser.add_argument(
+            '--save', help='Сохранить сводку в JSON для сравнения.')
+        parser.add_argument(
+            '--compare', help='Сводка прошлого прогона для сравнения.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.1,
+            help='Доля ухудшения, которая считается регрессией.')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers должен быть не меньше 1.')
+        with open(options['log'], encoding='utf-8',
+                  errors='replace') as file:
+            entries, skipped = replay.read_log(
+                file, options['methods'].upper().split(','),
+                options['limit'])
+        if not entries:
+            raise CommandError('В журнале нет запросов для воспроизведения.')
+        results, duration = replay.replay(
+            entries, workers=options['workers'], mode=options['mode'],
+            speed=options['speed'], host=options['host'],
+            accept_encoding=options['accept_encoding'],
+            client_ips=options['client_ips'])
+        summary = replay.summarize(results, duration)
+        self.report(summary, len(results), skipped, duration)
+        if options['save']:
+            replay.save(summary, options['save'])
+        if options['compare']:
+            regressions = replay.compare(replay.load(options['compare']),
+                                         summary, options['threshold'])
+            for pattern, metric, before, after in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f'{pattern}: {metric} {before:.1f} -> {after:.1f}'))
+            if regressions:
+                raise CommandError(f'Регрессий: {len(regressions)}')
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def report(self, summary, total, skipped, duration):
+        self.stdout.write(f'{"шаблон":<28}' + ''.join(
+            f'{column:>10}' for column in COLUMNS))
+        for pattern, row in sorted(summary.items(),
+                                   key=lambda item: -item[1]['requests']):
+            self.stdout.write(f'{pattern:<28}' + ''.join(
+                f'{row[column]:>10.1f}' if isinstance(row[column], float)
+                else f'{row[column]:>10}' for column in COLUMNS))
+        mismatches = sum(row['status_mismatches']
+                         for row in summary.values())
+        self.stdout.write(
+            f'Запросов {total} за {duration:.2f} с '
+            f'({total / duration:.1f} в секунду), пропущено строк '
+            f'{skipped}, статус не как в журнале: {mismatches}')
@@ -0,0 +1,189 @@
+"""Счётчики работы сервера, общие для всех его процессов.
+
+Счётчик объявляется один раз на уровне модуля и увеличивается
+из любого процесса::
+
+    compressed = metrics.counter(
+        'compression_responses_total', 'Сжатые ответы', encoding='gzip')
+    compressed.inc()
+
+Значения лежат в кеше METRICS_CACHE (в бою — в разделяемой памяти),
+поэтому /metrics/ отдаёт сумму по всем рабочим процессам машины,
+какой бы из них ни ответил. Формат ответа — текстовый формат
+Prometheus; отношения (например, степень сжатия) считаются
+при построении графиков из пар счётчиков. Описания серий тоже лежат
+в кеше: процесс, которому достался /metrics/, отдаёт и серии, которые
+завёл только другой процесс.
+
+Гистограмма — набор счётчиков по корзинам (le — верхняя граница),
+сумма и число наблюдений; значения целые, как у счётчиков::
+
+    peak = metrics.histogram('request_memory_peak_bytes', 'Пик памяти',
+                             MEMORY_BUCKETS, view='posts:index')
+    peak.observe(2 ** 20)
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+_registry = {}
+
+# Общий реестр серий в кеше: число серий, серии по номерам
+# и описания метрик по именам
+SHARED_COUNT_KEY = 'metrics-registry:count'
+
+
+def _series_key(number):
+    return f'metrics-registry:series:{number}'
+
+
+def _metric_key(name):
+    return f'metrics-registry:metric:{name}'
+
+
+def _cache():
+    return caches[settings.METRICS_CACHE]
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    pairs = ','.join(f'{label}="{value}"'
+                     for label, value in sorted(labels.items()))
+    return f'{name}{{{pairs}}}'
+
+
+def _increment(key, amount):
+    cache = _cache()
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, None):
+            cache.incr(key, amount)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.series = _series(name, labels)
+        self.key = f'metrics:{self.series}'
+
+    def inc(self, amount=1):
+        _increment(self.key, amount)
+
+    def value(self):
+        return _cache().get(self.key, 0)
+
+    def samples(self):
+        """Пары (строка серии, ключ кеша) для render()."""
+        return [(self.series, self.key)]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = sorted(buckets)
+        self.labels = labels
+        self.series = _series(name, labels)
+        bounds = [*(str(bound) for bound in self.buckets), '+Inf']
+        self.bucket_series = [
+            _series(f'{name}_bucket', {**labels, 'le': bound})
+            for bound in bounds]
+        self.sum_series = _series(f'{name}_sum', labels)
+        self.count_series = _series(f'{name}_count', labels)
+
+    def observe(self, value):
+        value = int(value)
+        for bound, series in zip(self.buckets, self.bucket_series):
+            if value <= bound:
+                _increment(f'metrics:{series}', 1)
+        _increment(f'metrics:{self.bucket_series[-1]}', 1)
+        _increment(f'metrics:{self.sum_series}', value)
+        _increment(f'metrics:{self.count_series}', 1)
+
+    def samples(self):
+        return [(series, f'metrics:{series}') for series in
+                (*self.bucket_series, self.sum_series, self.count_series)]
+
+
+def _share(item):
+    """Кладёт новую серию в общий реестр кеша, один раз на все
+    процессы. Описание метрики и метки серий лежат отдельно: в слот
+    общего кеша помещается немного.
+    """
+    cache = _cache()
+    cache.add(_metric_key(item.name),
+              (item.help_text, getattr(item, 'buckets', None)), None)
+    if not cache.add(f'metrics-registry:defined:{item.series}', True, None):
+        return
+    try:
+        number = cache.incr(SHARED_COUNT_KEY)
+    except ValueError:
+        number = (1 if cache.add(SHARED_COUNT_KEY, 1, None)
+                  else cache.incr(SHARED_COUNT_KEY))
+    cache.set(_series_key(number), (item.name, item.labels), None)
+
+
+def _register(created):
+    item = _registry.setdefault(created.series, created)
+    if item is created:
+        _share(item)
+    return item
+
+
+def counter(name, help_text, **labels):
+    """Счётчик name с метками labels; повторный вызов вернёт тот же."""
+    return _register(Counter(name, help_text, labels))
+
+
+def histogram(name, help_text, buckets, **labels):
+    """Гистограмма name с границами корзин buckets и метками labels."""
+    return _register(Histogram(name, help_text, buckets, labels))
+
+
+def _shared_items():
+    """Серии из общего реестра, в том числе заведённые другими
+    процессами.
+    """
+    cache = _cache()
+    count = cache.get(SHARED_COUNT_KEY, 0)
+    series = cache.get_many(
+        [_series_key(number) for number in range(1, count + 1)])
+    described = cache.get_many(
+        {_metric_key(name) for name, _ in series.values()})
+    items = {}
+    for name, labels in series.values():
+        description = described.get(_metric_key(name))
+        if description is None:
+            continue
+        help_text, buckets = description
+        if buckets is None:
+            item = Counter(name, help_text, labels)
+        else:
+            item = Histogram(name, help_text, buckets, labels)
+        items[item.series] = item
+    return items
+
+
+def render():
+    """Все счётчики и гистограммы в текстовом формате Prometheus."""
+    items = sorted({**_shared_items(), **_registry}.values(),
+                   key=lambda item: item.series)
+    samples = [sample for item in items for sample in item.samples()]
+    values = _cache().get_many([key for _, key in samples])
+    lines = []
+    described = set()
+    for item in items:
+        if item.name not in described:
+            described.add(item.name)
+            lines.append(f'# HELP {item.name} {item.help_text}')
+            lines.append(f'# TYPE {item.name} {item.kind}')
+        for series, key in item.samples():
+            lines.append(f'{series} {values.get(key, 0)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,119 @@
+"""Контроль допуска: не больше N одновременных запросов к одной view.
+
+Когда медленная view (вход с проверкой пароля, тяжёлая лента) забирает
+все процессы сервера, страдают остальные страницы. Здесь у каждой view
+свой счётчик запросов в работе; запрос сверх лимита сразу получает 503
+с Retry-After, а не встаёт в очередь к перегруженной view.
+
+Счётчики лежат в кеше ADMISSION_CACHE и общие для всех процессов, если
+кеш общий: с синхронными процессами gunicorn каждый ведёт один запрос,
+и лимит на процесс никогда бы не сработал. Запрос, отданный потоком,
+занимает место, пока тело не отдано клиенту. Счётчик живёт
+ADMISSION_COUNTER_TTL секунд с первого запроса: место, которое не
+освободил убитый процесс, не занято навсегда. Запрос, начатый
+до истечения счётчика, уходит из нового счётчика не ниже нуля.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+def view_path(func):
+    """Путь класса view или функции, по которому задаются лимиты."""
+    view = getattr(func, 'view_class', func)
+    return f'{view.__module__}.{view.__qualname__}'
+
+
+class ReleasingContent:
+    """Тело потокового ответа, освобождающее место при закрытии.
+
+    Сервер WSGI закрывает ответ и тогда, когда клиент ушёл, не дочитав.
+    """
+
+    def __init__(self, content, release):
+        self.content = content
+        self.release = release
+
+    def __iter__(self):
+        yield from self.content
+
+    def close(self):
+        release, self.release = self.release, None
+        if release is not None:
+            release()
+
+
+class AdmissionControlMiddleware:
+    """Отвечает 503, если у view уже максимум запросов в работе.
+
+    Лимит проверяется в process_view по view, которую уже нашёл
+    обработчик Django: адрес не разбирается второй раз. Ставится
+    первым, чтобы отказ не стоил ни view, ни process_view остальных
+    middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def limit_for(self, path):
+        return settings.ADMISSION_VIEW_LIMITS.get(
+            path, settings.ADMISSION_MAX_IN_FLIGHT)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        path = view_path(view_func)
+        limit = self.limit_for(path)
+        if limit is None:
+            return None
+        cache = caches[settings.ADMISSION_CACHE]
+        key = f'admission:{path}'
+        cache.add(key, 0, settings.ADMISSION_COUNTER_TTL)
+        if self.enter(cache, key) > limit:
+            self.leave(cache, key)
+            return self.overloaded()
+        request.admission_key = key
+        return None
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self.release(request)
+            raise
+        if response.streaming:
+            response.streaming_content = ReleasingContent(
+                response.streaming_content,
+                lambda: self.release(request))
+        else:
+            self.release(request)
+        return response
+
+    def release(self, request):
+        key = getattr(request, 'admission_key', None)
+        if key is not None:
+            del request.admission_key
+            self.leave(caches[settings.ADMISSION_CACHE], key)
+
+    def enter(self, cache, key):
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Счётчик истёк между add и incr
+            cache.add(key, 1, settings.ADMISSION_COUNTER_TTL)
+            return 1
+
+    def leave(self, cache, key):
+        try:
+            if cache.decr(key) < 0:
+                # Счётчик истёк и начат заново, пока шёл запрос: этого
+                # запроса в нём нет, и уходить из него нечего
+                cache.incr(key)
+        except ValueError:
+            # Счётчик истёк, пока шёл запрос: освобождать нечего
+            pass
+
+    def overloaded(self):
+        response = HttpResponse('Сервер перегружен, попробуйте позже.',
+                                content_type='text/plain; charset=utf-8',
+                                status=503)
+        response['Retry-After'] = settings.ADMISSION_RETRY_AFTER
+        return response
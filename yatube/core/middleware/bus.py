@@ -0,0 +1,12 @@
+from core import bus
+
+
+class InvalidationBusMiddleware:
+    """Применяет события шины инвалидации перед обработкой запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        bus.poll_if_due()
+        return self.get_response(request)
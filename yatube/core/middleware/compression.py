@@ -0,0 +1,242 @@
+"""Сжатие ответов brotli или gzip по Accept-Encoding клиента.
+
+Лента — это много одинаковой разметки карточек, она сжимается
+в разы. Алгоритм выбирается по весам q из Accept-Encoding, при равных
+весах brotli предпочтительнее (если пакет brotli установлен).
+
+Не сжимаются маленькие ответы, уже сжатые (Content-Encoding или тип
+вроде картинок и архивов) и ответы с Cache-Control: no-transform.
+Потоковые ответы сжимаются по частям: каждая часть уходит клиенту
+сразу, не дожидаясь конца ответа.
+
+Одинаковые тела (страницы и ленты из кеша) не сжимаются заново:
+сжатые байты хранятся в процессе по хешу содержимого, поэтому
+запрос получает из хранилища только то, что он сжал бы и сам.
+Тело, пришедшее повторно, пережимается один раз с уровнем
+COMPRESSION_CACHED_LEVELS: ради повторяющегося тела не жалко
+процессора. Сжатие считается в метриках compression_* (core.metrics).
+"""
+import hashlib
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from core import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+INCOMPRESSIBLE_TYPES = ('image/', 'audio/', 'video/', 'font/woff',
+                        'application/zip', 'application/gzip',
+                        'application/x-gzip', 'application/pdf',
+                        'application/octet-stream')
+# svg — текст, его сжимать полезно
+COMPRESSIBLE_EXCEPTIONS = ('image/svg+xml',)
+ACCEPT_RE = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+
+def accepted_encodings(header):
+    """Веса q кодировок из Accept-Encoding."""
+    weights = {}
+    for part in header.split(','):
+        match = ACCEPT_RE.match(part)
+        if not match:
+            continue
+        try:
+            weight = float(match[2]) if match[2] else 1.0
+        except ValueError:
+            continue
+        weights[match[1].lower()] = weight
+    return weights
+
+
+def choose_encoding(header):
+    """Лучшая доступная кодировка для клиента или None."""
+    weights = accepted_encodings(header)
+    best, best_weight = None, 0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get('*', 0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(encoding, data, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class StreamCompressor:
+    """Сжатие потока: каждая часть выталкивается клиенту целиком."""
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=level)
+        else:
+            self.compressor = zlib.compressobj(
+                level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            return self.compressor.process(chunk) + self.compressor.flush()
+        return (self.compressor.compress(chunk)
+                + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+class CompressedBodies:
+    """Сжатые тела по (кодировка, хеш тела), LRU по объёму."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body, upgraded):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self.entries[key] = (body, upgraded)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class CompressionStats:
+    def __init__(self, encoding):
+        def counter(name, help_text):
+            return metrics.counter(name, help_text, encoding=encoding)
+
+        self.responses = counter('compression_responses_total',
+                                 'Сжатые ответы')
+        self.reused = counter('compression_reused_total',
+                              'Ответы, отданные без повторного сжатия')
+        self.input_bytes = counter('compression_input_bytes_total',
+                                   'Байт до сжатия')
+        self.output_bytes = counter('compression_output_bytes_total',
+                                    'Байт после сжатия')
+        self.cpu_seconds = counter('compression_cpu_seconds_total',
+                                   'Процессорное время сжатия')
+
+    def record(self, input_size, output_size, cpu, reused=False):
+        self.responses.inc()
+        self.input_bytes.inc(input_size)
+        self.output_bytes.inc(output_size)
+        if cpu:
+            self.cpu_seconds.inc(cpu)
+        if reused:
+            self.reused.inc()
+
+
+STATS = {encoding: CompressionStats(encoding) for encoding in ENCODINGS}
+
+
+def is_compressible(response):
+    if response.has_header('Content-Encoding'):
+        return False
+    if 'no-transform' in response.get('Cache-Control', ''):
+        return False
+    content_type = response.get('Content-Type', '').lower()
+    if (content_type.startswith(INCOMPRESSIBLE_TYPES)
+            and not content_type.startswith(COMPRESSIBLE_EXCEPTIONS)):
+        return False
+    return (response.streaming
+            or len(response.content) >= settings.COMPRESSION_MIN_SIZE)
+
+
+class CompressionMiddleware:
+    """Сжимает ответы; ставится выше всех, кто меняет тело ответа."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.bodies = CompressedBodies(settings.COMPRESSION_CACHE_SIZE)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = self.compress_stream(
+                response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            body = self.compress_body(response.content, encoding)
+            if body is None:
+                return response
+            response.content = body
+            response['Content-Length'] = str(len(body))
+        # Сжатое тело не побайтно равно исходному: сильный ETag
+        # превращается в слабый, проверки If-None-Match его принимают
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def compress_body(self, content, encoding):
+        """Сжатое тело или None, если сжатие не уменьшает ответ."""
+        key = (encoding, hashlib.blake2b(content, digest_size=16).digest())
+        entry = self.bodies.get(key)
+        if entry is not None and entry[1]:
+            body = entry[0]
+            STATS[encoding].record(len(content), len(body), 0, reused=True)
+        else:
+            # Первое тело сжимается быстро, повторное — один раз сильнее
+            levels = (settings.COMPRESSION_LEVELS if entry is None
+                      else settings.COMPRESSION_CACHED_LEVELS)
+            started = time.thread_time()
+            body = compress(encoding, content, levels[encoding])
+            cpu = time.thread_time() - started
+            self.bodies.put(key, body, upgraded=entry is not None)
+            STATS[encoding].record(len(content), len(body), cpu)
+        return body if len(body) < len(content) else None
+
+    def compress_stream(self, chunks, encoding):
+        compressor = StreamCompressor(
+            encoding, settings.COMPRESSION_LEVELS[encoding])
+        input_size = output_size = 0
+        cpu = 0
+        for chunk in chunks:
+            input_size += len(chunk)
+            started = time.thread_time()
+            compressed = compressor.compress(chunk)
+            cpu += time.thread_time() - started
+            if compressed:
+                output_size += len(compressed)
+                yield compressed
+        tail = compressor.finish()
+        output_size += len(tail)
+        yield tail
+        STATS[encoding].record(input_size, output_size, cpu)
@@ -0,0 +1,158 @@
+"""Учёт памяти, выделенной запросами, через tracemalloc.
+
+Включается настройкой MEMORY_TRACKING; tracemalloc замедляет
+выделение памяти в разы, поэтому это режим расследования, а не
+постоянный. Для каждого запроса считаются:
+
+* пик — насколько память процесса поднималась во время запроса;
+* удержанное — насколько её стало больше после запроса, чем до него.
+
+Оба значения по view попадают в гистограммы core.metrics
+(request_memory_peak_bytes, request_memory_retained_bytes) рядом
+с остальными метриками /metrics/. Запрос, удержавший не меньше
+MEMORY_RETAINED_THRESHOLD байт, пишется в лог и считается
+в memory_retaining_requests_total. Каждый MEMORY_SNAPSHOT_RATE-й
+в среднем запрос снимает tracemalloc до и после, и удержанное
+раскладывается по местам выделения в коде проекта (ближайший
+к выделению кадр из BASE_DIR): memory_retained_site_bytes_total.
+Места вне кода проекта и сверх MEMORY_SITE_SERIES_LIMIT серий
+на процесс считаются в site="other": метрики лежат в кеше
+ограниченного размера.
+
+Пик по запросу требует tracemalloc.reset_peak из Python 3.9;
+на более старом Python считается только удержанное.
+
+tracemalloc общий на процесс: числа точны, когда процесс ведёт один
+запрос за раз (gunicorn с синхронными процессами).
+"""
+import logging
+import os
+import random
+import tracemalloc
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм: от 64 КБ до 256 МБ
+MEMORY_BUCKETS = [2 ** power for power in range(16, 29, 2)]
+
+# Метка мест вне проекта и сверх лимита серий
+OTHER_SITE = 'other'
+HAS_RESET_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+# Пары (view, место), уже ставшие сериями в этом процессе
+_site_series = set()
+
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+
+def allocation_site(traceback):
+    """Ближайший к выделению кадр кода проекта, иначе сам кадр выделения."""
+    base = settings.BASE_DIR + os.sep
+    frames = list(reversed(traceback))
+    for frame in frames:
+        if frame.filename.startswith(base):
+            return f'{os.path.relpath(frame.filename, base)}:{frame.lineno}'
+    return f'{frames[0].filename}:{frames[0].lineno}'
+
+
+def site_label(view, site):
+    """Метка места для серии счётчика: число серий ограничено."""
+    if (view, site) in _site_series:
+        return site
+    filename = site.rpartition(':')[0]
+    if (os.path.isabs(filename) or filename.startswith('<')
+            or len(_site_series) >= settings.MEMORY_SITE_SERIES_LIMIT):
+        return OTHER_SITE
+    _site_series.add((view, site))
+    return site
+
+
+def retained_sites(before, after, limit):
+    """limit мест, удержавших больше всего байт между снимками."""
+    sites = Counter()
+    for stat in after.compare_to(before, 'traceback'):
+        if stat.size_diff > 0:
+            sites[allocation_site(stat.traceback)] += stat.size_diff
+    return sites.most_common(limit)
+
+
+class MemoryTrackingMiddleware:
+    def __init__(self, get_response):
+        if not settings.MEMORY_TRACKING:
+            raise MiddlewareNotUsed
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(settings.MEMORY_TRACKING_FRAMES)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            view = resolve(request.path_info).view_name
+        except Resolver404:
+            return self.get_response(request)
+        rate = settings.MEMORY_SNAPSHOT_RATE
+        before = None
+        if rate and random.random() * rate < 1:
+            before = _snapshot()
+        if HAS_RESET_PEAK:
+            tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.streamed(
+                response.streaming_content, request, view, start, before)
+        else:
+            self.record(request, view, start, before)
+        return response
+
+    def streamed(self, content, request, view, start, before):
+        try:
+            yield from content
+        finally:
+            self.record(request, view, start, before)
+
+    def record(self, request, view, start, before):
+        current, peak = tracemalloc.get_traced_memory()
+        retained = current - start
+        if HAS_RESET_PEAK:
+            metrics.histogram(
+                'request_memory_peak_bytes',
+                'Подъём памяти процесса во время запроса',
+                MEMORY_BUCKETS, view=view).observe(peak - start)
+        metrics.histogram(
+            'request_memory_retained_bytes',
+            'Память, оставшаяся занятой после запроса',
+            MEMORY_BUCKETS, view=view).observe(max(retained, 0))
+        sites = []
+        if before is not None:
+            sites = retained_sites(before, _snapshot(),
+                                   settings.MEMORY_TOP_SITES)
+            for site, size in sites:
+                metrics.counter(
+                    'memory_retained_site_bytes_total',
+                    'Удержанная запросами память по местам выделения',
+                    view=view, site=site_label(view, site)).inc(size)
+        if retained >= settings.MEMORY_RETAINED_THRESHOLD:
+            metrics.counter(
+                'memory_retaining_requests_total',
+                'Запросы, удержавшие память сверх порога',
+                view=view).inc()
+            logger.warning(
+                'Запрос %s (%s) удержал %d байт, пик %s байт%s', request.path,
+                view, retained, peak - start if HAS_RESET_PEAK else '?',
+                ''.join(f'\n  {site}: {size}' for site, size in sites))
@@ -0,0 +1,45 @@
+"""Link: rel=preload и 103 Early Hints для статики страниц, см. core.preload.
+
+Статика запоминается по view в процессе: после первого ответа view
+её ссылки уходят в 103 Early Hints до работы view (если сервер это
+умеет) и в Link каждого ответа, даже когда страница пришла из кеша
+и её шаблоны не отрисовывались.
+"""
+from django.conf import settings
+
+from core.preload import link_header
+
+from .admission import view_path
+
+
+class PreloadMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.learned = {}
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        send_hints = request.META.get(settings.EARLY_HINTS_ENVIRON_KEY)
+        assets = self.learned.get(view_path(view_func))
+        if callable(send_hints) and assets:
+            send_hints([('Link', link_header(assets))])
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not response.get('Content-Type', '').startswith('text/html'):
+            return response
+        match = request.resolver_match
+        key = view_path(match.func) if match else None
+        assets = list(self.learned.get(key, ()))
+        known = len(assets)
+        for asset in getattr(request, '_preload_assets', ()):
+            if asset not in assets:
+                assets.append(asset)
+        if not assets:
+            return response
+        if key and len(assets) > known:
+            self.learned[key] = assets
+        links = link_header(assets)
+        if response.has_header('Link'):
+            links = f"{response['Link']}, {links}"
+        response['Link'] = links
+        return response
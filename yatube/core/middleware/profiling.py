@@ -0,0 +1,86 @@
+"""Выборочное профилирование запросов, см. core.profiling.
+
+Включается настройкой PROFILING_DIR. Профилируются:
+
+* каждый PROFILING_SAMPLE_RATE-й запрос в среднем (случайно);
+* все запросы к view из PROFILING_VIEWS (имена вида 'posts:profile');
+* при заданном PROFILING_SLOW_MS — все запросы, но сохраняются только
+  те, что шли не меньше порога.
+
+Потоковые ответы профилируются до конца отдачи тела.
+"""
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from core import profiling
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILING_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def reason(self, view):
+        if view in settings.PROFILING_VIEWS:
+            return 'view'
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate and random.random() * rate < 1:
+            return 'sample'
+        if settings.PROFILING_SLOW_MS is not None:
+            return 'slow'
+        return None
+
+    def __call__(self, request):
+        try:
+            view = resolve(request.path_info).view_name
+        except Resolver404:
+            return self.get_response(request)
+        reason = self.reason(view)
+        if reason is None:
+            return self.get_response(request)
+        recording = profiling.Recording(view, request.path, reason)
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recording.sql))
+        profiling.SAMPLER.start(recording)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self.finish(stack)
+            raise
+        if response.streaming:
+            response.streaming_content = self.streamed(
+                response.streaming_content, stack)
+        else:
+            self.finish(stack)
+        return response
+
+    def streamed(self, content, stack):
+        try:
+            yield from content
+        finally:
+            self.finish(stack)
+
+    def finish(self, stack):
+        stack.close()
+        recording = profiling.SAMPLER.stop()
+        if recording is None:
+            return
+        slow_ms = settings.PROFILING_SLOW_MS
+        if (recording.reason == 'slow'
+                and recording.duration * 1000 < slow_ms):
+            return
+        try:
+            profiling.write(recording)
+        except OSError:
+            logger.exception('Не удалось сохранить профиль %s',
+                             recording.path)
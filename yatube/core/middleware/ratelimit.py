@@ -0,0 +1,116 @@
+"""Ограничение частоты запросов к дорогим адресам.
+
+Лимиты задаются в RATE_LIMITS по имени адреса: вход, регистрация
+и сброс пароля проверяют хеш пароля и нагружают процессор, а создание
+записей любят боты. Для каждого адреса есть ведро жетонов на IP-адрес
+клиента и, для вошедших, на пользователя. За обратным прокси
+REMOTE_ADDR — адрес прокси, поэтому адрес клиента берётся из
+X-Forwarded-For, если запрос пришёл от прокси из TRUSTED_PROXIES.
+
+Ведро хранится в кеше RATE_LIMIT_CACHE одним числом по алгоритму GCRA:
+это момент, когда ведро снова станет полным. Так состояние общее для
+всех процессов, если кеш общий (memcached, Redis), а проверка стоит
+одного чтения и одной записи. Одновременные запросы могут перезаписать
+значение друг друга и пропустить пару лишних запросов — для защиты
+от всплесков это приемлемо.
+"""
+import ipaddress
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60): столько запросов за столько секунд."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def take_token(cache, key, rate, now=None):
+    """Берёт жетон из ведра key.
+
+    Возвращает 0, если жетон был, иначе сколько секунд ждать следующего.
+    """
+    count, period = parse_rate(rate)
+    now = time.time() if now is None else now
+    interval = period / count
+    full_at = max(cache.get(key, now), now) + interval
+    if full_at - now > period:
+        return full_at - period - now
+    cache.set(key, full_at, math.ceil(full_at - now))
+    return 0
+
+
+def _trusted(address, proxies):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(proxy) for proxy in proxies)
+
+
+def client_ip(request):
+    """Адрес клиента с учётом доверенных обратных прокси.
+
+    X-Forwarded-For читается справа налево: каждый прокси дописывает
+    адрес, от которого получил запрос, а левее первого недоверенного
+    адреса всё мог подставить сам клиент.
+    """
+    address = request.META.get('REMOTE_ADDR')
+    proxies = settings.TRUSTED_PROXIES
+    if not proxies or not _trusted(address, proxies):
+        return address
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    for hop in reversed([hop.strip() for hop in forwarded.split(',')]):
+        if not hop:
+            break
+        address = hop
+        if not _trusted(hop, proxies):
+            break
+    return address
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse('Слишком много запросов, попробуйте позже.',
+                            content_type='text/plain; charset=utf-8',
+                            status=429)
+    response['Retry-After'] = max(1, math.ceil(retry_after))
+    return response
+
+
+class RateLimitMiddleware:
+    """Отвечает 429 с Retry-After, когда ведро клиента пусто.
+
+    Должен стоять после AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in settings.RATE_LIMIT_METHODS:
+            return None
+        name = request.resolver_match.view_name
+        limits = settings.RATE_LIMITS.get(name)
+        if not limits:
+            return None
+        cache = caches[settings.RATE_LIMIT_CACHE]
+        buckets = []
+        if 'ip' in limits:
+            buckets.append((f'ip:{client_ip(request)}', limits['ip']))
+        if 'user' in limits and request.user.is_authenticated:
+            buckets.append((f'user:{request.user.pk}', limits['user']))
+        for ident, rate in buckets:
+            retry_after = take_token(cache, f'ratelimit:{name}:{ident}',
+                                     rate)
+            if retry_after:
+                return too_many_requests(retry_after)
+        return None
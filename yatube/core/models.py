@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class InvalidationEvent(models.Model):
+    """Событие шины инвалидации, см. core.bus.
+
+    Первичный ключ — версия события: процессы читают журнал
+    по возрастанию ключа с последней применённой версии.
+    """
+    topic = models.CharField(max_length=50)
+    key = models.CharField(max_length=200, blank=True)
+    # JSON с подробностями для подписчиков
+    data = models.TextField(blank=True)
+    # Процесс-источник: свои события он уже применил сам
+    source = models.CharField(max_length=100)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.pk} {self.topic}:{self.key}'
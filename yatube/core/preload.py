@@ -0,0 +1,119 @@
+"""Ссылки preload на статику, которую подключают шаблоны страницы.
+
+Браузер узнаёт о стилях и логотипе из base.html, только разобрав
+HTML. Какие файлы подключает шаблон, известно уже после компиляции:
+это теги ``{% static %}`` с постоянным путём в самом шаблоне,
+в его родителях ({% extends %}) и во включённых шаблонах
+({% include %}). Список считается один раз на скомпилированный
+шаблон.
+
+Бэкенд шаблонов DjangoTemplates отсюда запоминает на запросе
+статику отрисованных шаблонов, а core.middleware.preload отдаёт её
+в заголовке Link и запоминает по view. Следующим запросам к той же
+view сервер может отправить ссылки ещё до работы view ответом 103
+Early Hints: WSGI таких ответов не знает, поэтому это делается, если
+сервер положил в environ функцию под ключом EARLY_HINTS_ENVIRON_KEY.
+"""
+import os
+from fnmatch import fnmatch
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+from django.template.loader_tags import ExtendsNode, IncludeNode
+from django.templatetags.static import StaticNode
+
+# Тип ресурса для as= по расширению файла
+ASSET_TYPES = {
+    '.css': 'style',
+    '.js': 'script',
+    '.woff': 'font',
+    '.woff2': 'font',
+    '.png': 'image',
+    '.jpg': 'image',
+    '.jpeg': 'image',
+    '.gif': 'image',
+    '.svg': 'image',
+    '.webp': 'image',
+    '.ico': 'image',
+}
+
+
+def _constant(expression):
+    """Значение выражения шаблона без переменных и фильтров или None."""
+    if isinstance(expression.var, str) and not expression.filters:
+        return expression.var
+    return None
+
+
+def _static_paths(template, seen):
+    if template.origin.name in seen:
+        return
+    seen.add(template.origin.name)
+    nodelist = template.nodelist
+    for node in nodelist.get_nodes_by_type(StaticNode):
+        path = _constant(node.path)
+        if path is not None:
+            yield path
+    related = [node.parent_name for node in
+               nodelist.get_nodes_by_type(ExtendsNode)]
+    related += [node.template for node in
+                nodelist.get_nodes_by_type(IncludeNode)]
+    for expression in related:
+        name = _constant(expression)
+        if name is None:
+            continue
+        try:
+            other = template.engine.get_template(name)
+        except TemplateDoesNotExist:
+            continue
+        yield from _static_paths(other, seen)
+
+
+def template_assets(template):
+    """Пары (путь в статике, тип для as=) для скомпилированного шаблона."""
+    assets = getattr(template, '_preload_assets', None)
+    if assets is None:
+        assets = []
+        for path in _static_paths(template, set()):
+            kind = ASSET_TYPES.get(os.path.splitext(path)[1].lower())
+            if kind is None or (path, kind) in assets or any(
+                    fnmatch(path, pattern)
+                    for pattern in settings.PRELOAD_IGNORE):
+                continue
+            assets.append((path, kind))
+        template._preload_assets = assets
+    return assets
+
+
+def link_header(assets):
+    links = []
+    for path, kind in assets:
+        link = f'<{StaticNode.handle_simple(path)}>; rel=preload; as={kind}'
+        if kind == 'font':
+            link += '; crossorigin'
+        links.append(link)
+    return ', '.join(links)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        if request is not None:
+            found = request.__dict__.setdefault('_preload_assets', [])
+            for asset in template_assets(self.template):
+                if asset not in found:
+                    found.append(asset)
+        return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд Django, запоминающий статику отрисованных шаблонов."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -0,0 +1,178 @@
+"""Выборочное профилирование запросов в бою.
+
+Профилировщик снимает стеки: поток SAMPLER раз в PROFILING_INTERVAL
+секунд читает кадры потоков, чьи запросы сейчас профилируются
+(sys._current_frames), и считает одинаковые стеки. Запросы без
+профиля ничего не платят, профилируемые — примерно столько, сколько
+стоит пройти их стек раз в интервал, так что можно профилировать
+все запросы и сохранять только медленные.
+
+Какие запросы профилировать, решает core.middleware.profiling.
+Профиль запроса — маленький файл .json.gz в PROFILING_DIR: view,
+путь, длительность, число и время запросов SQL и стеки в свёрнутом
+виде ``модуль:функция;модуль:функция`` с числом снимков. Команда
+merge_profiles складывает стеки по view в файлы для flamegraph.pl
+и speedscope.
+"""
+import glob
+import gzip
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+_sequence = itertools.count()
+
+
+def collapse(frame):
+    """Стек кадра от корня: ``модуль:функция;...``."""
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f'{module}:{frame.f_code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Recording:
+    """Профиль одного запроса."""
+
+    def __init__(self, view, path, reason):
+        self.view = view
+        self.path = path
+        self.reason = reason
+        self.started = time.perf_counter()
+        self.duration = None
+        self.stacks = Counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+
+    def sql(self, execute, sql, params, many, context):
+        """Обёртка execute_wrapper: число и время запросов SQL."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - started
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            'view': self.view,
+            'path': self.path,
+            'reason': self.reason,
+            'time': time.time(),
+            'duration_ms': round(self.duration * 1000, 3),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 3),
+            'interval_ms': settings.PROFILING_INTERVAL * 1000,
+            'stacks': dict(self.stacks),
+        }
+
+
+class Sampler:
+    """Поток, снимающий стеки профилируемых потоков."""
+
+    def __init__(self):
+        self.active = {}
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def _ensure_thread(self):
+        # После fork у потомка потока нет: запускаем свой
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            threading.Thread(target=self._run, name='profiling-sampler',
+                             daemon=True).start()
+
+    def start(self, recording):
+        """Профилирует текущий поток в recording."""
+        with self.lock:
+            self._ensure_thread()
+            self.active[threading.get_ident()] = recording
+
+    def stop(self):
+        with self.lock:
+            recording = self.active.pop(threading.get_ident(), None)
+        if recording is not None:
+            recording.finish()
+        return recording
+
+    def sample(self):
+        with self.lock:
+            active = list(self.active.items())
+        if not active:
+            return
+        frames = sys._current_frames()
+        for ident, recording in active:
+            frame = frames.get(ident)
+            if frame is not None:
+                recording.stacks[collapse(frame)] += 1
+
+    def _run(self):
+        while True:
+            time.sleep(settings.PROFILING_INTERVAL)
+            self.sample()
+
+
+SAMPLER = Sampler()
+
+
+def write(recording, directory=None):
+    """Сохраняет профиль в PROFILING_DIR, возвращает путь к файлу."""
+    directory = directory or settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = (f'{recording.view.replace(":", ".")}-{int(time.time())}-'
+            f'{os.getpid()}-{next(_sequence)}.json.gz')
+    path = os.path.join(directory, name)
+    with gzip.open(path, 'wt', encoding='utf-8') as file:
+        json.dump(recording.as_dict(), file, ensure_ascii=False,
+                  separators=(',', ':'))
+    return path
+
+
+def load(directory):
+    for path in sorted(glob.glob(os.path.join(directory, '*.json.gz'))):
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            yield json.load(file)
+
+
+class ViewProfile:
+    """Сумма профилей одной view."""
+
+    def __init__(self):
+        self.requests = 0
+        self.durations = []
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.stacks = Counter()
+
+    def add(self, profile):
+        self.requests += 1
+        self.durations.append(profile['duration_ms'])
+        self.sql_count += profile['sql_count']
+        self.sql_ms += profile['sql_ms']
+        self.stacks.update(profile['stacks'])
+
+    def collapsed(self):
+        """Строки ``стек число`` для flamegraph.pl, частые первыми."""
+        return [f'{stack} {count}'
+                for stack, count in self.stacks.most_common()]
+
+
+def merge(profiles, views=None):
+    """Профили по view: {view: ViewProfile}."""
+    merged = defaultdict(ViewProfile)
+    for profile in profiles:
+        if views and profile['view'] not in views:
+            continue
+        merged[profile['view']].add(profile)
+    return dict(merged)
@@ -0,0 +1,301 @@
+"""Воспроизведение журнала доступа против WSGI-приложения yatube.
+
+Синтетические бенчмарки гоняют несколько адресов, а настоящий трафик —
+смесь лент, профилей, записей и страниц about и users. Здесь строки
+журнала в формате common или combined::
+
+    1.2.3.4 - leo [10/Oct/2024:13:55:36 +0000] "GET /profile/leo/ HTTP/1.1"
+    200 5123 "https://example.com/" "Mozilla/5.0"
+
+превращаются в вызовы yatube.wsgi.application в этом же процессе
+(или в дочерних после fork) с теми же методом, путём, Referer
+и User-Agent. Запросы от пользователя из поля authuser идут с его
+сессией. Промежутки между запросами повторяются в speed раз быстрее
+(speed = 0 — без пауз). Результат — пропускная способность
+и перцентили задержки по шаблонам адресов (имя view), который можно
+сохранить и сравнить со следующим прогоном.
+"""
+import io
+import json
+import logging
+import math
+import multiprocessing
+import re
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from importlib import import_module
+from urllib.parse import unquote_to_bytes, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model)
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+LINE_RE = re.compile(
+    r'(?P<host>\S+) \S+ (?P<user>\S+) \[(?P<time>[^\]]+)\] '
+    r'"(?P<method>[A-Z]+) (?P<target>\S+)(?: [^"]*)?" '
+    r'(?P<status>\d{3}) \S+'
+    r'(?: "(?P<referer>[^"]*)" "(?P<agent>[^"]*)")?')
+TIME_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+# Шаблон для адресов, которых нет в URLconf
+UNRESOLVED = '<unresolved>'
+
+Entry = namedtuple(
+    'Entry', 'time method path query user status referer agent host')
+Result = namedtuple('Result', 'pattern status logged_status latency')
+
+
+def parse_line(line):
+    """Entry из строки журнала или None, если строка не разобралась."""
+    match = LINE_RE.match(line)
+    if match is None:
+        return None
+    parts = urlsplit(match['target'])
+    user = match['user']
+    return Entry(
+        time=datetime.strptime(match['time'], TIME_FORMAT).timestamp(),
+        method=match['method'],
+        # PATH_INFO по PEP 3333 — байты адреса в строке latin-1
+        path=unquote_to_bytes(parts.path).decode('latin-1') or '/',
+        query=parts.query,
+        user=None if user == '-' else user,
+        status=int(match['status']),
+        referer=match['referer'] if match['referer'] not in (None, '-')
+        else None,
+        agent=match['agent'],
+        host=match['host'],
+    )
+
+
+def read_log(lines, methods=('GET', 'HEAD'), limit=None):
+    """Разобранные строки с методами methods и число пропущенных."""
+    entries = []
+    skipped = 0
+    for line in lines:
+        entry = parse_line(line)
+        if entry is None or entry.method not in methods:
+            skipped += 1
+            continue
+        entries.append(entry)
+        if limit and len(entries) >= limit:
+            break
+    return entries, skipped
+
+
+def session_cookies(usernames):
+    """Cookie сессии для каждого существующего пользователя."""
+    engine = import_module(settings.SESSION_ENGINE)
+    users = get_user_model().objects.filter(username__in=set(usernames))
+    cookies = {}
+    for user in users:
+        session = engine.SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        cookies[user.username] = (
+            f'{settings.SESSION_COOKIE_NAME}={session.session_key}')
+    return cookies
+
+
+def pattern_of(path):
+    try:
+        return resolve(
+            path.encode('latin-1').decode('utf-8', 'replace')).view_name
+    except Resolver404:
+        return UNRESOLVED
+
+
+def environ_for(entry, options):
+    environ = {
+        'REQUEST_METHOD': entry.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': entry.path,
+        'QUERY_STRING': entry.query,
+        'SERVER_NAME': options['host'],
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': options['host'],
+        'REMOTE_ADDR': entry.host if options['client_ips'] else '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if options['accept_encoding']:
+        environ['HTTP_ACCEPT_ENCODING'] = options['accept_encoding']
+    if entry.referer:
+        environ['HTTP_REFERER'] = entry.referer
+    if entry.agent:
+        environ['HTTP_USER_AGENT'] = entry.agent
+    cookie = options['cookies'].get(entry.user)
+    if cookie:
+        environ['HTTP_COOKIE'] = cookie
+    return environ
+
+
+def call(application, environ):
+    """Статус ответа; тело читается до конца."""
+    status = []
+
+    def start_response(line, headers, exc_info=None):
+        status.append(int(line.split(' ', 1)[0]))
+
+    body = application(environ, start_response)
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return status[0]
+
+
+def replay_entries(entries, options, started):
+    """Воспроизводит entries одним потоком, возвращает [Result]."""
+    from yatube.wsgi import application
+    first = options['first_time']
+    speed = options['speed']
+    results = []
+    for entry in entries:
+        if speed:
+            delay = started + (entry.time - first) / speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        environ = environ_for(entry, options)
+        begin = time.perf_counter()
+        try:
+            status = call(application, environ)
+        except Exception:
+            # Упавший запрос — ошибка прогона, а не конец исполнителя
+            logger.exception('Запрос %s %s упал', entry.method, entry.path)
+            status = 500
+        results.append(Result(pattern_of(entry.path), status, entry.status,
+                              time.perf_counter() - begin))
+    return results
+
+
+def _replay_apart(*args):
+    """replay_entries в своём потоке или процессе."""
+    try:
+        return replay_entries(*args)
+    finally:
+        connections.close_all()
+
+
+def _replay_in_process(args):
+    return _replay_apart(*args)
+
+
+def replay(entries, workers=1, mode='thread', speed=0.0, host='127.0.0.1',
+           accept_encoding='br, gzip', client_ips=False):
+    """Воспроизводит журнал, возвращает ([Result], секунды прогона).
+
+    Запросы делятся между workers по кругу, и каждый исполнитель
+    соблюдает расписание своих запросов. При workers=1 всё идёт
+    в текущем потоке.
+    """
+    options = {
+        'speed': speed,
+        'host': host,
+        'accept_encoding': accept_encoding,
+        'client_ips': client_ips,
+        'first_time': entries[0].time if entries else 0,
+        'cookies': session_cookies(
+            {entry.user for entry in entries if entry.user}),
+    }
+    chunks = [entries[index::workers] for index in range(workers)]
+    started = time.time()
+    if workers == 1:
+        results = replay_entries(entries, options, started)
+    elif mode == 'process':
+        # Потомкам после fork нельзя делить соединения с родителем
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers) as pool:
+            parts = pool.map(_replay_in_process,
+                             [(chunk, options, started) for chunk in chunks])
+        results = [result for part in parts for result in part]
+    else:
+        parts = [None] * workers
+
+        def run(index):
+            parts[index] = _replay_apart(chunks[index], options, started)
+
+        threads = [threading.Thread(target=run, args=(index,))
+                   for index in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results = [result for part in parts for result in part]
+    return results, time.time() - started
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу; values отсортированы."""
+    return values[max(0, math.ceil(share * len(values)) - 1)]
+
+
+def summarize(results, duration):
+    """Сводка по шаблонам адресов: {шаблон: {показатель: значение}}."""
+    groups = defaultdict(list)
+    for result in results:
+        groups[result.pattern].append(result)
+    summary = {}
+    for pattern, items in groups.items():
+        latencies = sorted(item.latency * 1000 for item in items)
+        summary[pattern] = {
+            'requests': len(items),
+            'rps': len(items) / duration if duration else 0.0,
+            'p50_ms': percentile(latencies, 0.5),
+            'p90_ms': percentile(latencies, 0.9),
+            'p99_ms': percentile(latencies, 0.99),
+            'max_ms': latencies[-1],
+            'errors': sum(item.status >= 500 for item in items),
+            'status_mismatches': sum(
+                item.status != item.logged_status for item in items),
+        }
+    return summary
+
+
+def compare(base, current, threshold=0.1):
+    """Регрессии current относительно base.
+
+    Список (шаблон, показатель, было, стало): задержка выросла или
+    пропускная способность упала больше чем на долю threshold; новые
+    ошибки 5xx — регрессия всегда.
+    """
+    regressions = []
+    for pattern in sorted(set(base) & set(current)):
+        before, after = base[pattern], current[pattern]
+        for metric in ('p50_ms', 'p90_ms', 'p99_ms'):
+            if after[metric] > before[metric] * (1 + threshold):
+                regressions.append(
+                    (pattern, metric, before[metric], after[metric]))
+        if after['rps'] < before['rps'] * (1 - threshold):
+            regressions.append(
+                (pattern, 'rps', before['rps'], after['rps']))
+        if after['errors'] > before['errors']:
+            regressions.append(
+                (pattern, 'errors', before['errors'], after['errors']))
+    return regressions
+
+
+def save(summary, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, ensure_ascii=False, indent=2,
+                  sort_keys=True)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
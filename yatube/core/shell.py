@@ -0,0 +1,247 @@
+"""Кеш страниц с «дырами» под пользовательские фрагменты.
+
+Тело страницы рендерится один раз для всех посетителей: на месте
+фрагментов, зависящих от пользователя (шапка с его именем и ссылками
+входа), тег ``{% hole %}`` оставляет HTML-комментарий-маркер. Готовое
+тело с маркерами лежит в кеше ``pages``, а на каждом запросе маркеры
+заменяются фрагментами, отрисованными для текущего пользователя.
+
+Заполнители регистрируются декоратором ``register_hole`` и получают
+сразу все аргументы маркеров своего вида на странице, чтобы собрать
+данные для всей страницы за один раз. Страница, отдаваемая потоком,
+заполняется по частям; view заранее сообщает аргументы будущих
+маркеров через ``expect_holes``, и первый же маркер вида заполняет
+их все, а следующие части берут готовые фрагменты.
+
+Сброс кеша меняет версию: страницы прежней версии считаются
+устаревшими, и первый пришедший за страницей рендерит её заново,
+а одновременные с ним запросы получают прежнее тело (core.singleflight).
+"""
+import codecs
+import hashlib
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from . import bus
+from .singleflight import get_or_fill, store
+
+HOLE_RE = re.compile(r'<!--hole:(?P<name>\w+):(?P<arg>[\w-]*)-->')
+VERSION_KEY = 'shell:version'
+
+_fillers = {}
+
+
+def register_hole(name):
+    """Регистрирует заполнитель дыры: filler(request, args) -> {arg: html}."""
+    def decorator(filler):
+        _fillers[name] = filler
+        return filler
+    return decorator
+
+
+@register_hole('header')
+def fill_header(request, args):
+    html = render_to_string('includes/header.html', request=request)
+    return dict.fromkeys(args, html)
+
+
+def hole_marker(name, arg=''):
+    return f'<!--hole:{name}:{arg}-->'
+
+
+def expect_holes(request, name, args):
+    """Сообщает, что на странице будут маркеры name с аргументами args.
+
+    args — список или функция без аргументов, которая вызывается при
+    первом заполнении, например когда записи страницы уже прочитаны.
+    """
+    if not hasattr(request, '_expected_holes'):
+        request._expected_holes = {}
+    request._expected_holes[name] = args
+
+
+def _expected(request, name):
+    args = getattr(request, '_expected_holes', {}).get(name, ())
+    return args() if callable(args) else args
+
+
+def fill_holes(request, content):
+    """Заменяет маркеры в тексте страницы фрагментами для запроса.
+
+    Фрагменты запоминаются на запросе: маркер, уже заполненный
+    в прошлой части страницы, заполнитель не вызывает.
+    """
+    found = {}
+    for match in HOLE_RE.finditer(content):
+        found.setdefault(match['name'], {})[match['arg']] = None
+    if not found:
+        return content
+    if not hasattr(request, '_hole_fragments'):
+        request._hole_fragments = {}
+    for name, args in found.items():
+        filled = request._hole_fragments.setdefault(name, {})
+        missing = [arg for arg in args if arg not in filled]
+        if missing:
+            missing += [str(arg) for arg in _expected(request, name)
+                        if str(arg) not in filled and str(arg) not in args]
+            filled.update(_fillers[name](request, missing))
+    fragments = request._hole_fragments
+    return HOLE_RE.sub(
+        lambda match: fragments[match['name']][match['arg']], content)
+
+
+def _cache():
+    return caches[settings.PAGE_SHELL_CACHE]
+
+
+def _new_version():
+    # Версия от времени: если ключ версии вытеснят из кеша, новая версия
+    # не совпадёт ни с одной из прежних, и старые страницы не всплывут
+    return int(time.time() * 1000)
+
+
+def _version(cache):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _new_version(), None)
+        version = cache.get(VERSION_KEY, _new_version())
+    return version
+
+
+def invalidate_page_shells():
+    """Сбрасывает все закешированные страницы сменой версии ключей."""
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _new_version(), None)
+
+
+@bus.on_reset
+def _invalidate_local_shells():
+    # Запись в другом процессе сбросила версию в своём кеше. Общий
+    # кеш уже сброшен, и повторный сброс в каждом процессе выбросил
+    # бы страницы, отрисованные после записи; свой кеш LocMem
+    # сбрасываем сами
+    if isinstance(_cache(), LocMemCache):
+        invalidate_page_shells()
+
+
+@bus.subscribe('post', 'group', 'user', 'likes', 'bulk')
+def _content_changed(key, data):
+    _invalidate_local_shells()
+
+
+def _shell_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'shell:{path}'
+
+
+def _get_shell(request, cache, key, render, version):
+    if request.META.get(settings.INTERNAL_REQUEST_ENVIRON_KEY):
+        # Публикация и прогрев не берут тело из кеша: пока другой
+        # запрос перерисовывает страницу, там лежит прежнее.
+        # Свежее тело заодно заполняет кеш
+        shell = render()
+        if shell is not None:
+            store(cache, key, shell, cache.default_timeout, version)
+        return shell
+    return get_or_fill(cache, key, render,
+                       timeout=cache.default_timeout, tag=version)
+
+
+def cache_page_shell(view):
+    """Кеширует тело страницы общим для всех пользователей.
+
+    Кешируются только успешные ответы на GET и HEAD. Фрагменты
+    с маркерами заполняются на каждом запросе, в том числе на промахе.
+    Одновременные промахи по одной странице рендерят её один раз;
+    потоковый ответ (core.streaming) попадает в кеш, когда отдан
+    целиком, и до этого соседние промахи рендерят страницу сами.
+    Внутренние запросы (публикация, прогрев) всегда рендерят страницу.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        rendered = {}
+
+        def render():
+            request.page_shell = True
+            try:
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response.render()
+            finally:
+                request.page_shell = False
+            rendered['response'] = response
+            if response.streaming or response.status_code != 200:
+                return None
+            return (response.content.decode(response.charset),
+                    response['Content-Type'])
+
+        cache = _cache()
+        key = _shell_key(request)
+        version = _version(cache)
+        shell = _get_shell(request, cache, key, render, version)
+        response = rendered.get('response')
+        if response is None:
+            content, content_type = shell
+            return HttpResponse(fill_holes(request, content),
+                                content_type=content_type)
+        if hasattr(response, 'stream_failed'):
+            # Страница из core.streaming.render_stream
+            response.streaming_content = _stream_shell(
+                request, response, response.streaming_content,
+                lambda body: store(cache, key, body, cache.default_timeout,
+                                   version))
+        elif not response.streaming:
+            response.content = fill_holes(
+                request, response.content.decode(response.charset))
+        return response
+    return wrapper
+
+
+def _complete_length(text):
+    """Длина начала text без оборванного в конце маркера дыры."""
+    start = text.rfind('<')
+    if start == -1:
+        return len(text)
+    tail = text[start:]
+    prefix = '<!--hole:'
+    if '-->' not in tail and (
+            tail.startswith(prefix) or prefix.startswith(tail)):
+        return start
+    return len(text)
+
+
+def _stream_shell(request, response, chunks, save):
+    """Заполняет дыры в каждой части потока и кеширует тело, если
+    поток удался. Маркер, разорванный между частями, дожидается
+    своего конца в следующей части.
+    """
+    decoder = codecs.getincrementaldecoder(response.charset)()
+    body = []
+    pending = ''
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        body.append(text)
+        pending += text
+        end = _complete_length(pending)
+        if end:
+            yield fill_holes(request, pending[:end])
+            pending = pending[end:]
+    text = decoder.decode(b'', final=True)
+    body.append(text)
+    pending += text
+    if pending:
+        yield fill_holes(request, pending)
+    if response.status_code == 200 and not response.stream_failed:
+        save((''.join(body), response['Content-Type']))
@@ -0,0 +1,308 @@
+"""Кеш в разделяемой памяти для всех процессов сервера на машине.
+
+LocMemCache держит свою копию в каждом рабочем процессе: чем больше
+процессов, тем ниже доля попаданий и тем больше памяти. Этот бэкенд
+хранит записи в файле, отображённом в память (mmap) всеми процессами::
+
+    CACHES = {
+        'pages': {
+            'BACKEND': 'core.shmcache.SharedMemoryCache',
+            'LOCATION': '/dev/shm/yatube-pages',
+            'OPTIONS': {'SLOTS': 2048, 'SLOT_SIZE': 32 * 1024},
+        },
+    }
+
+Число и размер слотов входят в имя файла (LOCATION.2048x32768): кеш
+с другими OPTIONS открывает другой файл, а не переразмечает тот,
+который отображают процессы со старыми настройками (запись в усечённый
+чужой файл обернулась бы SIGBUS). Размечается только новый файл; файл
+с чужим заголовком — ошибка настройки.
+
+Файл поделён на слоты фиксированного размера, слоты — на корзины
+по BUCKET_SIZE штук. Ключ живёт в одной корзине, выбранной по хешу;
+при нехватке места вытесняется просроченная или давнее всего
+использованная запись корзины (приближённый LRU). Значение, которое
+не помещается в слот, не кешируется.
+
+Каждую корзину защищает блокировка fcntl на свой байт файла (между
+процессами) и общая блокировка процесса (между потоками), так что add
+и incr атомарны, а читатель не видит слот наполовину записанным.
+Блокировки fcntl принадлежат процессу и потоки друг от друга не
+защищают, а Django создаёт экземпляр бэкенда в каждом потоке, поэтому
+файл, его отображение и блокировка потоков — одни на процесс (_mappings).
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+MAGIC = b'YTSHMC01'
+# Заголовок файла: метка, число слотов, размер слота
+FILE_HEADER = struct.Struct('<8sII')
+# Заголовок слота: хеш ключа, срок (0 — бессрочно), момент последнего
+# использования, длина ключа, длина значения
+SLOT_HEADER = struct.Struct('<QdQHI')
+BUCKET_SIZE = 8
+
+
+# Отображения файлов кеша в этом процессе по пути
+_mappings = {}
+_mappings_lock = threading.Lock()
+
+
+class _Mapping:
+    """Открытый и отображённый файл кеша с блокировкой потоков."""
+
+    def __init__(self, path, size, header):
+        self.pid = os.getpid()
+        self.header = header
+        self.lock = threading.Lock()
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._lay_out(path, size, header)
+        except BaseException:
+            os.close(self.fd)
+            raise
+        self.mm = mmap.mmap(self.fd, size)
+
+    def _lay_out(self, path, size, header):
+        """Размечает новый файл; размеченный не трогает."""
+        fcntl.lockf(self.fd, fcntl.LOCK_EX)
+        try:
+            stored = os.pread(self.fd, FILE_HEADER.size, 0)
+            if not stored.strip(b'\0'):
+                # Новый файл или разметка, прерванная до записи
+                # заголовка: его ещё никто не отображал
+                os.ftruncate(self.fd, size)
+                os.pwrite(self.fd, header, 0)
+            elif stored != header:
+                raise ImproperlyConfigured(
+                    f'{path} — не файл кеша этой версии и геометрии, '
+                    f'его нужно удалить или взять другой LOCATION')
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+    def current(self, header):
+        """Годится ли отображение этому процессу и этой геометрии."""
+        return self.pid == os.getpid() and self.header == header
+
+
+def _key_hash(key):
+    # 0 означает пустой слот
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class SharedMemoryCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.slot_size = int(options.get('SLOT_SIZE', 32 * 1024))
+        slots = int(options.get('SLOTS', 2048))
+        self.buckets = max(1, slots // BUCKET_SIZE)
+        self.slots = self.buckets * BUCKET_SIZE
+        self.path = f'{location}.{self.slots}x{self.slot_size}'
+        self.size = FILE_HEADER.size + self.slots * self.slot_size
+
+    def _map(self):
+        """Общее для потоков процесса отображение файла; после fork
+        процесс открывает файл заново.
+        """
+        header = FILE_HEADER.pack(MAGIC, self.slots, self.slot_size)
+        mapping = _mappings.get(self.path)
+        if mapping is not None and mapping.current(header):
+            return mapping
+        with _mappings_lock:
+            mapping = _mappings.get(self.path)
+            if mapping is None or not mapping.current(header):
+                mapping = _mappings[self.path] = _Mapping(
+                    self.path, self.size, header)
+            return mapping
+
+    @contextmanager
+    def _bucket(self, key_hash):
+        """Блокирует корзину ключа, отдаёт отображение и номер корзины."""
+        mapping = self._map()
+        bucket = key_hash % self.buckets
+        with mapping.lock:
+            fcntl.lockf(mapping.fd, fcntl.LOCK_EX, 1, bucket)
+            try:
+                yield mapping.mm, bucket
+            finally:
+                fcntl.lockf(mapping.fd, fcntl.LOCK_UN, 1, bucket)
+
+    def _offset(self, bucket, index):
+        slot = bucket * BUCKET_SIZE + index
+        return FILE_HEADER.size + slot * self.slot_size
+
+    def _find(self, mm, bucket, key, key_hash, now):
+        """Смещение живого слота ключа или None. Просроченный чистится."""
+        for index in range(BUCKET_SIZE):
+            offset = self._offset(bucket, index)
+            stored_hash, expires, _, key_len, _ = SLOT_HEADER.unpack_from(
+                mm, offset)
+            if stored_hash != key_hash:
+                continue
+            start = offset + SLOT_HEADER.size
+            if mm[start:start + key_len] != key:
+                continue
+            if expires and expires <= now:
+                self._clear_slot(mm, offset)
+                return None
+            return offset
+        return None
+
+    def _victim(self, mm, bucket, now):
+        """Слот для новой записи: пустой, просроченный или самый старый."""
+        oldest = None
+        for index in range(BUCKET_SIZE):
+            offset = self._offset(bucket, index)
+            stored_hash, expires, used, _, _ = SLOT_HEADER.unpack_from(
+                mm, offset)
+            if not stored_hash or (expires and expires <= now):
+                return offset
+            if oldest is None or used < oldest[0]:
+                oldest = (used, offset)
+        return oldest[1]
+
+    def _clear_slot(self, mm, offset):
+        SLOT_HEADER.pack_into(mm, offset, 0, 0, 0, 0, 0)
+
+    def _read(self, mm, offset):
+        _, _, _, key_len, value_len = SLOT_HEADER.unpack_from(mm, offset)
+        start = offset + SLOT_HEADER.size + key_len
+        return pickle.loads(mm[start:start + value_len])
+
+    def _write(self, mm, offset, key, key_hash, value, expires):
+        SLOT_HEADER.pack_into(mm, offset, 0, 0, 0, 0, 0)
+        start = offset + SLOT_HEADER.size
+        mm[start:start + len(key)] = key
+        start += len(key)
+        mm[start:start + len(value)] = value
+        # Заголовок пишется последним: до этого слот считается пустым
+        SLOT_HEADER.pack_into(mm, offset, key_hash, expires,
+                              time.monotonic_ns(), len(key), len(value))
+
+    def _touch_used(self, mm, offset):
+        key_hash, expires, _, key_len, value_len = SLOT_HEADER.unpack_from(
+            mm, offset)
+        SLOT_HEADER.pack_into(mm, offset, key_hash, expires,
+                              time.monotonic_ns(), key_len, value_len)
+
+    def _encode_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key.encode()
+
+    def _expires(self, timeout):
+        # get_backend_timeout отдаёт момент истечения или None
+        expires = self.get_backend_timeout(timeout)
+        return 0 if expires is None else expires
+
+    def _fits(self, key, value):
+        return SLOT_HEADER.size + len(key) + len(value) <= self.slot_size
+
+    def _store(self, key, value, timeout, version, only_new):
+        key = self._encode_key(key, version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        key_hash = _key_hash(key)
+        now = time.time()
+        with self._bucket(key_hash) as (mm, bucket):
+            offset = self._find(mm, bucket, key, key_hash, now)
+            if offset is not None and only_new:
+                return False
+            if not self._fits(key, value):
+                # Старое значение устарело, а новое не помещается
+                if offset is not None:
+                    self._clear_slot(mm, offset)
+                return False
+            if offset is None:
+                offset = self._victim(mm, bucket, now)
+            self._write(mm, offset, key, key_hash, value,
+                        self._expires(timeout))
+            return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._store(key, value, timeout, version, only_new=True)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store(key, value, timeout, version, only_new=False)
+
+    def get(self, key, default=None, version=None):
+        key = self._encode_key(key, version)
+        key_hash = _key_hash(key)
+        with self._bucket(key_hash) as (mm, bucket):
+            offset = self._find(mm, bucket, key, key_hash, time.time())
+            if offset is None:
+                return default
+            self._touch_used(mm, offset)
+            return self._read(mm, offset)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._encode_key(key, version)
+        key_hash = _key_hash(key)
+        with self._bucket(key_hash) as (mm, bucket):
+            offset = self._find(mm, bucket, key, key_hash, time.time())
+            if offset is None:
+                return False
+            _, _, used, key_len, value_len = SLOT_HEADER.unpack_from(
+                mm, offset)
+            SLOT_HEADER.pack_into(mm, offset, key_hash,
+                                  self._expires(timeout), used, key_len,
+                                  value_len)
+            return True
+
+    def delete(self, key, version=None):
+        key = self._encode_key(key, version)
+        key_hash = _key_hash(key)
+        with self._bucket(key_hash) as (mm, bucket):
+            offset = self._find(mm, bucket, key, key_hash, time.time())
+            if offset is not None:
+                self._clear_slot(mm, offset)
+
+    def has_key(self, key, version=None):
+        key = self._encode_key(key, version)
+        key_hash = _key_hash(key)
+        with self._bucket(key_hash) as (mm, bucket):
+            return self._find(
+                mm, bucket, key, key_hash, time.time()) is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов, в отличие от get + set."""
+        key = self._encode_key(key, version)
+        key_hash = _key_hash(key)
+        with self._bucket(key_hash) as (mm, bucket):
+            offset = self._find(mm, bucket, key, key_hash, time.time())
+            if offset is None:
+                raise ValueError("Key '%s' not found" % key.decode())
+            value = self._read(mm, offset) + delta
+            expires = SLOT_HEADER.unpack_from(mm, offset)[1]
+            self._write(mm, offset, key, key_hash,
+                        pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                        expires)
+            return value
+
+    def clear(self):
+        mapping = self._map()
+        with mapping.lock:
+            # Блокировка всего файла ждёт все блокировки корзин
+            fcntl.lockf(mapping.fd, fcntl.LOCK_EX)
+            try:
+                for slot in range(self.slots):
+                    self._clear_slot(
+                        mapping.mm, FILE_HEADER.size + slot * self.slot_size)
+            finally:
+                fcntl.lockf(mapping.fd, fcntl.LOCK_UN)
+
+    def close(self, **kwargs):
+        # Отображение живёт всё время процесса: закрывать после каждого
+        # запроса значило бы заново открывать файл на следующем
+        pass
@@ -0,0 +1,97 @@
+"""Заполнение кеша без «стада» одинаковых вычислений.
+
+Когда популярная страница пропадает из кеша, все процессы, пришедшие
+за ней в этот момент, начали бы считать её заново: тот же подсчёт
+записей для Paginator и тот же запрос ленты. ``get_or_fill`` пускает
+считать только того, кто взял блокировку в самом кеше (``cache.add``
+атомарен в memcached, Redis и LocMem). Остальные:
+
+* получают прежнее значение, если оно есть (stale-while-revalidate);
+* иначе ждут, пока значение появится, и считают сами, только если
+  вычисление затянулось дольше WAIT_TIMEOUT.
+
+Кроме того, значение обновляется заранее с вероятностью, растущей
+к концу срока жизни (XFetch): горячий ключ перевычисляет один запрос
+до истечения, а не все сразу после.
+"""
+import math
+import random
+import time
+
+# Сколько живёт блокировка, если вычислявший процесс умер
+LOCK_TIMEOUT = 30
+# Сколько ждать чужого вычисления, когда отдать нечего
+WAIT_TIMEOUT = 3
+WAIT_STEP = 0.05
+# Сколько хранить значение после истечения, чтобы отдавать его
+# ожидающим, пока один запрос считает новое
+STALE_TIMEOUT = 60 * 5
+# Чем больше, тем раньше начинается досрочное обновление
+BETA = 1.0
+
+
+def _lock_key(key):
+    return f'{key}:fill-lock'
+
+
+def _is_fresh(entry, tag, now):
+    _, tag_, expires, delta = entry
+    if tag_ != tag:
+        return False
+    if expires is None:
+        return True
+    # 1 - random() лежит в (0, 1]: логарифм конечен
+    return now - delta * BETA * math.log(1 - random.random()) < expires
+
+
+def _fill(cache, key, compute, timeout, tag):
+    started = time.time()
+    value = compute()
+    if value is None:
+        return None
+    store(cache, key, value, timeout, tag, time.time() - started)
+    return value
+
+
+def store(cache, key, value, timeout=None, tag=None, delta=0):
+    """Кладёт значение, посчитанное за delta секунд, в формате get_or_fill.
+
+    Нужно, когда значение готово позже, чем вернулся compute(),
+    например после отдачи потокового ответа.
+    """
+    if timeout is None:
+        cache.set(key, (value, tag, None, delta), None)
+    else:
+        cache.set(key, (value, tag, time.time() + timeout, delta),
+                  timeout + STALE_TIMEOUT)
+
+
+def get_or_fill(cache, key, compute, timeout=None, tag=None):
+    """Значение из кеша или результат compute(), посчитанный одним из
+    одновременно промахнувшихся запросов.
+
+    timeout — срок свежести в секундах или None (до сброса). tag —
+    метка актуальности, например версия кеша: значение с другой меткой
+    считается устаревшим. Результат None не кешируется.
+    """
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None and _is_fresh(entry, tag, now):
+        return entry[0]
+    lock = _lock_key(key)
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            return _fill(cache, key, compute, timeout, tag)
+        finally:
+            cache.delete(lock)
+    if entry is not None:
+        return entry[0]
+    deadline = now + WAIT_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None and entry[1] == tag:
+            return entry[0]
+        if cache.get(lock) is None:
+            break
+    return compute()
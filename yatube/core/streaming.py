@@ -0,0 +1,70 @@
+"""Потоковая отдача длинных страниц.
+
+render() собирает страницу целиком, и первый байт уходит клиенту
+только после запроса ленты и отрисовки всех карточек. render_stream()
+сначала отдаёт всё, что стоит до ленты (<head> со стилями и шапку,
+браузер сразу начинает их загружать), затем каждую карточку по мере
+перебора записей и в конце остаток страницы.
+
+Цикл ленты в шаблоне оборачивается тегом ``{% stream %}`` из
+библиотеки streaming; при обычном render() тег ничего не меняет.
+
+Если отрисовка ленты упала после отправки заголовков, ответ 200 уже
+не отменить: ошибка пишется в лог, вместо оставшихся карточек
+выводится STREAM_ERROR_HTML, остаток страницы дописывается как
+обычно, а ответ помечается stream_failed и не попадает в кеш страниц.
+"""
+import logging
+
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+
+logger = logging.getLogger(__name__)
+
+STREAM_MARKER = '<!--stream-->'
+# Ключ контекста, через который теги {% stream %} отдают свои ленты
+STREAM_KEY = '_streams'
+STREAM_ERROR_HTML = ('<div class="alert alert-danger">'
+                     'Не удалось показать ленту полностью, '
+                     'обновите страницу.</div>')
+
+
+def _shell_chunks(request, shell, chunks):
+    """Части ленты с тем же режимом дыр, что был у view."""
+    previous = getattr(request, 'page_shell', False)
+    while True:
+        request.page_shell = shell
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            request.page_shell = previous
+        yield chunk
+
+
+def render_stream(request, template_name, context=None,
+                  content_type='text/html; charset=utf-8', status=200):
+    """Потоковый аналог render() для страниц с ``{% stream %}``."""
+    streams = []
+    page = render_to_string(
+        template_name, {**(context or {}), STREAM_KEY: streams}, request)
+    pieces = page.split(STREAM_MARKER)
+    shell = getattr(request, 'page_shell', False)
+
+    def content():
+        yield pieces[0]
+        for render_items, piece in zip(streams, pieces[1:]):
+            try:
+                yield from _shell_chunks(request, shell, render_items())
+            except Exception:
+                logger.exception('Ошибка при потоковой отдаче %s',
+                                 request.path)
+                response.stream_failed = True
+                yield STREAM_ERROR_HTML
+            yield piece
+
+    response = StreamingHttpResponse(content(), content_type=content_type,
+                                     status=status)
+    response.stream_failed = False
+    return response
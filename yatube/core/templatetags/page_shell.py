@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.shell import fill_holes, hole_marker
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, arg=''):
+    """Пользовательский фрагмент страницы.
+
+    Внутри cache_page_shell оставляет маркер, который заполняется
+    на каждом запросе, в остальных view фрагмент рендерится сразу.
+    """
+    marker = hole_marker(name, arg)
+    request = context.get('request')
+    if getattr(request, 'page_shell', False):
+        return mark_safe(marker)
+    return mark_safe(fill_holes(request, marker))
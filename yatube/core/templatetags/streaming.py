@@ -0,0 +1,80 @@
+from django import template
+from django.template.defaulttags import ForNode
+
+from core.streaming import STREAM_KEY, STREAM_MARKER
+
+register = template.Library()
+
+
+def _with_last(items):
+    """Пары (элемент, последний ли он), не зная длины заранее."""
+    items = iter(items)
+    try:
+        previous = next(items)
+    except StopIteration:
+        return
+    for item in items:
+        yield previous, False
+        previous = item
+    yield previous, True
+
+
+class StreamNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+        loops = [node for node in nodelist if isinstance(node, ForNode)]
+        if len(loops) != 1 or len(loops[0].loopvars) != 1:
+            raise template.TemplateSyntaxError(
+                "Внутри 'stream' должен быть один for с одной переменной")
+        self.loop = loops[0]
+
+    def render_items(self, context, items):
+        loop = self.loop
+        parentloop = context.get('forloop', {})
+        rendered = False
+        for index, (item, last) in enumerate(_with_last(items)):
+            rendered = True
+            forloop = {'counter0': index, 'counter': index + 1,
+                       'first': index == 0, 'last': last,
+                       'parentloop': parentloop}
+            with context.push(**{loop.loopvars[0]: item,
+                                 'forloop': forloop}):
+                yield loop.nodelist_loop.render(context)
+        if not rendered:
+            yield loop.nodelist_empty.render(context)
+
+    def render_stream(self, context):
+        loop = self.loop
+        items = loop.sequence.resolve(context, ignore_failures=True)
+        if items is None:
+            # Не bool(items): для Page это len() и запрос ленты
+            items = ()
+        for node in self.nodelist:
+            if node is loop:
+                yield from self.render_items(context, items)
+            else:
+                yield node.render_annotated(context)
+
+    def render(self, context):
+        streams = context.get(STREAM_KEY)
+        if streams is None or self.loop.is_reversed:
+            return self.nodelist.render(context)
+        # Контекст шаблона меняется дальше по ходу отрисовки:
+        # карточкам нужен его снимок на этот момент
+        snapshot = context.new(context.flatten())
+        streams.append(lambda: self.render_stream(snapshot))
+        return STREAM_MARKER
+
+
+@register.tag
+def stream(parser, token):
+    """Цикл ленты, который render_stream отдаёт по карточке.
+
+        {% stream %}{% for post in page_obj %}...{% endfor %}{% endstream %}
+
+    При обычной отрисовке ничего не меняет. В потоке из forloop
+    доступны counter, counter0, first, last и parentloop.
+    """
+    nodelist = parser.parse(('endstream',))
+    parser.delete_first_token()
+    return StreamNode(nodelist)
@@ -0,0 +1,55 @@
+"""Прогон тестов с боевыми настройками.
+
+manage.py test идёт с yatube.settings как есть, кроме того, без чего
+тесты не изолированы друг от друга (ISOLATION): файлы кешей
+в разделяемой памяти лежат во временном каталоге прогона, кеш страниц
+и кеш поиска выключены (откат транзакции между тестами не сбрасывает
+их сигналами), журнал шины не опрашивается посреди подсчёта запросов,
+а просмотры сбрасываются в базу сразу, пока она жива. Тесты, которым
+нужно другое, включают это сами через override_settings.
+"""
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+SHARED_MEMORY_BACKEND = 'core.shmcache.SharedMemoryCache'
+
+ISOLATION = {
+    'LOOKUP_CACHE': None,
+    'INVALIDATION_BUS_POLL_INTERVAL': None,
+    'VIEW_COUNTER_FLUSH_INTERVAL': 0,
+}
+
+
+def caches_in(caches, directory):
+    """Копия настройки CACHES, в которой файлы кешей в разделяемой памяти
+    лежат в directory, а кеш страниц выключен.
+    """
+    result = {
+        'pages': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    }
+    for alias, config in caches.items():
+        if config['BACKEND'] == SHARED_MEMORY_BACKEND:
+            config = dict(config, LOCATION=os.path.join(
+                directory, os.path.basename(config['LOCATION'])))
+        result.setdefault(alias, config)
+    return result
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_directory = tempfile.mkdtemp(prefix='yatube-tests-')
+        self.test_settings = override_settings(
+            CACHES=caches_in(settings.CACHES, self.cache_directory),
+            **ISOLATION)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,19 @@
+from django.test import SimpleTestCase
+
+from core.bloom import BloomFilter
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        bloom.update(range(1000))
+        bloom.add('author')
+        self.assertTrue(all(value in bloom for value in range(1000)))
+        self.assertIn('author', bloom)
+
+    def test_error_rate(self):
+        """Ложных «есть» около заданной доли при полном заполнении."""
+        bloom = BloomFilter(1000, error_rate=0.01)
+        bloom.update(range(1000))
+        false_positives = sum(value in bloom for value in range(1000, 11000))
+        self.assertLess(false_positives, 300)
@@ -0,0 +1,113 @@
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from posts.models import Group
+
+from core import bus
+from core.models import InvalidationEvent
+
+User = get_user_model()
+
+
+class InvalidationBusTests(TransactionTestCase):
+    def setUp(self):
+        self.received = []
+        self.resets = 0
+        self.handlers = {topic: list(handlers)
+                         for topic, handlers in bus._handlers.items()}
+        self.reset_handlers = list(bus._reset_handlers)
+        bus._handlers.clear()
+        bus._reset_handlers.clear()
+        bus.subscribe('group')(
+            lambda key, data: self.received.append((key, data)))
+        bus.on_reset(self.reset)
+        bus._last_seen = None
+        bus._gap_since = None
+        # Процесс стартует с непустым журналом
+        self.append('noop', '')
+        bus.poll()
+
+    def tearDown(self):
+        bus._handlers.clear()
+        bus._handlers.update(self.handlers)
+        bus._reset_handlers[:] = self.reset_handlers
+        bus._last_seen = None
+
+    def reset(self):
+        self.resets += 1
+
+    def append(self, topic, key, source='other:1', **data):
+        return bus.get_backend().append(topic, key, json.dumps(data), source)
+
+    def test_write_publishes_versioned_event(self):
+        """Запись группы публикует событие, свой процесс его не получает."""
+        group = Group.objects.create(title='Юмор', slug='humor',
+                                     description='Описание')
+        event = InvalidationEvent.objects.get(topic='group')
+        self.assertEqual(event.key, str(group.pk))
+        self.assertEqual(json.loads(event.data), {'slug': 'humor'})
+        self.assertEqual(bus.poll(), 1)
+        self.assertEqual(self.received, [])
+        self.assertEqual(bus.version(), event.pk)
+
+    def test_events_of_other_processes_are_applied(self):
+        """События других процессов доходят до подписчиков по порядку."""
+        self.append('group', 1, slug='humor')
+        self.append('post', 2, author='author_user', groups=[])
+        self.append('group', 3, slug='books')
+        bus.poll()
+        self.assertEqual(self.received, [('1', {'slug': 'humor'}),
+                                         ('3', {'slug': 'books'})])
+
+    def test_restarted_process_starts_from_tail(self):
+        """После перезапуска старые события не применяются повторно."""
+        self.append('group', 1, slug='humor')
+        bus._last_seen = None
+        bus.poll()
+        self.append('group', 2, slug='books')
+        bus.poll()
+        self.assertEqual(self.received, [('2', {'slug': 'books'})])
+
+    def test_lost_log_resets_caches(self):
+        """Если нужные события удалены из журнала, кеши сбрасываются."""
+        for i in range(3):
+            self.append('group', i, slug='humor')
+        InvalidationEvent.objects.filter(
+            pk__lte=bus.version() + 2).delete()
+        with self.assertLogs('core.bus', 'WARNING'):
+            bus.poll()
+        self.assertEqual(self.resets, 1)
+        self.assertEqual(self.received, [])
+
+    def test_gap_is_reread_until_timeout(self):
+        """Перед дырой в журнале версия не сдвигается до таймаута."""
+        first = self.append('group', 1, slug='humor')
+        self.append('group', 2, slug='books')
+        self.append('group', 3, slug='auto')
+        InvalidationEvent.objects.filter(pk=first + 1).delete()
+        bus.poll()
+        self.assertEqual(bus.version(), first)
+        with override_settings(INVALIDATION_BUS_GAP_TIMEOUT=0):
+            bus.poll()
+        self.assertEqual(bus.version(), first + 2)
+        self.assertEqual([key for key, _ in self.received],
+                         ['1', '3', '3'])
+
+    @override_settings(INVALIDATION_BUS_POLL_INTERVAL=0)
+    def test_middleware_polls_before_request(self):
+        """Запрос видит события, опубликованные до него."""
+        self.append('group', 1, slug='humor')
+        with mock.patch.object(bus, '_polled_at', 0):
+            self.client.get(reverse('about:author'))
+        self.assertEqual(self.received, [('1', {'slug': 'humor'})])
+
+    def test_prune_keeps_last_event(self):
+        """Очистка журнала оставляет последнее событие."""
+        last = self.append('group', 1, slug='humor')
+        self.assertEqual(bus.get_backend().prune(
+            InvalidationEvent.objects.get(pk=last).created.replace(
+                year=3000)), 1)
+        self.assertEqual(bus.get_backend().last_version(), last)
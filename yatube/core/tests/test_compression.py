@@ -0,0 +1,137 @@
+import gzip
+import zlib
+
+import brotli
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from core.middleware.compression import (CompressionMiddleware,
+                                         choose_encoding)
+from posts.models import Post
+
+User = get_user_model()
+
+BODY = '<div class="card">Карточка записи</div>\n' * 50
+
+
+def reused_count():
+    return metrics.counter('compression_reused_total', '',
+                           encoding='gzip').value()
+
+
+@override_settings(STREAMING_PAGES=False)
+class CompressionMiddlewareTests(TestCase):
+    def setUp(self):
+        caches['metrics'].clear()
+        self.factory = RequestFactory()
+
+    def process(self, response, accept='gzip', middleware=None):
+        middleware = middleware or CompressionMiddleware(lambda r: response)
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept)
+        return middleware(request)
+
+    def test_negotiation(self):
+        """Выбор кодировки учитывает веса q и предпочитает brotli."""
+        self.assertEqual(choose_encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(choose_encoding('br;q=0, gzip'), 'gzip')
+        self.assertEqual(choose_encoding('br;q=0.5, gzip;q=0.8'), 'gzip')
+        self.assertEqual(choose_encoding('*'), 'br')
+        self.assertIsNone(choose_encoding('identity'))
+        self.assertIsNone(choose_encoding(''))
+
+    def test_page_compressed_for_client(self):
+        """Страница сжимается, Vary учитывает Accept-Encoding."""
+        Post.objects.create(author=User.objects.create(username='author'),
+                            text='Текст')
+        plain = self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_brotli(self):
+        response = self.process(HttpResponse(BODY), accept='br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content).decode(), BODY)
+        self.assertEqual(response['Content-Length'],
+                         str(len(response.content)))
+
+    def test_skips_small_and_encoded_bodies(self):
+        """Маленькие, уже сжатые и бинарные ответы не трогаются."""
+        encoded = HttpResponse(BODY)
+        encoded['Content-Encoding'] = 'identity'
+        no_transform = HttpResponse(BODY)
+        no_transform['Cache-Control'] = 'no-transform'
+        cases = [(HttpResponse('ok'), 'ok'), (encoded, BODY),
+                 (no_transform, BODY),
+                 (HttpResponse(BODY, content_type='image/png'), BODY)]
+        for response, content in cases:
+            with self.subTest(content=content[:10]):
+                processed = self.process(response)
+                self.assertNotEqual(
+                    processed.get('Content-Encoding'), 'gzip')
+                self.assertEqual(processed.content.decode(), content)
+
+    def test_streaming_chunks_are_flushed(self):
+        """Каждая часть потока распаковывается, не дожидаясь конца."""
+        response = self.process(StreamingHttpResponse(
+            iter(['<header>', BODY, '</footer>'])))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = iter(response.streaming_content)
+        self.assertEqual(decompressor.decompress(next(chunks)), b'<header>')
+        rest = b''.join(decompressor.decompress(chunk) for chunk in chunks)
+        self.assertEqual(rest.decode(), BODY + '</footer>')
+
+    def test_identical_bodies_are_reused(self):
+        """Повторное тело пережимается один раз, дальше отдаётся готовым."""
+        middleware = CompressionMiddleware(lambda r: HttpResponse(BODY))
+        bodies = [self.process(None, middleware=middleware).content
+                  for _ in range(4)]
+        self.assertEqual(reused_count(), 2)
+        self.assertEqual(bodies[1], bodies[2])
+        for body in bodies:
+            self.assertEqual(gzip.decompress(body).decode(), BODY)
+
+    def test_no_bytes_shared_between_different_bodies(self):
+        """Другое тело той же длины не получает чужие сжатые байты."""
+        responses = iter([HttpResponse(BODY),
+                          HttpResponse(BODY.replace('Карточка', 'Запись!!'))])
+        middleware = CompressionMiddleware(lambda r: next(responses))
+        first = self.process(None, middleware=middleware)
+        second = self.process(None, middleware=middleware)
+        self.assertEqual(gzip.decompress(first.content).decode(), BODY)
+        self.assertIn('Запись!!', gzip.decompress(second.content).decode())
+
+    def test_etag_is_weakened_and_still_validates(self):
+        """Слабый ETag сжатой ленты годится для If-None-Match."""
+        url = reverse('posts:index_rss')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        cached = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip',
+                                 HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_metrics_report_compression(self):
+        """/metrics/ показывает байты до и после сжатия и время."""
+        self.process(HttpResponse(BODY))
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            f'compression_input_bytes_total{{encoding="gzip"}} '
+            f'{len(BODY.encode())}', text)
+        self.assertIn('compression_output_bytes_total{encoding="gzip"}',
+                      text)
+        self.assertIn('compression_cpu_seconds_total{encoding="gzip"}',
+                      text)
+
+    def test_metrics_hidden_from_outside(self):
+        response = self.client.get(reverse('metrics'),
+                                   REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,157 @@
+import copy
+import os
+import re
+from html.parser import HTMLParser
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.template import Engine
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.loaders import MinifyingLoader, minify_html, should_minify
+from posts.models import Group, Post
+
+User = get_user_model()
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+             'link', 'meta', 'source', 'track', 'wbr'}
+RAW_TAGS = {'pre', 'textarea', 'script', 'style'}
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+class DomBuilder(HTMLParser):
+    """Дерево (тег, атрибуты, дети) в том виде, как его видит браузер.
+
+    Пробелы в тексте схлопываются, кроме <pre>, <textarea>, <script>
+    и <style>; комментарии и значения токенов CSRF пропускаются.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = ('#root', (), [])
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        if ('name', 'csrfmiddlewaretoken') in attrs:
+            # Маска токена CSRF своя в каждом ответе
+            attrs = [(name, value) for name, value in attrs
+                     if name != 'value']
+        node = (tag, tuple(attrs), [])
+        self.stack[-1][2].append(node)
+        if tag not in VOID_TAGS:
+            self.stack.append(node)
+
+    def handle_endtag(self, tag):
+        tags = [node[0] for node in self.stack]
+        if tag not in tags[1:]:
+            self.stack[-1][2].append(('/' + tag, (), []))
+            return
+        while self.stack.pop()[0] != tag:
+            pass
+
+    def handle_data(self, data):
+        children = self.stack[-1][2]
+        if children and isinstance(children[-1], str):
+            children[-1] += data
+        else:
+            children.append(data)
+
+    def handle_decl(self, decl):
+        self.stack[-1][2].append(('!' + decl, (), []))
+
+    def normalize(self, node, raw=False):
+        tag, attrs, children = node
+        raw = raw or tag in RAW_TAGS
+        normalized = []
+        for child in children:
+            if isinstance(child, str):
+                if not raw:
+                    child = WHITESPACE_RE.sub(' ', child)
+                normalized.append(child)
+            else:
+                normalized.append(self.normalize(child, raw))
+        return (tag, attrs, normalized)
+
+
+def dom(html):
+    builder = DomBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.normalize(builder.root)
+
+
+def template_names():
+    for directory, _, files in os.walk(settings.TEMPLATES_DIR):
+        for name in files:
+            path = os.path.join(directory, name)
+            yield os.path.relpath(path, settings.TEMPLATES_DIR), path
+
+
+PLAIN_TEMPLATES = copy.deepcopy(settings.TEMPLATES)
+PLAIN_TEMPLATES[0]['OPTIONS']['loaders'] = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+@override_settings(STREAMING_PAGES=False)
+class MinifyingLoaderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Текст *записи*\n\nАбзац')
+
+    def test_every_template_keeps_its_dom(self):
+        """Сжатый шаблон разбирается в то же дерево, что и исходный."""
+        for name, path in template_names():
+            if not should_minify(name):
+                continue
+            with self.subTest(template=name):
+                with open(path, encoding='utf-8') as source:
+                    html = source.read()
+                self.assertEqual(dom(minify_html(html)), dom(html))
+
+    def test_raw_elements_and_template_tags_untouched(self):
+        html = ('<div>\n    <pre>  a\n    b</pre>\n'
+                '<textarea>\n  x\n</textarea><script>\n  // c\n  f()\n'
+                '</script>{% if a  ==  "x\n  y" %}<!-- c -->'
+                '<!--[if IE]>ie<![endif]-->\n  </div>')
+        self.assertEqual(
+            minify_html(html),
+            '<div>\n<pre>  a\n    b</pre>\n<textarea>\n  x\n</textarea>'
+            '<script>\n  // c\n  f()\n</script>{% if a  ==  "x\n  y" %}'
+            '<!--[if IE]>ie<![endif]-->\n</div>')
+
+    def test_email_templates_not_minified(self):
+        """Текст писем сохраняет переводы строк и отступы."""
+        name = 'users/password_reset_email.html'
+        loader = MinifyingLoader(Engine.get_default(), [
+            'django.template.loaders.filesystem.Loader'])
+        origin = next(loader.get_template_sources(name))
+        with open(os.path.join(settings.TEMPLATES_DIR, name),
+                  encoding='utf-8') as source:
+            self.assertEqual(loader.get_contents(origin), source.read())
+
+    def test_rendered_pages_keep_dom_and_shrink(self):
+        """Страницы с сжатыми шаблонами меньше, а дерево то же."""
+        self.client.force_login(self.user)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('about:tech'),
+        )
+        for url in urls:
+            with self.subTest(url=url), mock.patch(
+                    'posts.counters.view_counter.record'):
+                minified = self.client.get(url).content.decode()
+                with override_settings(TEMPLATES=PLAIN_TEMPLATES):
+                    plain = self.client.get(url).content.decode()
+                self.assertLess(len(minified), len(plain))
+                self.assertEqual(dom(minified), dom(plain))
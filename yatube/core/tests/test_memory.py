@@ -0,0 +1,90 @@
+import tracemalloc
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from about.views import AboutTechView
+from core import metrics
+from core.middleware import memory
+
+LEAKED = []
+
+
+def leaky_context(view, **kwargs):
+    LEAKED.append(bytearray(3 * 2 ** 20))
+    return {}
+
+
+def series(view, name):
+    return [line for line in metrics.render().splitlines()
+            if line.startswith(name) and f'view="{view}"' in line]
+
+
+@override_settings(MEMORY_TRACKING=True, MEMORY_SNAPSHOT_RATE=1)
+class MemoryTrackingTests(TestCase):
+    def setUp(self):
+        caches['metrics'].clear()
+        self.addCleanup(tracemalloc.stop)
+        self.addCleanup(LEAKED.clear)
+        self.addCleanup(memory._site_series.clear)
+
+    @override_settings(MEMORY_RETAINED_THRESHOLD=2 ** 30)
+    def test_histograms(self):
+        """Пик и удержанное по view попадают в гистограммы /metrics/."""
+        self.client.get(reverse('about:author'))
+        self.assertIn(
+            'request_memory_peak_bytes_count{view="about:author"} 1',
+            series('about:author', 'request_memory_peak_bytes_count'))
+        self.assertIn(
+            'request_memory_retained_bytes_bucket'
+            '{le="+Inf",view="about:author"} 1',
+            series('about:author', 'request_memory_retained_bytes_bucket'))
+
+    def test_retaining_request(self):
+        """Удержавший память запрос в логе вместе с местом выделения."""
+        with mock.patch.object(AboutTechView, 'get_context_data',
+                               leaky_context), \
+                self.assertLogs('core.middleware.memory', 'WARNING') as logs:
+            self.client.get(reverse('about:tech'))
+        self.assertIn('core/tests/test_memory.py:', logs.output[0])
+        self.assertIn(
+            'memory_retaining_requests_total{view="about:tech"} 1',
+            series('about:tech', 'memory_retaining_requests_total'))
+        [site] = [line for line in series(
+            'about:tech', 'memory_retained_site_bytes_total')
+            if 'test_memory.py' in line]
+        self.assertGreaterEqual(int(site.rsplit(' ', 1)[1]), 3 * 2 ** 20)
+        self.assertIn('request_memory_retained_bytes_bucket'
+                      '{le="1048576",view="about:tech"} 0',
+                      series('about:tech',
+                             'request_memory_retained_bytes_bucket'))
+
+    @override_settings(MEMORY_RETAINED_THRESHOLD=2 ** 30)
+    def test_without_reset_peak(self):
+        """На Python до 3.9 считается только удержанное."""
+        with mock.patch.object(memory, 'HAS_RESET_PEAK', False), \
+                mock.patch.object(tracemalloc, 'reset_peak',
+                                  side_effect=AssertionError, create=True):
+            self.client.get(reverse('about:author'))
+        # Серии прошлых тестов остаются в реестре с нулями
+        self.assertNotIn(
+            'request_memory_peak_bytes_count{view="about:author"} 1',
+            series('about:author', 'request_memory_peak_bytes_count'))
+        self.assertIn(
+            'request_memory_retained_bytes_count{view="about:author"} 1',
+            series('about:author', 'request_memory_retained_bytes_count'))
+
+    @override_settings(MEMORY_SITE_SERIES_LIMIT=0)
+    def test_site_series_are_bounded(self):
+        """Места сверх лимита серий копятся в site="other"."""
+        with mock.patch.object(AboutTechView, 'get_context_data',
+                               leaky_context), \
+                self.assertLogs('core.middleware.memory', 'WARNING'):
+            self.client.get(reverse('about:tech'))
+        sites = [line for line in series(
+            'about:tech', 'memory_retained_site_bytes_total')
+            if not line.endswith(' 0')]
+        self.assertTrue(sites)
+        self.assertTrue(all('site="other"' in line for line in sites))
@@ -0,0 +1,35 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from core import metrics
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        caches['metrics'].clear()
+
+    def test_render_shows_series_of_other_processes(self):
+        """/metrics/ отдаёт серии, заведённые только другим процессом."""
+        with mock.patch.dict(metrics._registry, clear=True):
+            metrics.counter('test_jobs_total', 'Задачи', queue='mail').inc(3)
+            metrics.histogram('test_job_seconds', 'Время задачи',
+                              [1, 10]).observe(5)
+        # Реестр этого процесса серий не знает
+        with mock.patch.dict(metrics._registry, clear=True):
+            lines = metrics.render().splitlines()
+        self.assertIn('# TYPE test_jobs_total counter', lines)
+        self.assertIn('test_jobs_total{queue="mail"} 3', lines)
+        self.assertIn('test_job_seconds_bucket{le="1"} 0', lines)
+        self.assertIn('test_job_seconds_bucket{le="10"} 1', lines)
+        self.assertIn('test_job_seconds_count 1', lines)
+
+    def test_series_is_shared_once(self):
+        """Повторное объявление серии не дублирует её в общем реестре."""
+        for _ in range(2):
+            with mock.patch.dict(metrics._registry, clear=True):
+                metrics.counter('test_retries_total', 'Повторы').inc()
+        lines = metrics.render().splitlines()
+        self.assertEqual(lines.count('test_retries_total 2'), 1)
+        self.assertEqual(lines.count('# TYPE test_retries_total counter'), 1)
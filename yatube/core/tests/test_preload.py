@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from about.views import AboutTechView
+from core.preload import template_assets
+
+PAGES_CACHE = {
+    **settings.CACHES,
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-preload-pages',
+    },
+}
+
+STYLESHEET = '</static/css/bootstrap.min.css>; rel=preload; as=style'
+LOGO = '</static/img/logo1.png>; rel=preload; as=image'
+
+
+class TemplateAssetsTests(TestCase):
+    def test_assets_from_parents_and_includes(self):
+        """Статика ищется в родителях и включённых шаблонах."""
+        template = engines['django'].from_string(
+            "{% extends 'base.html' %}{% load static %}"
+            "{% block content %}{% static 'js/feed.js' %}"
+            "{% static dynamic_path %}"
+            "{% include 'includes/header.html' %}{% endblock %}")
+        self.assertEqual(
+            sorted(template_assets(template.template)),
+            [('css/bootstrap.min.css', 'style'),
+             ('img/logo1.png', 'image'),
+             ('js/feed.js', 'script')])
+
+    def test_ignored_assets(self):
+        """Иконки из PRELOAD_IGNORE не попадают в preload."""
+        template = engines['django'].get_template('base.html')
+        paths = [path for path, _ in template_assets(template.template)]
+        self.assertNotIn('img/fav/fav.ico', paths)
+
+
+@override_settings(STREAMING_PAGES=False)
+class PreloadMiddlewareTests(TestCase):
+    def test_link_header_on_pages(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn(STYLESHEET, response['Link'])
+        self.assertIn(LOGO, response['Link'])
+
+    def test_no_link_header_on_feeds(self):
+        response = self.client.get(reverse('posts:index_rss'))
+        self.assertFalse(response.has_header('Link'))
+
+    def test_early_hints_before_view(self):
+        """Со второго запроса к view ссылки уходят до её работы."""
+        events = []
+        original = AboutTechView.get_context_data
+
+        def get_context_data(view, **kwargs):
+            events.append(('view', None))
+            return original(view, **kwargs)
+
+        def send_hints(headers):
+            events.append(('hints', headers))
+
+        url = reverse('about:tech')
+        with mock.patch.object(AboutTechView, 'get_context_data',
+                               get_context_data):
+            for _ in range(2):
+                self.client.get(url, **{'wsgi.early_hints': send_hints})
+        self.assertEqual([event for event, _ in events],
+                         ['view', 'hints', 'view'])
+        headers = events[1][1]
+        self.assertEqual(headers[0][0], 'Link')
+        self.assertIn(STYLESHEET, headers[0][1])
+
+    @override_settings(CACHES=PAGES_CACHE)
+    def test_link_header_on_cached_page(self):
+        """Страница из кеша страниц тоже получает preload стилей."""
+        caches['pages'].clear()
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertIn(STYLESHEET, response['Link'])
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from about.views import AboutTechView
+from core import profiling
+
+PROFILING_DIR = tempfile.mkdtemp()
+
+
+def busy_context(view, **kwargs):
+    deadline = time.perf_counter() + 0.03
+    while time.perf_counter() < deadline:
+        pass
+    return {}
+
+
+@override_settings(PROFILING_DIR=PROFILING_DIR, PROFILING_SAMPLE_RATE=0,
+                   PROFILING_VIEWS=['about:tech'], PROFILING_INTERVAL=0.001,
+                   STREAMING_PAGES=False)
+@mock.patch.object(AboutTechView, 'get_context_data', busy_context)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+
+    def profiles(self):
+        return list(profiling.load(PROFILING_DIR))
+
+    def test_profiled_view(self):
+        """Профиль view из PROFILING_VIEWS со стеками и SQL."""
+        self.client.get(reverse('about:tech'))
+        self.client.get(reverse('posts:index'))
+        [profile] = self.profiles()
+        self.assertEqual(profile['view'], 'about:tech')
+        self.assertEqual(profile['reason'], 'view')
+        self.assertGreaterEqual(profile['duration_ms'], 30)
+        self.assertTrue(any('busy_context' in stack
+                            for stack in profile['stacks']))
+
+    @override_settings(PROFILING_VIEWS=[])
+    def test_sql_stats(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1):
+            self.client.get(reverse('posts:index'))
+        [profile] = self.profiles()
+        self.assertEqual(profile['reason'], 'sample')
+        self.assertGreater(profile['sql_count'], 0)
+
+    @override_settings(PROFILING_VIEWS=[], PROFILING_SLOW_MS=20)
+    def test_slow_only(self):
+        """При пороге сохраняются только медленные запросы."""
+        self.client.get(reverse('about:author'))
+        self.client.get(reverse('about:tech'))
+        self.assertEqual([profile['view'] for profile in self.profiles()],
+                         ['about:tech'])
+
+    def test_merge_command(self):
+        for _ in range(2):
+            self.client.get(reverse('about:tech'))
+        output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output)
+        out = StringIO()
+        call_command('merge_profiles', output=output, stdout=out)
+        self.assertIn('about:tech: запросов 2', out.getvalue())
+        with open(os.path.join(output, 'about.tech.collapsed')) as file:
+            lines = file.read().splitlines()
+        merged = profiling.merge(self.profiles())['about:tech']
+        self.assertEqual(len(lines), len(merged.stacks))
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertEqual(int(count), merged.stacks[stack])
@@ -0,0 +1,212 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from core.middleware.admission import AdmissionControlMiddleware
+from core.middleware.ratelimit import client_ip, take_token
+
+User = get_user_model()
+
+RATELIMIT_CACHE = {
+    **settings.CACHES,
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-ratelimit',
+    },
+}
+
+
+@override_settings(CACHES=RATELIMIT_CACHE, RATE_LIMITS={
+    'users:login': {'ip': '3/m'},
+    'posts:post_create': {'user': '2/m'},
+})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        caches['ratelimit'].clear()
+
+    def test_bucket_refills_over_time(self):
+        """Ведро пропускает всплеск и пополняется со временем."""
+        cache = caches['ratelimit']
+        self.assertEqual([take_token(cache, 'k', '2/m', now=0)
+                          for _ in range(2)], [0, 0])
+        self.assertEqual(take_token(cache, 'k', '2/m', now=0), 30)
+        self.assertEqual(take_token(cache, 'k', '2/m', now=30), 0)
+
+    def test_login_is_limited_per_ip(self):
+        """Четвёртая попытка входа за минуту получает 429."""
+        url = reverse('users:login')
+        data = {'username': 'nobody', 'password': 'wrong'}
+        for _ in range(3):
+            self.assertEqual(self.client.post(url, data).status_code, 200)
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+        other = Client(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other.post(url, data).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_post_create_is_limited_per_user(self):
+        """Лимит на пользователя не зависит от адреса."""
+        user = User.objects.create_user(username='author_user')
+        url = reverse('posts:post_create')
+        for i, address in enumerate(('10.0.0.1', '10.0.0.2', '10.0.0.3')):
+            client = Client(REMOTE_ADDR=address)
+            client.force_login(user)
+            response = client.post(url, {'text': f'Запись {i}'})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_client_ip_behind_proxy(self):
+        """За доверенным прокси лимит считается по адресу клиента."""
+        url = reverse('users:login')
+        data = {'username': 'nobody', 'password': 'wrong'}
+        proxy = Client(REMOTE_ADDR='10.0.0.1')
+        for _ in range(3):
+            response = proxy.post(url, data,
+                                  HTTP_X_FORWARDED_FOR='203.0.113.1')
+            self.assertEqual(response.status_code, 200)
+        response = proxy.post(url, data, HTTP_X_FORWARDED_FOR='203.0.113.1')
+        self.assertEqual(response.status_code, 429)
+        response = proxy.post(url, data, HTTP_X_FORWARDED_FOR='203.0.113.2')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_client_ip(self):
+        factory = RequestFactory()
+        cases = [
+            ('10.0.0.1', None, '10.0.0.1'),
+            ('10.0.0.1', '203.0.113.1', '203.0.113.1'),
+            ('10.0.0.1', '1.1.1.1, 203.0.113.1, 10.0.0.2', '203.0.113.1'),
+            # Заголовок от клиента без прокси не считается
+            ('203.0.113.1', '1.1.1.1', '203.0.113.1'),
+        ]
+        for remote, forwarded, expected in cases:
+            with self.subTest(remote=remote, forwarded=forwarded):
+                extra = {'REMOTE_ADDR': remote}
+                if forwarded:
+                    extra['HTTP_X_FORWARDED_FOR'] = forwarded
+                self.assertEqual(client_ip(factory.get('/', **extra)),
+                                 expected)
+
+
+# Лимиты из настроек проекта, до подмены в тестах
+VIEW_LIMITS = settings.ADMISSION_VIEW_LIMITS
+
+
+def admission(view):
+    """Middleware вокруг view, как их вызывает обработчик Django:
+    сначала process_view по найденной view, затем сама view.
+    """
+    def get_response(request):
+        match = resolve(request.path_info)
+        return middleware.process_view(
+            request, match.func, match.args, match.kwargs) or view(request)
+
+    middleware = AdmissionControlMiddleware(get_response)
+    return middleware
+
+
+@override_settings(ADMISSION_VIEW_LIMITS={'posts.views.index': 1})
+class AdmissionControlTests(TestCase):
+    def setUp(self):
+        caches['admission'].clear()
+
+    def test_overloaded_view_sheds_requests(self):
+        """Запрос сверх лимита view сразу получает 503 с Retry-After."""
+        entered = threading.Event()
+        release = threading.Event()
+
+        def slow_view(request):
+            if request.path == '/':
+                entered.set()
+                release.wait(5)
+            return HttpResponse()
+
+        middleware = admission(slow_view)
+        factory = RequestFactory()
+        worker = threading.Thread(
+            target=middleware, args=(factory.get('/'),))
+        worker.start()
+        self.assertTrue(entered.wait(5))
+        try:
+            response = middleware(factory.get('/'))
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '1')
+            # Другие view не страдают
+            response = middleware(factory.get(reverse('about:author')))
+            self.assertEqual(response.status_code, 200)
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(middleware(factory.get('/')).status_code, 200)
+
+    def test_limit_is_shared_between_processes(self):
+        """Счётчик общий: запрос в другом процессе тоже занимает место."""
+        entered = threading.Event()
+        release = threading.Event()
+
+        def slow_view(request):
+            entered.set()
+            release.wait(5)
+            return HttpResponse()
+
+        factory = RequestFactory()
+        # Отдельные экземпляры — как middleware разных процессов
+        worker = threading.Thread(
+            target=admission(slow_view),
+            args=(factory.get('/'),))
+        worker.start()
+        self.assertTrue(entered.wait(5))
+        try:
+            other = admission(lambda request: HttpResponse())
+            self.assertEqual(other(factory.get('/')).status_code, 503)
+        finally:
+            release.set()
+            worker.join()
+
+    def test_streamed_response_holds_slot_until_closed(self):
+        """Потоковый ответ держит место, пока тело не отдано."""
+        middleware = admission(
+            lambda request: StreamingHttpResponse(iter([b'a', b'b'])))
+        factory = RequestFactory()
+        response = middleware(factory.get('/'))
+        self.assertEqual(middleware(factory.get('/')).status_code, 503)
+        self.assertEqual(b''.join(response.streaming_content), b'ab')
+        response.close()
+        self.assertEqual(middleware(factory.get('/')).status_code, 200)
+
+    def test_expired_counter_stays_non_negative(self):
+        """Запрос, переживший свой счётчик, не уводит новый ниже нуля."""
+        cache = caches['admission']
+        key = 'admission:posts.views.index'
+        middleware = admission(
+            lambda request: StreamingHttpResponse(iter([b'a'])))
+        factory = RequestFactory()
+        response = middleware(factory.get('/'))
+        # Счётчик истёк и начат заново, пока ответ отдавался
+        cache.delete(key)
+        cache.add(key, 0)
+        response.close()
+        self.assertEqual(cache.get(key), 0)
+        # Лимит по-прежнему один запрос, а не два
+        response = middleware(factory.get('/'))
+        self.assertEqual(middleware(factory.get('/')).status_code, 503)
+        response.close()
+
+    @override_settings(ADMISSION_MAX_IN_FLIGHT=0,
+                       ADMISSION_VIEW_LIMITS=VIEW_LIMITS)
+    def test_probes_are_not_limited(self):
+        """Проба готовности и метрики не отсекаются, остальное — да."""
+        self.assertEqual(self.client.get(reverse('ready')).status_code, 200)
+        self.assertNotEqual(
+            self.client.get(reverse('metrics')).status_code, 503)
+        self.assertEqual(
+            self.client.get(reverse('about:author')).status_code, 503)
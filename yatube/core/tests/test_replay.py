@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core import replay
+
+User = get_user_model()
+
+LOG = '''\
+10.0.0.1 - - [10/Oct/2024:13:55:36 +0000] "GET / HTTP/1.1" 200 5123
+10.0.0.2 - leo [10/Oct/2024:13:55:37 +0000] "GET /create/ HTTP/1.1" 200 \
+812 "http://127.0.0.1/" "Mozilla/5.0"
+10.0.0.3 - - [10/Oct/2024:13:55:37 +0000] "GET /create/ HTTP/1.1" 302 0
+10.0.0.3 - - [10/Oct/2024:13:55:38 +0000] "POST /auth/login/ HTTP/1.1" 302 0
+garbage
+10.0.0.1 - - [10/Oct/2024:13:55:39 +0000] "GET /profile/leo/?page=2 \
+HTTP/1.1" 200 900 "-" "curl/8.0"
+10.0.0.4 - - [10/Oct/2024:13:55:40 +0000] "GET /no/such/ HTTP/1.1" 404 0
+'''
+
+
+class ReplayTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='leo')
+        User.objects.create_user(username='лев')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.log = os.path.join(self.directory, 'access.log')
+        with open(self.log, 'w') as file:
+            file.write(LOG)
+
+    def test_parse(self):
+        entries, skipped = replay.read_log(LOG.splitlines())
+        self.assertEqual(skipped, 2)
+        self.assertEqual([entry.path for entry in entries],
+                         ['/', '/create/', '/create/', '/profile/leo/',
+                          '/no/such/'])
+        combined = entries[1]
+        self.assertEqual((combined.user, combined.referer, combined.agent),
+                         ('leo', 'http://127.0.0.1/', 'Mozilla/5.0'))
+        self.assertEqual(entries[3].query, 'page=2')
+        self.assertIsNone(entries[3].referer)
+        self.assertEqual(entries[4].time - entries[0].time, 4)
+
+    def test_replay_with_sessions(self):
+        """Запросы пользователя из журнала идут с его сессией."""
+        entries, _ = replay.read_log(LOG.splitlines())
+        results, _ = replay.replay(entries)
+        self.assertEqual(
+            [(result.pattern, result.status) for result in results],
+            [('posts:index', 200), ('posts:post_create', 200),
+             ('posts:post_create', 302), ('posts:profile', 200),
+             (replay.UNRESOLVED, 404)])
+        self.assertTrue(all(result.status == result.logged_status
+                            for result in results))
+
+    def test_non_ascii_path(self):
+        """Адрес не в ASCII доходит до Django как байты в latin-1."""
+        line = ('10.0.0.1 - - [10/Oct/2024:13:55:36 +0000] '
+                '"GET /profile/%D0%BB%D0%B5%D0%B2/ HTTP/1.1" 200 900')
+        entries, _ = replay.read_log([line])
+        self.assertEqual(entries[0].path,
+                         '/profile/лев/'.encode().decode('latin-1'))
+        results, _ = replay.replay(entries)
+        self.assertEqual([(result.pattern, result.status)
+                          for result in results], [('posts:profile', 200)])
+
+    def test_failed_request_is_recorded(self):
+        """Упавший запрос считается ошибкой, прогон продолжается."""
+        entries, _ = replay.read_log(LOG.splitlines())
+        statuses = iter([200, RuntimeError('сбой'), 200, 200, 404])
+
+        def call(application, environ):
+            status = next(statuses)
+            if isinstance(status, Exception):
+                raise status
+            return status
+
+        with mock.patch.object(replay, 'call', call), \
+                self.assertLogs('core.replay', 'ERROR'):
+            results, _ = replay.replay(entries, workers=2)
+        self.assertEqual(sorted(result.status for result in results),
+                         [200, 200, 200, 404, 500])
+
+    def test_summarize_and_compare(self):
+        results = [replay.Result('posts:index', 200, 200, latency / 1000)
+                   for latency in range(1, 101)]
+        base = replay.summarize(results, 10)['posts:index']
+        self.assertEqual((base['requests'], base['rps']), (100, 10.0))
+        self.assertEqual((base['p50_ms'], base['p90_ms'], base['p99_ms']),
+                         (50.0, 90.0, 99.0))
+        slower = dict(base, p99_ms=base['p99_ms'] * 1.5, rps=9.5)
+        self.assertEqual(
+            replay.compare({'posts:index': base}, {'posts:index': slower}),
+            [('posts:index', 'p99_ms', 99.0, 148.5)])
+
+    def test_command(self):
+        saved = os.path.join(self.directory, 'run.json')
+        out = StringIO()
+        call_command('replay_log', self.log, save=saved, stdout=out)
+        self.assertIn('Запросов 5', out.getvalue())
+        self.assertIn('posts:post_create', out.getvalue())
+        with open(saved) as file:
+            summary = json.load(file)
+        self.assertEqual(summary['posts:post_create']['requests'], 2)
+        # Прошлый прогон в тысячу раз быстрее: регрессия
+        for row in summary.values():
+            for metric in ('p50_ms', 'p90_ms', 'p99_ms'):
+                row[metric] /= 1000
+        replay.save(summary, saved)
+        with self.assertRaisesMessage(CommandError, 'Регрессий'):
+            call_command('replay_log', self.log, compare=saved,
+                         stdout=StringIO())
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import (Client, RequestFactory, TestCase,
+                         override_settings)
+from django.urls import reverse
+from posts.counters import view_counter
+from posts.models import Group, Post
+
+from core import shell, singleflight
+
+User = get_user_model()
+
+PAGES_CACHE = {
+    **settings.CACHES,
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-pages',
+    },
+}
+
+
+# Просмотры копятся в буфере, чтобы не мешать подсчёту запросов
+@override_settings(CACHES=PAGES_CACHE, STREAMING_PAGES=False,
+                   VIEW_COUNTER_FLUSH_INTERVAL=3600)
+class PageShellTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author_user = User.objects.create_user(username='author_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author_user,
+            group=cls.group,
+            text='Тестовый текст!!!',
+        )
+
+    def setUp(self):
+        caches['pages'].clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PageShellTests.author_user)
+        # Ключи: страницы. Значения: запросы при попадании в кеш для
+        # пользователя — сессия, пользователь и его отметки на записях
+        self.pages = {
+            reverse('posts:index'): 3,
+            reverse('posts:group_list',
+                    kwargs={'slug': PageShellTests.group.slug}): 3,
+            reverse('posts:profile',
+                    kwargs={'username':
+                            PageShellTests.author_user.username}): 3,
+            reverse('posts:post_detail',
+                    kwargs={'post_id': PageShellTests.post.pk}): 3,
+            reverse('about:author'): 2,
+            reverse('about:tech'): 2,
+        }
+
+    def tearDown(self):
+        view_counter.flush()
+
+    def test_cached_body_is_shared_and_header_is_personal(self):
+        """Тело страницы общее, шапка своя у каждого пользователя."""
+        for url, queries in self.pages.items():
+            with self.subTest(url=url):
+                guest = self.guest_client.get(url).content.decode()
+                with self.assertNumQueries(queries):
+                    user = self.authorized_client.get(url).content.decode()
+                self.assertIn('Войти', guest)
+                self.assertNotIn('Выйти', guest)
+                self.assertIn('Выйти', user)
+                self.assertIn(PageShellTests.author_user.username, user)
+                self.assertNotIn('<!--hole:', guest + user)
+
+    def test_active_nav_item_on_cached_page(self):
+        """Активный пункт меню выбирается и на странице из кеша."""
+        url = reverse('about:tech')
+        self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url)
+        self.assertContains(
+            response,
+            f"<a class='nav-link active' href='{url}'>Технологии</a>",
+            html=True)
+
+    def test_new_post_invalidates_cached_pages(self):
+        """Новая запись сбрасывает закешированные страницы."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        Post.objects.create(author=PageShellTests.author_user,
+                            text='Свежая запись')
+        self.assertContains(self.guest_client.get(url), 'Свежая запись')
+
+    def test_internal_request_bypasses_stale_body(self):
+        """Публикация получает свежую страницу, пока кеш отдаёт прежнюю."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        Post.objects.create(author=PageShellTests.author_user,
+                            text='Свежая запись')
+        # Страницу уже перерисовывает другой процесс
+        key = shell._shell_key(RequestFactory().get(url))
+        caches['pages'].add(singleflight._lock_key(key), 1)
+        self.assertNotContains(self.guest_client.get(url), 'Свежая запись')
+        internal = Client(**{settings.INTERNAL_REQUEST_ENVIRON_KEY: True})
+        self.assertContains(internal.get(url), 'Свежая запись')
+        # Свежее тело попало в кеш
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url)
+        self.assertContains(response, 'Свежая запись')
+
+    def test_bus_event_resets_only_local_cache(self):
+        """Событие другого процесса не сбрасывает общий кеш повторно."""
+        version = shell._version(caches['pages'])
+        shell._content_changed('1', {})
+        self.assertNotEqual(shell._version(caches['pages']), version)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shared = {
+            **settings.CACHES,
+            'pages': {
+                'BACKEND': 'core.shmcache.SharedMemoryCache',
+                'LOCATION': os.path.join(directory, 'pages'),
+                'OPTIONS': {'SLOTS': 64, 'SLOT_SIZE': 1024},
+            },
+        }
+        with override_settings(CACHES=shared):
+            version = shell._version(caches['pages'])
+            shell._content_changed('1', {})
+            self.assertEqual(shell._version(caches['pages']), version)
+
+    def test_login_does_not_invalidate_cached_pages(self):
+        """Вход пользователя не сбрасывает кеш страниц."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        PageShellTests.author_user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.guest_client.get(url)
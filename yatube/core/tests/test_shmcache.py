@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from core.shmcache import BUCKET_SIZE, SharedMemoryCache
+
+
+def make_cache(path, **options):
+    options.setdefault('SLOTS', 64)
+    options.setdefault('SLOT_SIZE', 1024)
+    return SharedMemoryCache(path, {'OPTIONS': options})
+
+
+def increment(path, times):
+    cache = make_cache(path)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SharedMemoryCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache')
+        self.cache = make_cache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        """set, get, add, incr, delete и has_key работают как в Django."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 1))
+        self.assertEqual(self.cache.incr('new', 5), 6)
+        self.assertRaises(ValueError, self.cache.incr, 'missing')
+        self.cache.delete('key')
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('new'))
+
+    def test_entries_are_shared_between_instances(self):
+        """Другой экземпляр на том же файле видит записи."""
+        self.cache.set('key', 'value')
+        self.assertEqual(make_cache(self.path).get('key'), 'value')
+
+    def test_ttl_expiry(self):
+        """Просроченная запись не отдаётся."""
+        self.cache.set('key', 'value', 10)
+        with mock.patch('time.time', return_value=10 ** 10):
+            self.assertIsNone(self.cache.get('key'))
+        self.cache.set('forever', 'value', None)
+        with mock.patch('time.time', return_value=10 ** 10):
+            self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_lru_eviction_within_bucket(self):
+        """Переполненная корзина вытесняет давно не читанную запись."""
+        cache = make_cache(self.path, SLOTS=BUCKET_SIZE)
+        for i in range(BUCKET_SIZE):
+            cache.set(f'key{i}', i)
+        cache.get('key0')
+        cache.set('extra', 'value')
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('extra'), 'value')
+
+    def test_other_geometry_uses_other_file(self):
+        """Кеш с другими OPTIONS не переразмечает файл, который уже
+        отображён.
+        """
+        self.cache.set('key', 'value')
+        other = make_cache(self.path, SLOTS=BUCKET_SIZE)
+        other.set('key', 'other')
+        self.assertNotEqual(other.path, self.cache.path)
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_foreign_file_is_not_laid_out(self):
+        """Файл с чужим заголовком — ошибка, а не повод его усечь."""
+        cache = make_cache(os.path.join(self.directory, 'foreign'))
+        with open(cache.path, 'wb') as file:
+            file.write(b'not a cache file')
+        with self.assertRaises(ImproperlyConfigured):
+            cache.get('key')
+        with open(cache.path, 'rb') as file:
+            self.assertEqual(file.read(), b'not a cache file')
+
+    def test_oversized_value_is_not_cached(self):
+        """Значение больше слота не кешируется и не оставляет старое."""
+        self.cache.set('key', 'small')
+        self.cache.set('key', 'x' * 2048)
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_incr_is_atomic_across_processes(self):
+        """Одновременные incr из разных процессов не теряются."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=increment,
+                                     args=(self.path, 200))
+                     for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 800)
+
+    def test_incr_is_atomic_across_threads(self):
+        """Экземпляры разных потоков процесса не теряют incr друг друга."""
+        self.cache.set('counter', 0)
+        # Частое переключение потоков внутри incr
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        # Django создаёт свой экземпляр бэкенда в каждом потоке
+        threads = [threading.Thread(target=increment,
+                                    args=(self.path, 2000))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 8000)
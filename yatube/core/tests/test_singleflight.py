@@ -0,0 +1,83 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from core.singleflight import get_or_fill
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache('test-singleflight', {})
+        self.cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def slow_compute(self, value='value', delay=0.2):
+        def compute():
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def run_concurrently(self, count, target):
+        results = []
+        start = threading.Barrier(count)
+
+        def worker():
+            start.wait()
+            results.append(target())
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_misses_compute_once(self):
+        """Одновременные промахи считают значение один раз."""
+        results = self.run_concurrently(8, lambda: get_or_fill(
+            self.cache, 'page', self.slow_compute(), timeout=60))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_stale_value_is_served_while_revalidating(self):
+        """Пока один пересчитывает, остальные получают прежнее значение."""
+        get_or_fill(self.cache, 'page', lambda: 'old', tag=1)
+        results = self.run_concurrently(8, lambda: get_or_fill(
+            self.cache, 'page', self.slow_compute('new'), tag=2))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(results), ['new'] + ['old'] * 7)
+        self.assertEqual(get_or_fill(self.cache, 'page', None, tag=2),
+                         'new')
+
+    def test_waiters_compute_when_filler_is_too_slow(self):
+        """Если вычисление затянулось, ждущие считают сами."""
+        with mock.patch('core.singleflight.WAIT_TIMEOUT', 0.1):
+            results = self.run_concurrently(3, lambda: get_or_fill(
+                self.cache, 'page', self.slow_compute(delay=0.5)))
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(results, ['value'] * 3)
+
+    def test_early_refresh_before_expiry(self):
+        """Близко к истечению значение обновляется заранее."""
+        # Чем дольше считалось значение, тем раньше его обновляют
+        get_or_fill(self.cache, 'page', self.slow_compute('old', 0.05),
+                    timeout=60)
+        with mock.patch('time.time', return_value=time.time() + 59.9), \
+                mock.patch('random.random', return_value=1 - 1e-9):
+            value = get_or_fill(self.cache, 'page', lambda: 'new',
+                                timeout=60)
+        self.assertEqual(value, 'new')
+        self.assertEqual(get_or_fill(self.cache, 'page', lambda: 'newer',
+                                     timeout=60), 'new')
+
+    def test_uncacheable_result_is_not_stored(self):
+        """None не кешируется: следующий запрос считает заново."""
+        get_or_fill(self.cache, 'page', self.slow_compute(None, 0))
+        get_or_fill(self.cache, 'page', self.slow_compute(None, 0))
+        self.assertEqual(self.calls, 2)
@@ -0,0 +1,155 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.likes import like
+from posts.models import Group, Post
+
+from core.shell import _complete_length
+from core.streaming import STREAM_ERROR_HTML
+from core.templatetags.streaming import StreamNode
+
+User = get_user_model()
+
+PAGES_CACHE = {
+    **settings.CACHES,
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-streaming-pages',
+    },
+}
+
+
+def failing_items(self, context, items):
+    yield 'первая карточка'
+    raise RuntimeError('база недоступна')
+
+
+def consume(response):
+    return b''.join(response.streaming_content).decode()
+
+
+@override_settings(STREAMING_PAGES=True)
+class StreamingRenderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author_user = User.objects.create_user(username='author_user')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        for number in range(3):
+            Post.objects.create(author=cls.author_user, group=cls.group,
+                                text=f'Запись {number}')
+
+    def setUp(self):
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author_user.username}),
+        )
+
+    def test_streamed_page_matches_rendered_page(self):
+        """Страница потоком побайтно совпадает с обычной."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.streaming)
+                streamed = consume(response)
+                with override_settings(STREAMING_PAGES=False):
+                    rendered = self.client.get(url).content.decode()
+                self.assertEqual(streamed, rendered)
+
+    def test_head_is_sent_before_feed_query(self):
+        """Первая часть с <head> и шапкой уходит до запроса ленты."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                    chunks = iter(response.streaming_content)
+                    first = next(chunks).decode()
+                    before = len(queries)
+                    list(chunks)
+                self.assertIn('bootstrap.min.css', first)
+                self.assertIn('<header>', first)
+                self.assertNotIn('Запись', first)
+                feed_queries = [
+                    query['sql'] for query in queries[before:]
+                    if 'FROM "posts_post"' in query['sql']]
+                self.assertTrue(feed_queries)
+
+    def test_error_after_headers(self):
+        """Сбой ленты после заголовков: сообщение и целая страница."""
+        with mock.patch.object(StreamNode, 'render_items', failing_items):
+            response = self.client.get(reverse('posts:index'))
+            with self.assertLogs('core.streaming', 'ERROR'):
+                content = consume(response)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.stream_failed)
+        self.assertIn('первая карточка', content)
+        self.assertIn(STREAM_ERROR_HTML, content)
+        self.assertTrue(content.rstrip().endswith('</html>'))
+
+
+@override_settings(STREAMING_PAGES=True, CACHES=PAGES_CACHE)
+class StreamingPageShellTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author_user = User.objects.create_user(username='author_user')
+        Post.objects.create(author=cls.author_user, text='Запись')
+
+    def setUp(self):
+        caches['pages'].clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author_user)
+
+    def test_streamed_page_is_cached_without_personal_parts(self):
+        """Отданная потоком страница кешируется общей для всех."""
+        url = reverse('posts:index')
+        streamed = consume(self.authorized_client.get(url))
+        self.assertIn('Выйти', streamed)
+        self.assertNotIn('<!--hole:', streamed)
+        cached = self.client.get(url)
+        self.assertFalse(cached.streaming)
+        content = cached.content.decode()
+        self.assertIn('Войти', content)
+        self.assertNotIn('Выйти', content)
+        self.assertNotIn('<!--hole:', content)
+
+    def test_failed_stream_is_not_cached(self):
+        url = reverse('posts:index')
+        with mock.patch.object(StreamNode, 'render_items', failing_items):
+            with self.assertLogs('core.streaming', 'ERROR'):
+                consume(self.client.get(url))
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertNotIn(STREAM_ERROR_HTML, consume(response))
+
+    def test_streamed_miss_resolves_likes_in_one_query(self):
+        """Отметки всех карточек потоковой страницы — один запрос."""
+        posts = [
+            Post.objects.create(author=self.author_user, text=f'Запись {i}')
+            for i in range(5)]
+        for post in posts[:2]:
+            like(self.author_user, post.pk)
+        # Сессия, пользователь, число записей, страница, отметки
+        with self.assertNumQueries(5):
+            content = consume(self.authorized_client.get(
+                reverse('posts:index')))
+        self.assertEqual(content.count('/unlike/'), 2)
+        self.assertEqual(content.count('/like/'), 4)
+        self.assertNotIn('<!--hole:', content)
+
+    def test_split_marker_waits_for_its_end(self):
+        """Маркер, разорванный между частями потока, не отдаётся."""
+        for text, length in (('<p>карточка', 11),
+                             ('<p>a</p><!--hole:like:1', 8),
+                             ('<p>a</p><!-', 8),
+                             ('<p>a</p><!--hole:like:1-->', 26),
+                             ('<p>a</p><span', 13)):
+            with self.subTest(text=text):
+                self.assertEqual(_complete_length(text), length)
@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.template import engines
+from django.test import TestCase
+from django.urls import NoReverseMatch, reverse, set_script_prefix
+
+from core.urlformats import _formats, fast_reverse
+
+User = get_user_model()
+
+USERNAMES = ['leo', 'user.name+tag@mail-box_1', 'Пользователь']
+
+
+class FastReverseTests(TestCase):
+    def tearDown(self):
+        set_script_prefix('/')
+
+    def test_parity_with_reverse(self):
+        """Адреса совпадают с reverse() для всех имён posts."""
+        samples = {'post_id': 42, 'slug': 'cats_and-dogs-1',
+                   'username': 'leo', 'name': 'sitemap-posts-2.xml'}
+        for name, (_, params, _) in _formats().items():
+            if not name.startswith('posts:'):
+                continue
+            kwargs = {param: samples[param] for param in params}
+            with self.subTest(name=name):
+                self.assertEqual(fast_reverse(name, kwargs=kwargs),
+                                 reverse(name, kwargs=kwargs))
+                args = list(kwargs.values())
+                self.assertEqual(fast_reverse(name, args),
+                                 reverse(name, args=args))
+
+    def test_usernames(self):
+        """Имена пользователей и сам User кодируются как в reverse()."""
+        for username in USERNAMES:
+            user = User(username=username)
+            for value in (username, user):
+                with self.subTest(value=value):
+                    self.assertEqual(
+                        fast_reverse('posts:profile', [value]),
+                        reverse('posts:profile', args=[value]))
+
+    def test_script_prefix(self):
+        set_script_prefix('/sub%dir/')
+        self.assertEqual(fast_reverse('posts:post_detail', [1]),
+                         reverse('posts:post_detail', args=[1]))
+
+    def test_fallback_to_reverse(self):
+        """Чего нет в таблице или не подходит, решает reverse()."""
+        self.assertEqual(fast_reverse('admin:index'), reverse('admin:index'))
+        with self.assertRaises(NoReverseMatch):
+            fast_reverse('posts:post_detail')
+        with self.assertRaises(NoReverseMatch):
+            fast_reverse('posts:post_detail', kwargs={'slug': 'cats'})
+        with self.assertRaises(NoReverseMatch):
+            fast_reverse('posts:missing')
+
+    def test_template_tag(self):
+        template = engines['django'].from_string(
+            "{% load fast_urls %}"
+            "{% fast_url 'posts:profile' author %} "
+            "{% fast_url 'posts:group_list' slug=slug %}")
+        html = template.render({'author': User(username='a&b'),
+                                'slug': 'cats'})
+        self.assertEqual(html, '/profile/a&amp;b/ /group/cats/')
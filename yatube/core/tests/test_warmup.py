@@ -0,0 +1,40 @@
+import threading
+from unittest import mock
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import TestCase
+from django.urls import reverse
+
+from core import warmup
+
+
+class WarmUpTests(TestCase):
+    def tearDown(self):
+        warmup._ready.set()
+
+    def test_ready_without_warm_up(self):
+        """Процесс, который никто не прогревает, готов сразу."""
+        response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_ready_only_after_warm_up(self):
+        """Во время прогрева в фоне /ready/ отвечает 503, после — 200."""
+        url = reverse('ready')
+        finish = threading.Event()
+        with mock.patch.object(warmup, 'warm_up',
+                               side_effect=lambda app: finish.wait(5)):
+            thread = warmup.start_warm_up(WSGIHandler())
+            self.assertEqual(self.client.get(url).status_code, 503)
+            finish.set()
+            thread.join(5)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_warm_up_without_warnings(self):
+        """Прогрев проходит все WARMUP_URLS без предупреждений."""
+        warmup._ready.clear()
+        with self.assertLogs('core.warmup', 'INFO') as logs:
+            warmup.warm_up(WSGIHandler())
+        self.assertFalse([line for line in logs.output
+                          if line.startswith('WARNING')])
+        self.assertTrue(warmup.is_ready())
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.cache import never_cache
+
+from . import metrics as counters
+from .warmup import is_ready
+
+
+@never_cache
+def ready(request):
+    """Проба готовности: 200 только после прогрева процесса."""
+    if is_ready():
+        return HttpResponse('ready', content_type='text/plain')
+    return HttpResponse('warming up', content_type='text/plain', status=503)
+
+
+@never_cache
+def metrics(request):
+    """Счётчики в формате Prometheus для внутренних адресов и staff."""
+    if (request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS
+            and not request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(counters.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,123 @@
+"""Прогрев процесса перед приёмом трафика.
+
+gunicorn загружает приложение в мастере (preload_app), а каждый
+рабочий процесс после fork запускает ``start_warm_up``: в фоновом
+потоке проверяет соединения с базой, загружает шаблоны в кеш
+загрузчика, заполняет таблицы URL-резолверов и прогоняет несколько
+запросов через весь стек. Процесс тем временем уже принимает
+запросы, но ``/ready/`` отвечает 503, пока прогрев не закончен,
+и балансировщик не шлёт процессу трафик. Процесс, который никто
+не прогревает (runserver, manage.py), готов сразу.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template import engines
+from django.template.utils import get_app_template_dirs
+from django.test import RequestFactory
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+_ready = threading.Event()
+# Без прогрева процесс готов сразу; start_warm_up снимает готовность
+_ready.set()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def _template_names(directory):
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith('.html'):
+                yield os.path.relpath(os.path.join(root, name), directory)
+
+
+def warm_templates():
+    """Загружает все шаблоны проекта в кеширующий загрузчик."""
+    loaded = 0
+    for engine in engines.all():
+        directories = list(engine.template_dirs)
+        directories += get_app_template_dirs('templates')
+        for directory in directories:
+            for name in _template_names(directory):
+                try:
+                    engine.get_template(name)
+                except Exception:
+                    # Шаблоны-фрагменты сторонних приложений могут
+                    # не собираться сами по себе
+                    continue
+                loaded += 1
+    return loaded
+
+
+def warm_urls():
+    """Заполняет таблицы reverse() корневого резолвера и пространств имён."""
+    resolvers = [get_resolver()]
+    while resolvers:
+        resolver = resolvers.pop()
+        resolver.reverse_dict
+        resolvers.extend(sub for _, sub in resolver.namespace_dict.values())
+
+
+def warm_connections():
+    for alias in connections:
+        connections[alias].ensure_connection()
+    for alias in settings.CACHES:
+        caches[alias]
+
+
+def warm_requests(application):
+    """Прогоняет WARMUP_URLS через middleware и view без сети."""
+    factory = RequestFactory(
+        **{settings.INTERNAL_REQUEST_ENVIRON_KEY: True})
+    for url in settings.WARMUP_URLS:
+        response = application.get_response(factory.get(url))
+        # Как после настоящего запроса: сигнал request_finished
+        response.close()
+        if response.status_code != 200:
+            logger.warning('Прогрев: %s ответил %s', url,
+                           response.status_code)
+
+
+def warm_up(application):
+    """Прогревает процесс и открывает /ready/."""
+    started = time.monotonic()
+    warm_connections()
+    warm_urls()
+    templates = warm_templates()
+    warm_requests(application)
+    _ready.set()
+    logger.info('Процесс %s прогрет за %.2f с, шаблонов: %s',
+                os.getpid(), time.monotonic() - started, templates)
+
+
+def _warm_up_in_background(application):
+    try:
+        warm_up(application)
+    except Exception:
+        # Процесс работает и непрогретым, просто медленнее
+        logger.exception('Прогрев процесса %s не удался', os.getpid())
+    finally:
+        # Соединения потока прогрева запросам не достанутся
+        connections.close_all()
+        _ready.set()
+
+
+def start_warm_up(application):
+    """Прогревает процесс в фоновом потоке, /ready/ отвечает 503
+    до конца прогрева.
+    """
+    _ready.clear()
+    thread = threading.Thread(target=_warm_up_in_background,
+                              args=(application,), name='warm-up',
+                              daemon=True)
+    thread.start()
+    return thread
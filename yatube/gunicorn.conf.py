@@ -0,0 +1,43 @@
+"""Конфигурация gunicorn для боевого запуска.
+
+    cd yatube && gunicorn yatube.wsgi
+
+Приложение загружается в мастере до fork, так что импортированный код
+и данные Django делят между процессами страницы памяти (copy-on-write).
+Чтобы сборщик мусора не трогал эти страницы, объекты мастера
+замораживаются (gc.freeze) перед запуском рабочих процессов. Каждый
+процесс после fork прогревается в фоне (core.warmup), и только затем
+его /ready/ начинает отвечать 200.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS',
+                             multiprocessing.cpu_count() * 2 + 1))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Перезапуск процессов понемногу и вразнобой: утечки памяти
+# не накапливаются, а процессы не перезапускаются все разом
+max_requests = 2000
+max_requests_jitter = 200
+
+
+def when_ready(server):
+    # Мастер всё импортировал и сейчас начнёт делать fork
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    from core.warmup import start_warm_up
+    from posts.lookups import start_rebuilding
+    from yatube.wsgi import application
+
+    # Потоки не переживают fork: фильтры поиска строит поток процесса
+    start_rebuilding()
+    start_warm_up(application)
@@ -1,11 +1,12 @@
 from django.contrib import admin
 
-from .models import Group, Post
+from .models import Comment, Group, Post
 
 
 class PostAdmin(admin.ModelAdmin):
     # Перечисляем поля, которые должны отображаться в админке
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'views',
+                    'likes_count')
     # Добавляем возможность изменять группу в любом посте
     list_editable = ('group',)
     # Добавляем интерфейс для поиска по тексту постов
@@ -18,3 +19,13 @@ class PostAdmin(admin.ModelAdmin):
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
+
+
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'post', 'author', 'created', 'path')
+    search_fields = ('text',)
+    # Путь вычисляется при создании, правка родителя сломала бы дерево
+    readonly_fields = ('post', 'parent')
+
+
+admin.site.register(Comment, CommentAdmin)
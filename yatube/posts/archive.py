@@ -0,0 +1,95 @@
+"""Холодный архив старых записей.
+
+Почти все чтения приходятся на свежие записи, поэтому тексты старых
+переносятся пакетами в таблицу ArchivedPost, а в posts_post остаётся
+заглушка с флагом archived. Ленты главной и групп читают только
+горячие записи по частичному индексу, а страница записи и профиль
+автора подтягивают тексты архивных записей одним запросом на страницу.
+
+Поэтому архивная запись пропадает с главной, из лент групп и их RSS
+и Atom, но остаётся в профиле автора, в его лентах и по прямой ссылке.
+Правка возвращает запись в горячую таблицу и в ленты.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from core import bus
+from core.shell import invalidate_page_shells
+
+from .models import ArchivedPost, Post
+
+# Сколько записей переносить в одной транзакции
+BATCH_SIZE = 500
+
+
+def hot_posts():
+    """Записи, которые не в архиве: выборка для лент."""
+    return Post.objects.filter(archived=False)
+
+
+def rehydrate(posts):
+    """Возвращает архивным записям из списка их тексты и HTML."""
+    archived = {post.pk: post for post in posts if post.archived}
+    if archived:
+        for pk, text, text_html in ArchivedPost.objects.filter(
+                post_id__in=archived).values_list(
+                    'post_id', 'text', 'text_html'):
+            archived[pk].text = text
+            archived[pk].text_html = text_html
+    return posts
+
+
+def archive_posts(cutoff, batch_size=BATCH_SIZE):
+    """Переносит в архив записи, опубликованные раньше cutoff.
+
+    Каждый пакет переносится в своей транзакции, так что прерванную
+    архивацию можно просто запустить ещё раз. Возвращает число записей.
+    """
+    # feeds и publishing сами читают архив через этот модуль
+    from . import publishing
+    from .feeds import invalidate_feeds
+
+    archived = 0
+    slugs = set()
+    while True:
+        with transaction.atomic():
+            batch = list(
+                hot_posts().filter(pub_date__lt=cutoff)
+                .select_for_update().order_by('pk')
+                .values_list('pk', 'text', 'text_html', 'group__slug')
+                [:batch_size])
+            if not batch:
+                break
+            ArchivedPost.objects.bulk_create(
+                ArchivedPost(post_id=pk, text=text, text_html=text_html)
+                for pk, text, text_html, _ in batch)
+            Post.objects.filter(pk__in=[row[0] for row in batch]).update(
+                text='', text_html='', archived=True)
+        archived += len(batch)
+        slugs.update(row[-1] for row in batch if row[-1])
+    if archived:
+        # update() не шлёт сигналов: ленты сбрасываются здесь,
+        # а в других процессах — по событию шины
+        feeds = [('index', '')] + [('group', slug) for slug in sorted(slugs)]
+        for kind, ident in feeds:
+            invalidate_feeds(kind, ident)
+        invalidate_page_shells()
+        bus.publish('bulk', feeds=feeds)
+        if settings.PRERENDER_ON_WRITE:
+            publishing.publish_index()
+            for slug in slugs:
+                publishing.publish_group(slug)
+    return archived
+
+
+def restore(post, fields=('text',)):
+    """Сохраняет архивную запись обратно в горячую таблицу.
+
+    post.text к этому моменту уже заполнен, например формой правки.
+    Пишутся только fields: счётчики записи тем временем меняются
+    другими запросами.
+    """
+    with transaction.atomic():
+        post.archived = False
+        post.save(update_fields=['archived', *fields])
+        ArchivedPost.objects.filter(post=post).delete()
@@ -0,0 +1,70 @@
+"""Древовидные комментарии с материализованными путями.
+
+Ветка обсуждения записи или поддерево одного комментария читается
+одним запросом по диапазону индекса (post, path), постранично:
+курсор следующей страницы — path последнего показанного комментария.
+"""
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from core.shell import register_hole
+
+from .forms import CommentForm
+from .models import Comment
+
+COMMENTS_PER_PAGE = 20
+# Глубже ответы прикрепляются к предку: путь ограничен длиной поля
+MAX_DEPTH = Comment._meta.get_field('path').max_length // Comment.PATH_STEP
+# Цифры пути меньше этого символа: [path, path + ':') — всё поддерево
+PATH_END = ':'
+
+
+def _segment(pk):
+    return str(pk).zfill(Comment.PATH_STEP)
+
+
+def create_comment(post, author, text, parent=None):
+    """Создаёт комментарий, parent — комментарий той же записи или None."""
+    while parent is not None and parent.depth + 1 >= MAX_DEPTH:
+        parent = parent.parent
+    with transaction.atomic():
+        comment = Comment.objects.create(
+            post=post, author=author, text=text, parent=parent)
+        comment.path = (parent.path if parent else '') + _segment(comment.pk)
+        Comment.objects.filter(pk=comment.pk).update(path=comment.path)
+    return comment
+
+
+def is_valid_cursor(cursor):
+    return (cursor.isdigit() and len(cursor) % Comment.PATH_STEP == 0
+            and len(cursor) <= MAX_DEPTH * Comment.PATH_STEP)
+
+
+def comments_page(post_id, after='', root=None):
+    """Страница комментариев записи или поддерева root после курсора.
+
+    Возвращает комментарии и курсор следующей страницы (или None).
+    """
+    comments = Comment.objects.filter(post_id=post_id)
+    if root is not None:
+        comments = comments.filter(path__gte=root.path,
+                                   path__lt=root.path + PATH_END)
+    if after:
+        comments = comments.filter(path__gt=after)
+    page = list(comments.select_related('author')
+                .order_by('path')[:COMMENTS_PER_PAGE + 1])
+    if len(page) > COMMENTS_PER_PAGE:
+        page = page[:COMMENTS_PER_PAGE]
+        return page, page[-1].path
+    return page, None
+
+
+@register_hole('comment_form')
+def fill_comment_forms(request, args):
+    return {
+        arg: render_to_string('posts/includes/comment_form.html', {
+            'post_id': int(arg),
+            'form': CommentForm(),
+        }, request=request)
+        for arg in args
+    }
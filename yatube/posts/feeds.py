@@ -0,0 +1,212 @@
+import hashlib
+
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date
+from django.utils.timezone import now
+
+from core import bus
+from core.singleflight import get_or_fill
+
+from .archive import hot_posts, rehydrate
+from .lookups import groups, users
+from .models import Group, User
+
+# Количество записей в одной ленте
+FEED_ITEMS = 20
+FEED_FORMATS = ('rss', 'atom')
+
+
+class LatestPostsFeed(Feed):
+    """RSS-лента последних записей сайта."""
+    title = 'Yatube: последние обновления на сайте'
+    description = 'Последние обновления на сайте'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return (hot_posts().select_related('author', 'group')
+                .defer('text')[:FEED_ITEMS])
+
+    def item_title(self, item):
+        return item.excerpt[:29]
+
+    def item_description(self, item):
+        return item.text_html
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.pk})
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        if item.group:
+            return (item.group.title,)
+        return ()
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    """RSS-лента записей сообщества."""
+
+    def get_object(self, request, slug):
+        return groups.get_or_404(slug)
+
+    def title(self, group):
+        return f'Записи сообщества {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', kwargs={'slug': group.slug})
+
+    def items(self, group):
+        return (group.posts.filter(archived=False)
+                .select_related('author', 'group')
+                .defer('text')[:FEED_ITEMS])
+
+
+class ProfilePostsFeed(LatestPostsFeed):
+    """RSS-лента записей автора."""
+
+    def get_object(self, request, username):
+        return users.get_or_404(username)
+
+    def title(self, author):
+        return f'Все посты пользователя {author.get_full_name()}'
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', kwargs={'username': author.username})
+
+    def items(self, author):
+        return rehydrate(list(author.posts.select_related(
+            'author', 'group').defer('text')[:FEED_ITEMS]))
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class GroupPostsAtomFeed(GroupPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return group.description
+
+
+class ProfilePostsAtomFeed(ProfilePostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return f'Записи пользователя {author.username}'
+
+
+def feed_cache_key(kind, ident, fmt):
+    """Ключ кеша ленты: вид ленты, slug или username и формат."""
+    ident = hashlib.md5(ident.encode()).hexdigest()
+    return f'feed:{kind}:{ident}:{fmt}'
+
+
+def invalidate_feeds(kind, ident=''):
+    """Сбрасывает сохранённые ленты во всех форматах."""
+    cache.delete_many(
+        [feed_cache_key(kind, ident, fmt) for fmt in FEED_FORMATS])
+
+
+def invalidate_all_feeds():
+    invalidate_feeds('index')
+    for slug in Group.objects.values_list('slug', flat=True):
+        invalidate_feeds('group', slug)
+    for username in User.objects.filter(
+            posts__isnull=False).distinct().values_list(
+                'username', flat=True):
+        invalidate_feeds('profile', username)
+
+
+@bus.subscribe('post')
+def _post_changed(key, data):
+    invalidate_feeds('index')
+    invalidate_feeds('profile', data['author'])
+    for slug in data['groups']:
+        invalidate_feeds('group', slug)
+
+
+@bus.subscribe('group')
+def _group_changed(key, data):
+    invalidate_feeds('group', data['slug'])
+
+
+@bus.subscribe('user')
+def _user_changed(key, data):
+    # Имя автора есть в каждой записи его ленты
+    invalidate_feeds('profile', data['username'])
+
+
+@bus.subscribe('bulk')
+def _bulk_changed(key, data):
+    # Массовое изменение записей командой: без списка — все ленты
+    if 'feeds' not in data:
+        invalidate_all_feeds()
+        return
+    for kind, ident in data['feeds']:
+        invalidate_feeds(kind, ident)
+
+
+bus.on_reset(invalidate_all_feeds)
+
+
+def cached_feed(feed, kind, fmt):
+    """Оборачивает ленту так, что XML строится один раз на изменение.
+
+    Готовая лента лежит в кеше до первой новой записи в неё, повторный
+    опрос без изменений обслуживается из кеша без обращений к базе
+    и отвечает 304, если совпали ETag или Last-Modified.
+    """
+    def view(request, **kwargs):
+        ident = next(iter(kwargs.values()), '')
+
+        def build():
+            response = feed(request, **kwargs)
+            content = response.content
+            return {
+                'content': content,
+                'content_type': response['Content-Type'],
+                'etag': quote_etag(hashlib.md5(content).hexdigest()),
+                'last_modified': int(now().timestamp()),
+            }
+
+        # Ленту после сброса строит один запрос, остальные его ждут
+        entry = get_or_fill(cache, feed_cache_key(kind, ident, fmt), build)
+        response = get_conditional_response(
+            request,
+            etag=entry['etag'],
+            last_modified=entry['last_modified'],
+        )
+        if response is None:
+            response = HttpResponse(entry['content'],
+                                    content_type=entry['content_type'])
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        return response
+    return view
+
+
+index_rss = cached_feed(LatestPostsFeed(), 'index', 'rss')
+index_atom = cached_feed(LatestPostsAtomFeed(), 'index', 'atom')
+group_rss = cached_feed(GroupPostsFeed(), 'group', 'rss')
+group_atom = cached_feed(GroupPostsAtomFeed(), 'group', 'atom')
+profile_rss = cached_feed(ProfilePostsFeed(), 'profile', 'rss')
+profile_atom = cached_feed(ProfilePostsAtomFeed(), 'profile', 'atom')
@@ -1,6 +1,7 @@
 from django import forms
 
-from .models import Post
+from .lookups import group_choices
+from .models import Comment, Post
 
 
 class PostForm(forms.ModelForm):
@@ -8,3 +9,17 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group')
         labels = {'text': 'Текст поста'}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Список групп строится один раз, а не запросом на каждую форму
+        group = self.fields['group']
+        empty = [] if group.empty_label is None else [('', group.empty_label)]
+        group.choices = empty + group_choices()
+
+
+class CommentForm(forms.ModelForm):
+    class Meta:
+        model = Comment
+        fields = ('text',)
+        labels = {'text': 'Комментарий'}
@@ -0,0 +1,279 @@
+"""Кеш поиска групп и авторов по slug и username.
+
+Ленты групп и авторов на каждый запрос ищут Group по slug и User по
+username, а форма записи каждый раз перечитывает все группы для
+списка выбора. Меняются они редко, поэтому поиск идёт сначала
+в LRU процесса, затем в общем кеше LOOKUP_CACHE и только потом
+в базе; найденное кладётся в оба кеша. Объекты из кеша общие для
+запросов процесса: менять их нельзя. Авторы хранятся урезанными
+(ключ, username и имя): хеш пароля и почта в кеш не попадают,
+остальные поля догружаются из базы при обращении.
+
+При записи и удалении сигналы posts.signals сбрасывают записи своего
+процесса и общего кеша, а другие процессы узнают о записи по шине
+(core.bus) и сбрасывают свои LRU. LOOKUP_CACHE = None отключает
+кеш: в тестах откат транзакции не шлёт сигналов, и кеш пережил бы
+удалённые объекты.
+
+Запросы к несуществующим адресам (сканеры перебирают username, slug
+и номера записей) отсекает MissingValues: промах, подтверждённый
+базой, MISS_TIMEOUT секунд отвечает 404 без запроса, пока значения
+нет в фильтре Блума существующих значений. Фильтры строит фоновый
+поток процесса (start_rebuilding, запускается после fork в gunicorn)
+раз в REBUILD_INTERVAL секунд, а не запрос; пока фильтра нет, промахи
+проверяются базой. Новые значения попадают в фильтр сразу из сигналов
+записи и по шине из других процессов, они же удаляют промах из общего
+кеша. Поэтому новый объект не считается отсутствующим: его значение
+либо уже в фильтре, либо промах по нему ещё не кеширован.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.http import Http404
+
+from core import bus
+from core.bloom import BloomFilter
+
+from .models import Group, Post, User
+
+logger = logging.getLogger(__name__)
+
+# Сколько объектов каждого вида держит LRU процесса
+LOCAL_SIZE = 1024
+# Сколько живёт запись общего кеша; сброс по записи приходит раньше
+SHARED_TIMEOUT = 60 * 60
+# Сколько помнить подтверждённый промах
+MISS_TIMEOUT = 60
+# Как часто строить фильтр существующих значений заново
+REBUILD_INTERVAL = 10 * 60
+
+
+def _cache_key(kind, model, field, value):
+    digest = hashlib.md5(str(value).encode()).hexdigest()
+    return f'{kind}:{model._meta.label_lower}:{field}:{digest}'
+
+
+class MissingValues:
+    """Отсутствующие значения уникального поля field модели model."""
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.bloom = None
+        # Значения, добавленные с начала последней перестройки
+        self.recent = set()
+        self.lock = threading.Lock()
+
+    def rebuild(self):
+        """Строит фильтр заново одним чтением таблицы."""
+        with self.lock:
+            self.recent = set()
+        values = self.model.objects.order_by().values_list(
+            self.field, flat=True)
+        values = list(values.iterator())
+        bloom = BloomFilter(2 * len(values) + 1024)
+        bloom.update(values)
+        with self.lock:
+            # Созданное во время чтения таблицы не должно потеряться
+            bloom.update(self.recent)
+            self.bloom = bloom
+
+    def add(self, value):
+        """Значение появилось в базе."""
+        with self.lock:
+            self.recent.add(value)
+            if self.bloom is not None:
+                self.bloom.add(value)
+        if settings.LOOKUP_CACHE is not None:
+            key = _cache_key('missing', self.model, self.field, value)
+            cache = caches[settings.LOOKUP_CACHE]
+            cache.delete(key)
+            # И промах, который другой процесс успел записать до фиксации
+            transaction.on_commit(lambda: cache.delete(key))
+
+    def known(self, value):
+        """Промах по value подтверждён базой и ещё действует."""
+        bloom = self.bloom
+        if bloom is None or settings.LOOKUP_CACHE is None or not caches[
+                settings.LOOKUP_CACHE].get(
+                    _cache_key('missing', self.model, self.field, value)):
+            return False
+        return value not in bloom
+
+    def record(self, value):
+        """Запоминает промах, подтверждённый базой."""
+        if settings.LOOKUP_CACHE is not None:
+            caches[settings.LOOKUP_CACHE].set(
+                _cache_key('missing', self.model, self.field, value),
+                True, MISS_TIMEOUT)
+
+
+class Lookup:
+    """Поиск model по уникальному полю field через два кеша."""
+
+    def __init__(self, model, field, fields=None, local_size=LOCAL_SIZE):
+        self.model = model
+        self.field = field
+        # Поля, которые читаются и кешируются; None — все
+        self.fields = fields
+        self.local_size = local_size
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+        self.missing = MissingValues(model, field)
+
+    def cache_key(self, value):
+        return _cache_key('lookup', self.model, self.field, value)
+
+    def _remember(self, value, obj):
+        with self.lock:
+            self.local[value] = obj
+            self.local.move_to_end(value)
+            while len(self.local) > self.local_size:
+                self.local.popitem(last=False)
+
+    def _fetch(self, value):
+        objects = self.model.objects.filter(**{self.field: value})
+        if self.fields is not None:
+            objects = objects.only(*self.fields)
+        return objects.first()
+
+    def get(self, value):
+        """Объект с field == value или None."""
+        if settings.LOOKUP_CACHE is None:
+            return self._fetch(value)
+        with self.lock:
+            obj = self.local.get(value)
+            if obj is not None:
+                self.local.move_to_end(value)
+                return obj
+        if self.missing.known(value):
+            return None
+        cache = caches[settings.LOOKUP_CACHE]
+        key = self.cache_key(value)
+        obj = cache.get(key)
+        if obj is None:
+            obj = self._fetch(value)
+            if obj is None:
+                self.missing.record(value)
+                return None
+            cache.set(key, obj, SHARED_TIMEOUT)
+        self._remember(value, obj)
+        return obj
+
+    def get_or_404(self, value):
+        obj = self.get(value)
+        if obj is None:
+            raise Http404(
+                f'{self.model._meta.object_name} {value!r} не найден')
+        return obj
+
+    def forget_local(self, pk):
+        """Убирает из LRU процесса объект с первичным ключом pk."""
+        with self.lock:
+            for value, obj in list(self.local.items()):
+                if str(obj.pk) == str(pk):
+                    del self.local[value]
+
+    def forget(self, pk, value, *old_values):
+        """Сброс после записи объекта pk со значением value."""
+        self.missing.add(value)
+        self.forget_local(pk)
+        if settings.LOOKUP_CACHE is not None:
+            caches[settings.LOOKUP_CACHE].delete_many(
+                [self.cache_key(each) for each in (value, *old_values)
+                 if each is not None])
+
+    def clear_local(self):
+        with self.lock:
+            self.local.clear()
+
+
+groups = Lookup(Group, 'slug')
+users = Lookup(User, 'username',
+               fields=('username', 'first_name', 'last_name'))
+missing_posts = MissingValues(Post, 'pk')
+
+
+def get_post_or_404(post_id):
+    if missing_posts.known(post_id):
+        raise Http404(f'Post {post_id!r} не найден')
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        missing_posts.record(post_id)
+        raise Http404(f'Post {post_id!r} не найден')
+    return post
+
+
+def rebuild_filters():
+    """Перестраивает фильтры существующих значений процесса."""
+    for missing in (groups.missing, users.missing, missing_posts):
+        missing.rebuild()
+
+
+def _rebuild_forever():
+    while True:
+        try:
+            rebuild_filters()
+        except Exception:
+            logger.exception('Не удалось перестроить фильтры поиска')
+        finally:
+            # Соединение потока не должно висеть до следующей перестройки
+            connections.close_all()
+        time.sleep(REBUILD_INTERVAL)
+
+
+def start_rebuilding():
+    """Запускает в процессе фоновую перестройку фильтров."""
+    if settings.LOOKUP_CACHE is not None:
+        threading.Thread(target=_rebuild_forever, name='lookup-filters',
+                         daemon=True).start()
+
+
+_group_choices = None
+
+
+def group_choices():
+    """Пары (pk, название) для списка групп в форме записи."""
+    global _group_choices
+    if settings.LOOKUP_CACHE is None:
+        return [(group.pk, str(group)) for group in Group.objects.all()]
+    if _group_choices is None:
+        _group_choices = [(group.pk, str(group))
+                          for group in Group.objects.all()]
+    return _group_choices
+
+
+def forget_group_choices():
+    global _group_choices
+    _group_choices = None
+
+
+@bus.subscribe('post')
+def _post_changed(key, data):
+    missing_posts.add(key)
+
+
+@bus.subscribe('group')
+def _group_changed(key, data):
+    groups.missing.add(data['slug'])
+    groups.forget_local(key)
+    forget_group_choices()
+
+
+@bus.subscribe('user')
+def _user_changed(key, data):
+    users.missing.add(data['username'])
+    users.forget_local(key)
+
+
+@bus.on_reset
+def _reset():
+    groups.clear_local()
+    users.clear_local()
+    forget_group_choices()
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from posts.archive import BATCH_SIZE, archive_posts
+
+
+class Command(BaseCommand):
+    help = 'Переносит тексты старых записей в архивную таблицу.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Архивировать записи старше этого числа дней.')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько записей переносить за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(days=options['days'])
+        archived = archive_posts(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив записей: {archived}'))
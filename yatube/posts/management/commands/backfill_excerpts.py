@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from core import bus
+from core.shell import invalidate_page_shells
+from posts.feeds import invalidate_all_feeds
+from posts.markup import make_excerpt, render_markdown
+from posts.models import Post
+
+BATCH_SIZE = 1000
+
+
+def excerpt_for(text, text_html, archived_text, archived_html):
+    """Выжимка из готового HTML, Markdown рендерится только без него."""
+    text_html = text_html or archived_html
+    if not text_html:
+        text_html = render_markdown(text or archived_text or '')
+    return make_excerpt(text_html)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет выжимки записей из сохранённого HTML, '
+            'например после миграции или смены EXCERPT_LENGTH.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать выжимки всех записей, а не только пустые.')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько записей обновлять за один запрос.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.all()
+        if not options['all']:
+            posts = posts.filter(excerpt='')
+        filled = 0
+        last = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last).order_by('pk').values_list(
+                    'pk', 'text', 'text_html',
+                    'archive__text', 'archive__text_html',
+                )[:options['batch_size']])
+            if not batch:
+                break
+            Post.objects.bulk_update(
+                [Post(pk=row[0], excerpt=excerpt_for(*row[1:]))
+                 for row in batch],
+                ['excerpt'])
+            filled += len(batch)
+            last = batch[-1][0]
+        if filled:
+            # Выжимки — заголовки записей в лентах RSS и Atom
+            invalidate_all_feeds()
+            invalidate_page_shells()
+            bus.publish('bulk')
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено выжимок: {filled}'))
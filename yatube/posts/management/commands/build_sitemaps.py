@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts.sitemaps import build_sitemaps
+
+
+class Command(BaseCommand):
+    help = ('Собирает карту сайта: перезаписывает только шарды '
+            'с новыми или изменёнными адресами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересобрать все шарды без учёта манифеста.')
+        parser.add_argument(
+            '--base-url',
+            help='Адрес сайта для ссылок, по умолчанию SITE_URL.')
+        parser.add_argument(
+            '--root',
+            help='Каталог для файлов, по умолчанию SITEMAP_ROOT.')
+
+    def handle(self, *args, **options):
+        rebuilt = build_sitemaps(root=options['root'],
+                                 base_url=options['base_url'],
+                                 full=options['full'])
+        for name in rebuilt:
+            self.stdout.write(f'Собран {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Карта сайта готова, пересобрано шардов: {len(rebuilt)}'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.likes import fold_like_shards
+
+
+class Command(BaseCommand):
+    help = 'Переносит шарды счётчиков отметок в Post.likes_count.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every', type=float,
+            help='Повторять свёртку раз в столько секунд, не завершаясь.')
+
+    def handle(self, *args, **options):
+        while True:
+            folded = fold_like_shards()
+            self.stdout.write(self.style.SUCCESS(
+                f'Счётчики свёрнуты, обновлено записей: {folded}'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
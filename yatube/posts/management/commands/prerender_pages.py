@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.publishing import publish_all
+
+
+class Command(BaseCommand):
+    help = ('Полностью перепубликовывает анонимные версии страниц '
+            'в каталог PRERENDER_ROOT.')
+
+    def handle(self, *args, **options):
+        published = publish_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Страницы опубликованы, страниц записей: {published}'))
@@ -0,0 +1,112 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core import bus
+from core.shell import invalidate_page_shells
+from posts.feeds import invalidate_all_feeds
+from posts.markup import render_post
+from posts.models import ArchivedPost, Post
+
+BATCH_SIZE = 500
+
+
+def render_batch(batch):
+    """Рендерит пакет (pk, text) в дочернем процессе."""
+    return [(pk, *render_post(text)) for pk, text in batch]
+
+
+def iter_batches(queryset, key, size):
+    """Пакеты (pk, text) по возрастанию ключа, без OFFSET."""
+    last = 0
+    while True:
+        batch = list(queryset.filter(**{f'{key}__gt': last})
+                     .order_by(key).values_list(key, 'text')[:size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1][0]
+
+
+def save_hot(rendered):
+    Post.objects.bulk_update(
+        [Post(pk=pk, text_html=text_html, excerpt=excerpt)
+         for pk, text_html, excerpt in rendered],
+        ['text_html', 'excerpt'])
+
+
+def save_archived(rendered):
+    ArchivedPost.objects.bulk_update(
+        [ArchivedPost(post_id=pk, text_html=text_html)
+         for pk, text_html, _ in rendered],
+        ['text_html'])
+    # Выжимка архивной записи остаётся в заглушке
+    Post.objects.bulk_update(
+        [Post(pk=pk, excerpt=excerpt) for pk, _, excerpt in rendered],
+        ['excerpt'])
+
+
+class Command(BaseCommand):
+    help = ('Заново рендерит HTML и выжимки записей в пуле процессов, '
+            'например после смены настроек Markdown или очистки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Только записи, у которых ещё нет HTML.')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов, 0 — рендерить в текущем процессе.')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько записей отдавать процессу за раз.')
+
+    def render(self, pool, batches, save, workers):
+        rendered = 0
+        if pool is None:
+            for batch in batches:
+                save(render_batch(batch))
+                rendered += len(batch)
+            return rendered
+        # Не больше двух пакетов на процесс в очереди: таблица
+        # не читается в память целиком, пока процессы заняты
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(render_batch, batch))
+            if len(pending) >= workers * 2:
+                result = pending.popleft().result()
+                save(result)
+                rendered += len(result)
+        while pending:
+            result = pending.popleft().result()
+            save(result)
+            rendered += len(result)
+        return rendered
+
+    def handle(self, *args, **options):
+        hot = Post.objects.filter(archived=False)
+        archived = ArchivedPost.objects.all()
+        if options['missing']:
+            hot = hot.filter(text_html='')
+            archived = archived.filter(text_html='')
+        size = options['batch_size']
+        workers = options['workers']
+        pool = ProcessPoolExecutor(workers) if workers > 0 else None
+        try:
+            rendered = self.render(pool, iter_batches(hot, 'pk', size),
+                                   save_hot, workers)
+            rendered += self.render(
+                pool, iter_batches(archived, 'post_id', size),
+                save_archived, workers)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if rendered:
+            # bulk_update не шлёт сигналов: сбрасываем ленты и страницы
+            invalidate_all_feeds()
+            invalidate_page_shells()
+            bus.publish('bulk')
+        self.stdout.write(self.style.SUCCESS(
+            f'Перерисовано записей: {rendered}'))
@@ -0,0 +1,51 @@
+"""Разметка Markdown в текстах записей.
+
+HTML и короткая текстовая выжимка считаются один раз при сохранении
+записи и хранятся рядом с исходником, шаблоны и ленты выводят готовое.
+Модуль не обращается к базе и настройкам Django, поэтому его функции
+можно запускать в дочерних процессах (manage.py render_posts).
+"""
+import html
+import re
+
+import bleach
+import markdown
+
+EXTENSIONS = ['extra', 'nl2br', 'sane_lists']
+ALLOWED_TAGS = [
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'em', 'h1', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'hr', 'i', 'li', 'ol', 'p', 'pre', 'strong', 'table',
+    'tbody', 'td', 'th', 'thead', 'tr', 'ul',
+]
+ALLOWED_ATTRIBUTES = {'a': ['href', 'title', 'rel'], 'abbr': ['title']}
+ALLOWED_PROTOCOLS = ['http', 'https', 'mailto']
+EXCERPT_LENGTH = 300
+
+_spaces = re.compile(r'\s+')
+
+
+def render_markdown(text):
+    """Markdown в очищенный HTML: сырой HTML авторов не пропускается."""
+    dirty = markdown.markdown(text, extensions=EXTENSIONS)
+    clean = bleach.clean(dirty, tags=ALLOWED_TAGS,
+                         attributes=ALLOWED_ATTRIBUTES,
+                         protocols=ALLOWED_PROTOCOLS, strip=True)
+    return bleach.linkify(clean)
+
+
+def make_excerpt(text_html, length=EXCERPT_LENGTH):
+    """Простой текст из HTML, обрезанный по границе слова до length."""
+    plain = html.unescape(bleach.clean(text_html, tags=[], strip=True))
+    plain = _spaces.sub(' ', plain).strip()
+    if len(plain) <= length:
+        return plain
+    cut = plain[:length - 1]
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip() + '…'
+
+
+def render_post(text):
+    """HTML и выжимка для текста записи."""
+    text_html = render_markdown(text)
+    return text_html, make_excerpt(text_html)
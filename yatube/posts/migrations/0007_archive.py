@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-19 18:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_comments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='posts.Post')),
+                ('text', models.TextField(verbose_name='Текст поста')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='archived',
+            field=models.BooleanField(default=False, editable=False, verbose_name='В архиве'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(archived=False), fields=['-pub_date', '-id'], name='post_hot_feed_idx'),
+        ),
+    ]
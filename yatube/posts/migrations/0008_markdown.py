@@ -0,0 +1,68 @@
+# Generated by Django 2.2.16 on 2026-10-19 18:15
+
+from django.db import migrations, models
+
+from posts.markup import render_post
+
+# Сколько записей рендерить и обновлять за раз
+BATCH_SIZE = 500
+
+
+def batches(queryset, key):
+    """Пакеты (ключ, текст) по возрастанию ключа, без OFFSET."""
+    last = 0
+    while True:
+        batch = list(queryset.filter(**{f'{key}__gt': last}).order_by(key)
+                     .values_list(key, 'text')[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1][0]
+
+
+def render_existing(apps, schema_editor):
+    """HTML и выжимки записей, написанных до Markdown."""
+    Post = apps.get_model('posts', 'Post')
+    ArchivedPost = apps.get_model('posts', 'ArchivedPost')
+    for batch in batches(Post.objects.filter(archived=False), 'pk'):
+        rendered = [(pk, *render_post(text)) for pk, text in batch]
+        Post.objects.bulk_update(
+            [Post(pk=pk, text_html=text_html, excerpt=excerpt)
+             for pk, text_html, excerpt in rendered],
+            ['text_html', 'excerpt'])
+    # У архивной записи HTML лежит в архиве, выжимка — в заглушке
+    for batch in batches(ArchivedPost.objects.all(), 'post_id'):
+        rendered = [(pk, *render_post(text)) for pk, text in batch]
+        ArchivedPost.objects.bulk_update(
+            [ArchivedPost(post_id=pk, text_html=text_html)
+             for pk, text_html, _ in rendered],
+            ['text_html'])
+        Post.objects.bulk_update(
+            [Post(pk=pk, excerpt=excerpt) for pk, _, excerpt in rendered],
+            ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedpost',
+            name='text_html',
+            field=models.TextField(blank=True, verbose_name='HTML поста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='Выжимка'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML поста'),
+        ),
+        migrations.RunPython(render_existing, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .markup import EXCERPT_LENGTH, render_post
+
 User = get_user_model()
 
 
@@ -36,6 +38,13 @@ class Post(models.Model):
     text = models.TextField('Текст поста',  # verbose_name
                             help_text='Текст нового поста',
                             )
+    # Считаются из text при сохранении, см. posts.markup
+    text_html = models.TextField('HTML поста', blank=True, editable=False)
+    excerpt = models.CharField('Выжимка',
+                               max_length=EXCERPT_LENGTH,
+                               blank=True,
+                               editable=False,
+                               )
     pub_date = models.DateTimeField('Дата публикации',  # verbose_name
                                     auto_now_add=True,
                                     )
@@ -53,9 +62,154 @@ class Post(models.Model):
                               help_text=(
                                   'Группа, к которой будет относиться пост'),
                               )
+    # Пополняется пакетами из posts.counters, а не на каждом просмотре
+    views = models.PositiveIntegerField('Просмотры',
+                                        default=0,
+                                        editable=False,
+                                        db_index=True,
+                                        )
+    # Сумма свёрнутых шардов LikeCounterShard, см. posts.likes
+    likes_count = models.PositiveIntegerField('Отметки «нравится»',
+                                              default=0,
+                                              editable=False,
+                                              )
+    comments_count = models.PositiveIntegerField('Комментарии',
+                                                 default=0,
+                                                 editable=False,
+                                                 )
+    # Текст архивной записи лежит в ArchivedPost, см. posts.archive
+    archived = models.BooleanField('В архиве',
+                                   default=False,
+                                   editable=False,
+                                   )
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # У архивной заглушки нет текста, её HTML лежит в архиве
+        if not self.archived and (update_fields is None
+                                  or 'text' in update_fields):
+            self.text_html, self.excerpt = render_post(self.text)
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'text_html', 'excerpt'}
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-pub_date', '-pk']
+        indexes = [
+            # Ленты главной и групп читают только горячие записи
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_hot_feed_idx',
+                         condition=models.Q(archived=False)),
+        ]
+
+
+class ArchivedPost(models.Model):
+    """Текст записи, перенесённой в архив.
+
+    В posts_post от архивной записи остаётся заглушка без текста
+    и HTML: ключ, автор, группа, дата, выжимка и счётчики.
+    """
+    post = models.OneToOneField(Post,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='archive',
+                                )
+    text = models.TextField('Текст поста')
+    text_html = models.TextField('HTML поста', blank=True)
+    archived_at = models.DateTimeField('Дата архивации', auto_now_add=True)
+
+
+class Like(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='likes',
+                             verbose_name='Пользователь',
+                             )
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='likes',
+                             verbose_name='Запись',
+                             )
+    created = models.DateTimeField('Дата отметки', auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_like'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} → {self.post}'
+
+
+class LikeCounterShard(models.Model):
+    """Часть счётчика отметок записи.
+
+    Одновременные отметки одной записи попадают в разные строки-шарды
+    и не ждут друг друга, а сумма шардов периодически переносится
+    в Post.likes_count.
+    """
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='like_shards',
+                             )
+    shard = models.PositiveSmallIntegerField()
+    delta = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'shard'],
+                                    name='unique_like_shard'),
+        ]
+
+
+class Comment(models.Model):
+    """Комментарий в дереве обсуждения записи.
+
+    path — материализованный путь: первичные ключи предков и самого
+    комментария, дополненные нулями до PATH_STEP цифр. Сортировка
+    по path даёт обход дерева в глубину, а поддерево комментария —
+    непрерывный диапазон индекса (post, path).
+    """
+    PATH_STEP = 10
+
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='comments',
+                             verbose_name='Запись',
+                             )
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='comments',
+                               verbose_name='Автор',
+                               )
+    parent = models.ForeignKey('self',
+                               on_delete=models.CASCADE,
+                               blank=True,
+                               null=True,
+                               related_name='replies',
+                               verbose_name='Ответ на',
+                               )
+    text = models.TextField('Текст комментария',
+                            help_text='Текст нового комментария',
+                            )
+    created = models.DateTimeField('Дата комментария', auto_now_add=True)
+    path = models.CharField(max_length=250, editable=False)
+
+    class Meta:
+        ordering = ['path']
+        indexes = [
+            models.Index(fields=['post', 'path'],
+                         name='comment_post_path_idx'),
+        ]
+
+    def __str__(self):
+        return self.text[:15]
+
+    @property
+    def depth(self):
+        return len(self.path) // self.PATH_STEP - 1
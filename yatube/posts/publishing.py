@@ -0,0 +1,162 @@
+"""Публикация анонимных версий страниц в статические HTML-файлы.
+
+В каталог PRERENDER_ROOT попадают первые PRERENDER_PAGES страниц
+главной и каждой группы, страницы about и страница каждой записи.
+Адрес ``/group/humor/`` превращается в ``group/humor/index.html``,
+а ``/group/humor/?page=2`` в ``group/humor/page-2.html``, так что
+веб-сервер отдаёт их анонимам без обращения к Django::
+
+    location / {
+        set $prerendered $uri/index.html;
+        if ($arg_page) { set $prerendered $uri/page-$arg_page.html; }
+        if ($cookie_sessionid) { set $prerendered /nonexistent; }
+        try_files /prerendered$prerendered @django;
+    }
+
+Страницы рендерятся тем же стеком middleware и view, что и живые
+запросы. Каждый файл пишется во временный файл рядом и переносится
+на место через rename, поэтому сервер никогда не видит его наполовину.
+"""
+import math
+import os
+import tempfile
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.test import RequestFactory
+from django.urls import reverse
+
+from .archive import hot_posts
+from .models import Group, Post
+from .views import POSTS_PER_PAGE
+
+ABOUT_URLS = ('about:author', 'about:tech')
+
+_handler = None
+
+
+def _get_handler():
+    global _handler
+    if _handler is None:
+        _handler = BaseHandler()
+        _handler.load_middleware()
+    return _handler
+
+
+def _request_factory():
+    host = urlparse(settings.SITE_URL).hostname
+    return RequestFactory(
+        SERVER_NAME=host, **{settings.INTERNAL_REQUEST_ENVIRON_KEY: True})
+
+
+def output_path(url, page=None):
+    """Путь файла в PRERENDER_ROOT для адреса страницы."""
+    name = 'index.html' if page is None else f'page-{page}.html'
+    return os.path.join(settings.PRERENDER_ROOT, url.strip('/'), name)
+
+
+def _write_atomic(path, content):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+            'wb', dir=directory, suffix='.tmp', delete=False) as output:
+        output.write(content)
+    os.replace(output.name, path)
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def render_page(url, page=None):
+    """Рендерит страницу для анонима и публикует её в файл.
+
+    Страница, которой больше нет (404), удаляется из каталога.
+    """
+    data = {} if page is None else {'page': page}
+    request = _request_factory().get(url, data)
+    response = _get_handler().get_response(request)
+    path = output_path(url, page)
+    if response.status_code == 200:
+        _write_atomic(path, response.content)
+    else:
+        _remove(path)
+    return response.status_code
+
+
+def _unpublish_paginated(url):
+    _remove(output_path(url))
+    for page in range(1, settings.PRERENDER_PAGES + 1):
+        _remove(output_path(url, page))
+
+
+def render_paginated(url, count):
+    """Публикует первые PRERENDER_PAGES страниц ленты из count записей.
+
+    Страницы, вышедшие за пределы ленты после удалений, удаляются.
+    """
+    pages = max(1, math.ceil(count / POSTS_PER_PAGE))
+    limit = settings.PRERENDER_PAGES
+    render_page(url)
+    for page in range(1, limit + 1):
+        if page <= pages:
+            render_page(url, page)
+        else:
+            _remove(output_path(url, page))
+
+
+def publish_index():
+    render_paginated(reverse('posts:index'), hot_posts().count())
+
+
+def publish_group(slug):
+    url = reverse('posts:group_list', kwargs={'slug': slug})
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        _unpublish_paginated(url)
+        return
+    # Ленты показывают только горячие записи, архивные страниц не дают
+    render_paginated(url, hot_posts().filter(group=group).count())
+
+
+def publish_post(post_id):
+    render_page(reverse('posts:post_detail', kwargs={'post_id': post_id}))
+
+
+def unpublish_post(post_id):
+    _remove(output_path(
+        reverse('posts:post_detail', kwargs={'post_id': post_id})))
+
+
+def publish_about():
+    for name in ABOUT_URLS:
+        render_page(reverse(name))
+
+
+def publish_post_change(post_id, group_slugs, deleted=False):
+    """Перепубликует только файлы, которые затрагивает запись поста."""
+    publish_index()
+    for slug in group_slugs:
+        publish_group(slug)
+    if deleted:
+        unpublish_post(post_id)
+    else:
+        publish_post(post_id)
+
+
+def publish_all():
+    """Полная перепубликация всех страниц, возвращает число записей."""
+    publish_index()
+    publish_about()
+    for slug in Group.objects.values_list('slug', flat=True):
+        publish_group(slug)
+    published = 0
+    for post_id in Post.objects.order_by('pk').values_list(
+            'pk', flat=True).iterator():
+        publish_post(post_id)
+        published += 1
+    return published
@@ -0,0 +1,131 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import bus
+from core.shell import invalidate_page_shells
+
+from . import publishing
+from .feeds import invalidate_feeds
+from .lookups import forget_group_choices, groups, missing_posts, users
+from .models import Comment, Group, Post, User
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_feeds(sender, instance, raw, **kwargs):
+    """Запоминает группу записи до правки: старая лента тоже меняется."""
+    instance._old_group_slug = None
+    if instance.pk and not raw:
+        instance._old_group_slug = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group__slug', flat=True).first())
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    """Сбрасывает ленты, в которые попадает записанный пост."""
+    invalidate_feeds('index')
+    invalidate_feeds('profile', instance.author.username)
+    slugs = {getattr(instance, '_old_group_slug', None)}
+    if instance.group_id:
+        slugs.add(instance.group.slug)
+    for slug in slugs - {None}:
+        invalidate_feeds('group', slug)
+    invalidate_page_shells()
+    # Другим процессам: их кеши сбросят подписчики шины
+    bus.publish('post', instance.pk, author=instance.author.username,
+                groups=sorted(slugs - {None}))
+
+
+@receiver(post_save, sender=Post)
+def remember_post_id(sender, instance, created, **kwargs):
+    """Новая запись больше не считается отсутствующей."""
+    if created:
+        missing_posts.add(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def republish_post_pages(sender, instance, **kwargs):
+    """Перепубликует статические страницы, на которых есть пост."""
+    if not settings.PRERENDER_ON_WRITE:
+        return
+    slugs = {getattr(instance, '_old_group_slug', None)}
+    if instance.group_id:
+        slugs.add(instance.group.slug)
+    transaction.on_commit(partial(
+        publishing.publish_post_change, instance.pk, slugs - {None},
+        deleted=kwargs['signal'] is post_delete))
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, raw, **kwargs):
+    """Запоминает slug до правки: по старому тоже нельзя находить."""
+    instance._old_slug = None
+    if instance.pk and not raw:
+        instance._old_slug = (
+            Group.objects.filter(pk=instance.pk)
+            .values_list('slug', flat=True).first())
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feed(sender, instance, **kwargs):
+    groups.forget(instance.pk, instance.slug,
+                  getattr(instance, '_old_slug', None))
+    forget_group_choices()
+    invalidate_feeds('group', instance.slug)
+    invalidate_page_shells()
+    bus.publish('group', instance.pk, slug=instance.slug)
+    if settings.PRERENDER_ON_WRITE:
+        transaction.on_commit(
+            partial(publishing.publish_group, instance.slug))
+
+
+def _only_login(update_fields):
+    return bool(update_fields) and set(update_fields) == {'last_login'}
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw, update_fields=None, **kwargs):
+    instance._old_username = None
+    if instance.pk and not raw and not _only_login(update_fields):
+        instance._old_username = (
+            User.objects.filter(pk=instance.pk)
+            .values_list('username', flat=True).first())
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_author_pages(sender, instance, update_fields=None, **kwargs):
+    """Имена авторов есть на страницах и в лентах.
+
+    Вход меняет только last_login и ничего не сбрасывает.
+    """
+    if _only_login(update_fields):
+        return
+    users.forget(instance.pk, instance.username,
+                 getattr(instance, '_old_username', None))
+    invalidate_page_shells()
+    invalidate_feeds('profile', instance.username)
+    bus.publish('user', instance.pk, username=instance.username)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def count_comments(sender, instance, signal, created=False, **kwargs):
+    """Поддерживает Post.comments_count для карточек ленты."""
+    if signal is post_save and not created:
+        return
+    delta = 1 if created else -1
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=F('comments_count') + delta)
+    invalidate_page_shells()
+    if settings.PRERENDER_ON_WRITE:
+        transaction.on_commit(
+            partial(publishing.publish_post, instance.post_id))
@@ -0,0 +1,226 @@
+"""Шардированная карта сайта.
+
+Индекс ``sitemap.xml`` ссылается на шарды по 50 тысяч адресов.
+Записи и пользователи разбиты на шарды по диапазонам первичного ключа,
+поэтому границы шардов не сдвигаются при добавлении и удалении строк,
+а каждый шард читается keyset-итерацией без OFFSET. Для каждого шарда
+в манифесте хранится отпечаток (число строк и сумма ключей), и при
+следующей сборке перезаписываются только изменившиеся шарды.
+
+Файлы пишутся рядом в двух видах, ``.xml`` и ``.xml.gz``, и отдаются
+веб-сервером как предварительно сжатая статика (``gzip_static on``).
+"""
+import gzip
+import json
+import os
+import tempfile
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Length
+from django.urls import reverse
+from django.utils.timezone import now
+
+from .models import Group, Post, User
+
+SHARD_SIZE = 50000
+# Сколько строк читать из базы за один запрос при обходе шарда
+CHUNK_SIZE = 2000
+INDEX_NAME = 'sitemap.xml'
+MANIFEST_NAME = 'manifest.json'
+
+URLSET_OPEN = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<urlset xmlns="http://www.sitemaps.org/schemas/'
+               'sitemap/0.9">\n')
+URLSET_CLOSE = '</urlset>\n'
+INDEX_OPEN = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<sitemapindex xmlns="http://www.sitemaps.org/schemas/'
+              'sitemap/0.9">\n')
+INDEX_CLOSE = '</sitemapindex>\n'
+
+
+def _posts():
+    return Post.objects.all()
+
+
+def _posts_rows(lo, hi):
+    return _posts().filter(pk__gte=lo, pk__lt=hi).values_list(
+        'pk', 'pub_date')
+
+
+def _posts_entry(row):
+    pk, pub_date = row
+    return (reverse('posts:post_detail', kwargs={'post_id': pk}),
+            pub_date)
+
+
+def _profiles():
+    # В карту попадают только авторы: у остальных профиль пустой
+    return User.objects.filter(pk__in=Post.objects.values('author'))
+
+
+def _profiles_rows(lo, hi):
+    return _profiles().filter(pk__gte=lo, pk__lt=hi).values_list(
+        'pk', 'username')
+
+
+def _profiles_entry(row):
+    return reverse('posts:profile', kwargs={'username': row[1]}), None
+
+
+def _groups():
+    return Group.objects.all()
+
+
+def _groups_rows(lo, hi):
+    return _groups().filter(pk__gte=lo, pk__lt=hi).values_list(
+        'pk', 'slug')
+
+
+def _groups_entry(row):
+    return reverse('posts:group_list', kwargs={'slug': row[1]}), None
+
+
+# Раздел карты: (выборка, поле адреса для отпечатка, строки шарда,
+# адрес и дата изменения по строке)
+SECTIONS = {
+    'posts': (_posts, None, _posts_rows, _posts_entry),
+    'profiles': (_profiles, 'username', _profiles_rows, _profiles_entry),
+    'groups': (_groups, 'slug', _groups_rows, _groups_entry),
+}
+
+
+def shard_bounds(shard):
+    """Диапазон первичных ключей шарда: [lo, hi)."""
+    return shard * SHARD_SIZE + 1, (shard + 1) * SHARD_SIZE + 1
+
+
+def shard_name(section, shard):
+    return f'sitemap-{section}-{shard}.xml'
+
+
+def shard_fingerprints(section):
+    """Отпечатки всех непустых шардов раздела одним запросом."""
+    queryset, text_field, _, _ = SECTIONS[section]
+    aggregates = {'count': Count('pk'), 'total': Sum('pk')}
+    if text_field:
+        # Переименование меняет адрес, но не меняет число и сумму ключей
+        aggregates['length'] = Sum(Length(text_field))
+    rows = (queryset().order_by()
+            .annotate(shard=(F('pk') - 1) / SHARD_SIZE)
+            .values('shard')
+            .annotate(**aggregates))
+    return {int(row.pop('shard')): row for row in rows}
+
+
+def iter_shard_entries(section, shard):
+    """Адреса шарда по возрастанию ключа, порциями по CHUNK_SIZE."""
+    _, _, rows, entry = SECTIONS[section]
+    lo, hi = shard_bounds(shard)
+    while lo < hi:
+        chunk = list(rows(lo, hi).order_by('pk')[:CHUNK_SIZE])
+        if not chunk:
+            return
+        for row in chunk:
+            yield entry(row)
+        lo = chunk[-1][0] + 1
+
+
+def _atomic_write(path, chunks, compress=True):
+    """Пишет файл и его .gz-версию через временные файлы и rename."""
+    directory = os.path.dirname(path)
+    plain = tempfile.NamedTemporaryFile(
+        'wb', dir=directory, suffix='.tmp', delete=False)
+    packed = tempfile.NamedTemporaryFile(
+        'wb', dir=directory, suffix='.gz.tmp', delete=False)
+    try:
+        with plain, packed, gzip.GzipFile(
+                fileobj=packed, mode='wb', mtime=0) as gz:
+            for chunk in chunks:
+                data = chunk.encode()
+                plain.write(data)
+                if compress:
+                    gz.write(data)
+        os.replace(plain.name, path)
+        if compress:
+            os.replace(packed.name, path + '.gz')
+        else:
+            os.unlink(packed.name)
+    except BaseException:
+        for name in (plain.name, packed.name):
+            if os.path.exists(name):
+                os.unlink(name)
+        raise
+
+
+def _urlset(base_url, entries):
+    yield URLSET_OPEN
+    for location, lastmod in entries:
+        yield '<url><loc>%s</loc>' % escape(base_url + location)
+        if lastmod is not None:
+            yield '<lastmod>%s</lastmod>' % lastmod.date().isoformat()
+        yield '</url>\n'
+    yield URLSET_CLOSE
+
+
+def _index(base_url, shards):
+    yield INDEX_OPEN
+    for name, built in shards:
+        location = reverse('posts:sitemap_file', kwargs={'name': name})
+        yield ('<sitemap><loc>%s</loc><lastmod>%s</lastmod></sitemap>\n'
+               % (escape(base_url + location), built))
+    yield INDEX_CLOSE
+
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME)) as manifest:
+            return json.load(manifest)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_sitemaps(root=None, base_url=None, full=False):
+    """Пересобирает изменившиеся шарды и индекс.
+
+    Возвращает список имён перезаписанных шардов.
+    """
+    root = root or settings.SITEMAP_ROOT
+    base_url = (base_url or settings.SITE_URL).rstrip('/')
+    os.makedirs(root, exist_ok=True)
+    old_manifest = {} if full else load_manifest(root)
+    if old_manifest.get('base_url') != base_url:
+        old_manifest = {}
+    old_shards = old_manifest.get('shards', {})
+    manifest = {'base_url': base_url, 'shards': {}}
+    built_at = now().isoformat(timespec='seconds')
+    rebuilt = []
+    for section in SECTIONS:
+        for shard, fingerprint in sorted(
+                shard_fingerprints(section).items()):
+            name = shard_name(section, shard)
+            previous = old_shards.get(name)
+            path = os.path.join(root, name)
+            if (previous and previous['fingerprint'] == fingerprint
+                    and os.path.exists(path)):
+                manifest['shards'][name] = previous
+                continue
+            _atomic_write(
+                path, _urlset(base_url, iter_shard_entries(section, shard)))
+            manifest['shards'][name] = {
+                'fingerprint': fingerprint, 'built': built_at}
+            rebuilt.append(name)
+    # Шарды, которые опустели, больше не упоминаются в индексе
+    for name in set(old_shards) - set(manifest['shards']):
+        for path in (name, name + '.gz'):
+            path = os.path.join(root, path)
+            if os.path.exists(path):
+                os.unlink(path)
+    _atomic_write(
+        os.path.join(root, INDEX_NAME),
+        _index(base_url, ((name, shard['built'][:10]) for name, shard
+                          in sorted(manifest['shards'].items()))))
+    _atomic_write(os.path.join(root, MANIFEST_NAME),
+                  [json.dumps(manifest)], compress=False)
+    return rebuilt
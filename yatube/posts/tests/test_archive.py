@@ -0,0 +1,136 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from posts.archive import archive_posts
+from posts.models import ArchivedPost, Group, Post
+
+from core import bus
+
+User = get_user_model()
+
+
+@override_settings(STREAMING_PAGES=False)
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author_user = User.objects.create_user(username='author_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for i in range(3):
+            Post.objects.create(author=cls.author_user, group=cls.group,
+                                text=f'Старая запись {i}')
+        Post.objects.update(pub_date=now() - timedelta(days=400))
+        cls.fresh = Post.objects.create(author=cls.author_user,
+                                        group=cls.group,
+                                        text='Свежая запись')
+        cls.cutoff = now() - timedelta(days=365)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ArchiveTests.author_user)
+
+    def test_old_posts_leave_slim_stubs(self):
+        """Тексты старых записей переносятся в архив пакетами."""
+        self.assertEqual(archive_posts(ArchiveTests.cutoff, batch_size=2), 3)
+        self.assertEqual(archive_posts(ArchiveTests.cutoff), 0)
+        self.assertEqual(ArchivedPost.objects.count(), 3)
+        self.assertEqual(
+            set(Post.objects.filter(archived=True).values_list(
+                'text', flat=True)), {''})
+        ArchiveTests.fresh.refresh_from_db()
+        self.assertFalse(ArchiveTests.fresh.archived)
+
+    def test_feeds_skip_archived_posts(self):
+        """Главная и группа показывают только горячие записи."""
+        call_command('archive_posts', days=365, stdout=StringIO())
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list',
+                            kwargs={'slug': ArchiveTests.group.slug})):
+            response = self.client.get(url)
+            self.assertEqual(list(response.context['page_obj']),
+                             [ArchiveTests.fresh])
+
+    def test_archived_posts_stay_with_author(self):
+        """Архивные записи пропадают из лент главной и групп, но
+        остаются в профиле, его ленте и по ссылке.
+        """
+        archive_posts(ArchiveTests.cutoff)
+        username = ArchiveTests.author_user.username
+        slug = ArchiveTests.group.slug
+        for url in (reverse('posts:index_rss'),
+                    reverse('posts:group_rss', kwargs={'slug': slug})):
+            response = self.client.get(url)
+            self.assertContains(response, 'Свежая запись')
+            self.assertNotContains(response, 'Старая запись')
+        response = self.client.get(reverse(
+            'posts:profile_rss', kwargs={'username': username}))
+        for i in range(3):
+            self.assertContains(response, f'Старая запись {i}')
+        for post in Post.objects.filter(archived=True):
+            response = self.client.get(reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}))
+            self.assertEqual(response.status_code, 200)
+
+    def test_archived_posts_are_rehydrated(self):
+        """Профиль и страница записи показывают архивный текст."""
+        archive_posts(ArchiveTests.cutoff)
+        response = self.client.get(reverse(
+            'posts:profile',
+            kwargs={'username': ArchiveTests.author_user.username}))
+        self.assertEqual(len(response.context['page_obj']), 4)
+        for i in range(3):
+            self.assertContains(response, f'Старая запись {i}')
+        post = Post.objects.filter(archived=True).first()
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertEqual(response.context['post'].text,
+                         ArchivedPost.objects.get(post=post).text)
+
+    def test_edit_restores_post(self):
+        """Правка архивной записи возвращает её в горячую таблицу."""
+        archive_posts(ArchiveTests.cutoff)
+        post = Post.objects.filter(archived=True).first()
+        url = reverse('posts:post_edit', kwargs={'post_id': post.pk})
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.context['form'].initial['text'],
+                         ArchivedPost.objects.get(post=post).text)
+        self.authorized_client.post(url, {'text': 'Новый текст'})
+        post.refresh_from_db()
+        self.assertFalse(post.archived)
+        self.assertEqual(post.text, 'Новый текст')
+        self.assertFalse(ArchivedPost.objects.filter(post=post).exists())
+
+    def test_edit_restores_counters_untouched(self):
+        """Возврат из архива не затирает счётчики, выросшие после чтения."""
+        archive_posts(ArchiveTests.cutoff)
+        post = Post.objects.filter(archived=True).first()
+
+        def bump_views(posts):
+            Post.objects.filter(pk=post.pk).update(views=F('views') + 4)
+            return posts
+
+        url = reverse('posts:post_edit', kwargs={'post_id': post.pk})
+        with mock.patch('posts.views.rehydrate', side_effect=bump_views):
+            self.authorized_client.post(url, {'text': 'Новый текст'})
+        post.refresh_from_db()
+        self.assertFalse(post.archived)
+        self.assertEqual(post.views, 4)
+        self.assertTrue(post.text_html)
+
+    def test_archive_notifies_other_processes(self):
+        """Архивация сообщает другим процессам, какие ленты сбросить."""
+        with mock.patch.object(bus, 'publish') as publish:
+            archive_posts(ArchiveTests.cutoff)
+        publish.assert_called_once_with(
+            'bulk', feeds=[('index', ''), ('group', ArchiveTests.group.slug)])
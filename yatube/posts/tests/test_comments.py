@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.comments import comments_page, create_comment
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class CommentsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author_user = User.objects.create_user(username='author_user')
+        cls.post = Post.objects.create(author=cls.author_user,
+                                       text='Тестовый текст')
+        cls.other_post = Post.objects.create(author=cls.author_user,
+                                             text='Другой текст')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CommentsTests.author_user)
+
+    def comment(self, text, parent=None):
+        return create_comment(CommentsTests.post, CommentsTests.author_user,
+                              text, parent)
+
+    def test_thread_is_ordered_by_path(self):
+        """Ответы идут сразу за родителем, поддерево читается диапазоном."""
+        first = self.comment('первый')
+        second = self.comment('второй')
+        reply = self.comment('ответ', first)
+        nested = self.comment('ответ на ответ', reply)
+        page, cursor = comments_page(CommentsTests.post.pk)
+        self.assertEqual(page, [first, reply, nested, second])
+        self.assertEqual([c.depth for c in page], [0, 1, 2, 0])
+        self.assertIsNone(cursor)
+        subtree, _ = comments_page(CommentsTests.post.pk, root=first)
+        self.assertEqual(subtree, [first, reply, nested])
+
+    def test_cursor_pagination(self):
+        """Курсор отдаёт следующую страницу без пропусков и повторов."""
+        comments = [self.comment(f'Комментарий {i}') for i in range(5)]
+        with mock.patch('posts.comments.COMMENTS_PER_PAGE', 2):
+            seen, cursor = comments_page(CommentsTests.post.pk)
+            while cursor:
+                response = self.client.get(
+                    reverse('posts:comments',
+                            kwargs={'post_id': CommentsTests.post.pk}),
+                    {'after': cursor})
+                seen += list(response.context['comments'])
+                cursor = response.context['cursor']
+        self.assertEqual(seen, comments)
+
+    def test_add_comment_updates_counter(self):
+        """Комментарий и ответ создаются, счётчик записи растёт."""
+        url = reverse('posts:add_comment',
+                      kwargs={'post_id': CommentsTests.post.pk})
+        response = self.authorized_client.post(url, {'text': 'Привет'})
+        self.assertRedirects(response, reverse(
+            'posts:post_detail', kwargs={'post_id': CommentsTests.post.pk}))
+        parent = Comment.objects.get()
+        self.authorized_client.post(
+            url, {'text': 'Ответ', 'parent': parent.pk})
+        reply = Comment.objects.exclude(pk=parent.pk).get()
+        self.assertEqual(reply.parent, parent)
+        self.assertTrue(reply.path.startswith(parent.path))
+        CommentsTests.post.refresh_from_db()
+        self.assertEqual(CommentsTests.post.comments_count, 2)
+        reply.delete()
+        CommentsTests.post.refresh_from_db()
+        self.assertEqual(CommentsTests.post.comments_count, 1)
+
+    def test_guest_cannot_comment(self):
+        """Гость отправляется на страницу входа."""
+        url = reverse('posts:add_comment',
+                      kwargs={'post_id': CommentsTests.post.pk})
+        response = self.client.post(url, {'text': 'Привет'})
+        self.assertRedirects(response, f'/auth/login/?next={url}')
+        self.assertFalse(Comment.objects.exists())
+
+    def test_foreign_parent_and_bad_cursor(self):
+        """Родитель из другой записи игнорируется, кривой курсор — 404."""
+        foreign = create_comment(CommentsTests.other_post,
+                                 CommentsTests.author_user, 'чужой')
+        self.authorized_client.post(
+            reverse('posts:add_comment',
+                    kwargs={'post_id': CommentsTests.post.pk}),
+            {'text': 'Ответ', 'parent': foreign.pk})
+        comment = Comment.objects.get(post=CommentsTests.post)
+        self.assertIsNone(comment.parent)
+        url = reverse('posts:comments',
+                      kwargs={'post_id': CommentsTests.post.pk})
+        for params in ({'after': 'abc'}, {'after': '123'},
+                       {'root': foreign.pk}):
+            self.assertEqual(self.client.get(url, params).status_code, 404)
+
+    def test_post_page_shows_comments(self):
+        """Страница записи показывает комментарии и форму."""
+        self.comment('Видимый комментарий')
+        response = self.authorized_client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': CommentsTests.post.pk}))
+        self.assertContains(response, 'Видимый комментарий')
+        self.assertContains(response, 'id=\'comment-form\'')
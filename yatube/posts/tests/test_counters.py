@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from core import warmup
+from posts import publishing
+from posts.counters import view_counter
+from posts.models import Post
+from posts.publishing import _get_handler
+
+User = get_user_model()
+
+
+@override_settings(VIEW_COUNTER_FLUSH_INTERVAL=3600,
+                   VIEW_COUNTER_MAX_PENDING=1000, STREAMING_PAGES=False)
+class ViewCounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Просмотры других тестов относятся к чужим записям
+        view_counter.flush()
+        cls.author_user = User.objects.create_user(username='author_user')
+        cls.posts = Post.objects.bulk_create(
+            Post(author=cls.author_user, text=f'Текст {i}')
+            for i in range(3))
+        cls.posts = list(Post.objects.order_by('pk'))
+
+    def setUp(self):
+        view_counter.flush()
+        self.guest_client = Client()
+
+    def tearDown(self):
+        view_counter.flush()
+
+    def test_views_are_buffered_until_flush(self):
+        """Просмотры копятся в памяти и сбрасываются одним запросом."""
+        first, second, _ = ViewCounterTests.posts
+        for post, views in ((first, 3), (second, 2)):
+            url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+            for _ in range(views):
+                self.guest_client.get(url)
+        first.refresh_from_db()
+        self.assertEqual(first.views, 0)
+        self.assertEqual(view_counter.pending(first.pk), 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(view_counter.flush(), 5)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.views, second.views), (3, 2))
+        self.assertEqual(view_counter.pending(first.pk), 0)
+
+    def test_missing_post_view_is_not_counted(self):
+        """Просмотр несуществующей записи не учитывается."""
+        self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 100500}))
+        self.assertEqual(view_counter.flush(), 0)
+
+    def test_internal_renders_are_not_counted(self):
+        """Публикация страниц и прогрев не считаются просмотрами."""
+        post = ViewCounterTests.posts[0]
+        with self.settings(PRERENDER_ROOT=tempfile.mkdtemp(),
+                           WARMUP_URLS=[reverse(
+                               'posts:post_detail', args=[post.pk])]):
+            self.addCleanup(shutil.rmtree, settings.PRERENDER_ROOT)
+            publishing.publish_post(post.pk)
+            warmup.warm_requests(_get_handler())
+        self.assertEqual(view_counter.pending(post.pk), 0)
+
+    def test_buffer_is_flushed_when_full(self):
+        """Переполненный буфер сбрасывается без ожидания интервала."""
+        with self.settings(VIEW_COUNTER_MAX_PENDING=2):
+            for post in ViewCounterTests.posts[:2]:
+                self.guest_client.get(reverse(
+                    'posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertEqual(
+            [post.views for post in Post.objects.order_by('pk')][:2],
+            [1, 1])
+
+    def test_feed_shows_views_without_extra_queries(self):
+        """Лента показывает просмотры без запроса на каждую запись."""
+        Post.objects.filter(pk=ViewCounterTests.posts[0].pk).update(views=42)
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Просмотров: 42')
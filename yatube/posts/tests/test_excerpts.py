@@ -0,0 +1,73 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.markup import EXCERPT_LENGTH
+from posts.models import Post
+
+from core import bus
+
+User = get_user_model()
+
+
+@override_settings(STREAMING_PAGES=False)
+class ExcerptsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author_user = User.objects.create_user(username='author_user')
+        cls.long_text = 'длинный ' * 2000
+        cls.post = Post.objects.create(author=cls.author_user,
+                                       text=cls.long_text)
+
+    def test_cards_do_not_load_full_text(self):
+        """Ленты читают выжимку, не выбирая полный текст из базы."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={
+                'username': ExcerptsTests.author_user.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                selects = [query['sql'] for query in queries
+                           if 'FROM "posts_post"' in query['sql']
+                           and 'COUNT(' not in query['sql']]
+                self.assertTrue(selects)
+                for sql in selects:
+                    self.assertNotIn('"posts_post"."text"', sql)
+                self.assertNotContains(response, ExcerptsTests.long_text)
+                self.assertLess(len(response.content),
+                                len(ExcerptsTests.long_text))
+
+    def test_post_page_shows_full_text(self):
+        """Полный текст есть только на странице записи."""
+        response = self.client.get(reverse(
+            'posts:post_detail',
+            kwargs={'post_id': ExcerptsTests.post.pk}))
+        self.assertContains(response, ExcerptsTests.long_text.strip())
+
+    def test_backfill_fills_empty_excerpts(self):
+        """Команда заполняет пустые выжимки из сохранённого HTML."""
+        Post.objects.update(excerpt='')
+        Post.objects.bulk_create([Post(author=ExcerptsTests.author_user,
+                                       text='*Без* разметки')])
+        call_command('backfill_excerpts', batch_size=1, stdout=StringIO())
+        self.assertEqual(
+            set(Post.objects.values_list('excerpt', flat=True)),
+            {'Без разметки',
+             ExcerptsTests.long_text[:EXCERPT_LENGTH - 1].rsplit(
+                 ' ', 1)[0] + '…'})
+
+    def test_backfill_notifies_other_processes(self):
+        """Другие процессы сбрасывают ленты и страницы после команды."""
+        Post.objects.update(excerpt='')
+        with mock.patch.object(bus, 'publish') as publish:
+            call_command('backfill_excerpts', stdout=StringIO())
+        publish.assert_called_once_with('bulk')
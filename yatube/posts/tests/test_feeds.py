@@ -0,0 +1,145 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Group, Post
+
+from core import bus
+
+User = get_user_model()
+
+
+class FeedsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author_user = User.objects.create_user(username='author_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Другое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author_user,
+            group=cls.group,
+            text='Тестовый текст!!!',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.feeds = [
+            reverse('posts:index_rss'),
+            reverse('posts:index_atom'),
+            reverse('posts:group_rss',
+                    kwargs={'slug': FeedsTests.group.slug}),
+            reverse('posts:group_atom',
+                    kwargs={'slug': FeedsTests.group.slug}),
+            reverse('posts:profile_rss',
+                    kwargs={'username': FeedsTests.author_user.username}),
+            reverse('posts:profile_atom',
+                    kwargs={'username': FeedsTests.author_user.username}),
+        ]
+
+    def test_feeds_contain_post(self):
+        """Ленты доступны и содержат запись."""
+        for url in self.feeds:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(FeedsTests.post.text,
+                              response.content.decode())
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_unknown_feed_object_returns_404(self):
+        """Лента несуществующей группы или автора отвечает 404."""
+        for url in (reverse('posts:group_rss', kwargs={'slug': 'no_slug'}),
+                    reverse('posts:profile_atom',
+                            kwargs={'username': 'no_user'})):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
+
+    def test_repeated_poll_is_served_without_database(self):
+        """Повторный опрос ленты не обращается к базе."""
+        for url in self.feeds:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_conditional_poll_returns_not_modified(self):
+        """Опрос с совпадающим ETag или датой отвечает 304."""
+        for url in self.feeds:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                by_etag = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                by_date = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(by_etag.status_code, 304)
+                self.assertEqual(by_date.status_code, 304)
+
+    def test_new_post_invalidates_its_feeds(self):
+        """Новая запись сбрасывает ленты, в которые она попадает."""
+        other_feed = reverse('posts:group_rss',
+                             kwargs={'slug': FeedsTests.other_group.slug})
+        for url in self.feeds + [other_feed]:
+            self.guest_client.get(url)
+        Post.objects.create(
+            author=FeedsTests.author_user,
+            group=FeedsTests.group,
+            text='Свежая запись в ленте',
+        )
+        for url in self.feeds:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('Свежая запись в ленте',
+                              response.content.decode())
+        with self.assertNumQueries(0):
+            self.guest_client.get(other_feed)
+
+    def test_moving_post_invalidates_old_group_feed(self):
+        """Перенос записи в другую группу сбрасывает ленту старой."""
+        post = Post.objects.create(
+            author=FeedsTests.author_user,
+            group=FeedsTests.other_group,
+            text='Запись для переноса',
+        )
+        url = reverse('posts:group_atom',
+                      kwargs={'slug': FeedsTests.other_group.slug})
+        self.assertIn(post.text, self.guest_client.get(url).content.decode())
+        post.group = FeedsTests.group
+        post.save()
+        self.assertNotIn(post.text,
+                         self.guest_client.get(url).content.decode())
+
+    def test_bulk_event_invalidates_feeds(self):
+        """Событие массового изменения из другого процесса сбрасывает
+        ленты: команды меняют записи без сигналов.
+        """
+        for url in self.feeds:
+            self.guest_client.get(url)
+        Post.objects.filter(pk=FeedsTests.post.pk).update(
+            text_html='<p>Перерисованный текст</p>')
+        bus._dispatch(bus.Event(1, 'bulk', '', json.dumps(
+            {'feeds': [['index', '']]}), 'other:1'))
+        self.assertIn('Перерисованный текст',
+                      self.guest_client.get(self.feeds[0]).content.decode())
+        self.assertNotIn('Перерисованный текст',
+                         self.guest_client.get(self.feeds[2]).content.decode())
+        bus._dispatch(bus.Event(2, 'bulk', '', '', 'other:1'))
+        for url in self.feeds:
+            with self.subTest(url=url):
+                self.assertIn('Перерисованный текст',
+                              self.guest_client.get(url).content.decode())
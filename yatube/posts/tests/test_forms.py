@@ -1,4 +1,7 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.db.models import F
 from django.test import Client, TestCase
 from django.urls import reverse
 from posts.models import Group, Post
@@ -111,6 +114,25 @@ class FormsTest(TestCase):
         self.assertEqual(FormsTest.post.text, context['text'])
         self.assertEqual(FormsTest.post.group, None)
 
+    def test_post_edit_keeps_counters(self):
+        """Правка не затирает счётчики, выросшие после чтения записи."""
+        post = FormsTest.post
+
+        def bump_counters(posts):
+            Post.objects.filter(pk=post.pk).update(
+                views=F('views') + 3, likes_count=F('likes_count') + 2,
+                comments_count=F('comments_count') + 1)
+            return posts
+
+        with mock.patch('posts.views.rehydrate', side_effect=bump_counters):
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.id}),
+                data={'text': 'Правка во время просмотров', 'group': ''})
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка во время просмотров')
+        self.assertEqual(
+            (post.views, post.likes_count, post.comments_count), (3, 2, 1))
+
     def test_guest_post_edit_form(self):
         context = {
             'text': 'Тестовый текст отредактирован без группы',
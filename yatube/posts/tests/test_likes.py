@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from core.shell import VERSION_KEY
+from posts.likes import fold_like_shards
+from posts.models import Like, LikeCounterShard, Post
+
+User = get_user_model()
+
+
+@override_settings(STREAMING_PAGES=False)
+class LikesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author_user = User.objects.create_user(username='author_user')
+        Post.objects.bulk_create(
+            Post(author=cls.author_user, text=f'Текст {i}')
+            for i in range(5))
+        cls.posts = list(Post.objects.order_by('pk'))
+        cls.post = cls.posts[0]
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(LikesTests.author_user)
+
+    def like_url(self, post, name='posts:post_like'):
+        return reverse(name, kwargs={'post_id': post.pk})
+
+    def test_like_and_unlike_are_idempotent(self):
+        """Повторная отметка и повторное снятие ничего не меняют."""
+        for _ in range(2):
+            response = self.authorized_client.post(
+                self.like_url(LikesTests.post))
+        self.assertRedirects(response, reverse(
+            'posts:post_detail', kwargs={'post_id': LikesTests.post.pk}))
+        self.assertEqual(Like.objects.count(), 1)
+        fold_like_shards()
+        LikesTests.post.refresh_from_db()
+        self.assertEqual(LikesTests.post.likes_count, 1)
+        for _ in range(2):
+            self.authorized_client.post(
+                self.like_url(LikesTests.post, 'posts:post_unlike'))
+        fold_like_shards()
+        LikesTests.post.refresh_from_db()
+        self.assertEqual(Like.objects.count(), 0)
+        self.assertEqual(LikesTests.post.likes_count, 0)
+
+    def test_shards_are_folded_into_post_counter(self):
+        """Приращения копятся в шардах и переносятся в счётчик записи."""
+        for i in range(6):
+            client = Client()
+            client.force_login(User.objects.create_user(username=f'fan{i}'))
+            client.post(self.like_url(LikesTests.post),
+                        {'next': reverse('posts:index')})
+        LikesTests.post.refresh_from_db()
+        self.assertEqual(LikesTests.post.likes_count, 0)
+        self.assertEqual(sum(LikeCounterShard.objects.values_list(
+            'delta', flat=True)), 6)
+        self.assertEqual(fold_like_shards(), 1)
+        LikesTests.post.refresh_from_db()
+        self.assertEqual(LikesTests.post.likes_count, 6)
+        self.assertFalse(LikeCounterShard.objects.exclude(delta=0).exists())
+
+    @override_settings(CACHES={
+        **settings.CACHES,
+        'pages': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                  'LOCATION': 'test-likes-pages'},
+    })
+    def test_fold_invalidates_page_shells(self):
+        """Свёртка сбрасывает кеш страниц, отметка — нет."""
+        pages = caches['pages']
+        pages.set(VERSION_KEY, 1, None)
+        self.authorized_client.post(self.like_url(LikesTests.post))
+        self.assertEqual(pages.get(VERSION_KEY), 1)
+        LikesTests.post.refresh_from_db()
+        self.assertEqual(LikesTests.post.likes_count, 0)
+        fold_like_shards()
+        self.assertEqual(pages.get(VERSION_KEY), 2)
+
+    def test_feed_resolves_liked_state_in_one_query(self):
+        """Отметки пользователя для всей страницы ленты — один запрос."""
+        for post in LikesTests.posts[:2]:
+            self.authorized_client.post(self.like_url(post))
+        # Сессия, пользователь, число записей, страница, отметки
+        with self.assertNumQueries(5):
+            response = self.authorized_client.get(reverse('posts:index'))
+        content = response.content.decode()
+        self.assertEqual(content.count(reverse('posts:post_unlike', kwargs={
+            'post_id': LikesTests.posts[0].pk})), 1)
+        self.assertEqual(content.count('/unlike/'), 2)
+        self.assertEqual(content.count('/like/'), 3)
+
+    def test_guest_cannot_like(self):
+        """Гость перенаправляется на вход, отметка не ставится."""
+        response = Client().post(self.like_url(LikesTests.post))
+        self.assertRedirects(response, reverse('users:login') + '?next='
+                             + self.like_url(LikesTests.post))
+        self.assertEqual(Like.objects.count(), 0)
+
+    def test_like_missing_post_returns_404(self):
+        """Отметка несуществующей записи отвечает 404."""
+        response = self.authorized_client.post(
+            reverse('posts:post_like', kwargs={'post_id': 100500}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,168 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import Http404
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import bus
+from posts.forms import PostForm
+from posts.lookups import (forget_group_choices, get_post_or_404, groups,
+                           missing_posts, rebuild_filters, users)
+from posts.models import Group, Post
+
+User = get_user_model()
+
+LOOKUP_CACHES = {
+    **settings.CACHES,
+    'lookups': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-lookups',
+    },
+}
+
+
+@override_settings(CACHES=LOOKUP_CACHES, LOOKUP_CACHE='lookups')
+class LookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(
+            title='Юмор', slug='humor', description='Тестовое описание')
+        cls.user = User.objects.create_user(username='author')
+
+    def setUp(self):
+        caches['lookups'].clear()
+        groups.clear_local()
+        users.clear_local()
+        forget_group_choices()
+
+    def test_read_through(self):
+        """Повторный поиск не ходит в базу, даже из нового процесса."""
+        with self.assertNumQueries(1):
+            self.assertEqual(groups.get('humor'), self.group)
+            self.assertEqual(groups.get('humor'), self.group)
+        groups.clear_local()
+        with self.assertNumQueries(0):
+            self.assertEqual(groups.get('humor'), self.group)
+
+    def test_users_are_cached_slim(self):
+        """В кеш попадают ключ, username и имя, но не пароль и почта."""
+        User.objects.filter(username='author').update(first_name='Лев')
+        users.get('author')
+        for user in (caches['lookups'].get(users.cache_key('author')),
+                     users.get('author')):
+            self.assertEqual(user.get_full_name(), 'Лев')
+            self.assertNotIn('password', user.__dict__)
+            self.assertNotIn('email', user.__dict__)
+
+    def test_missing(self):
+        self.assertIsNone(users.get('nobody'))
+        response = self.client.get('/profile/nobody/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_slug_change(self):
+        """После смены slug группа не находится по старому."""
+        groups.get('humor')
+        self.group.slug = 'jokes'
+        self.group.save()
+        self.assertIsNone(groups.get('humor'))
+        self.assertEqual(groups.get('jokes').pk, self.group.pk)
+
+    def test_user_delete(self):
+        users.get('author')
+        self.user.delete()
+        self.assertIsNone(users.get('author'))
+
+    def test_login_keeps_cache(self):
+        """Вход обновляет только last_login и кеш не сбрасывает."""
+        users.get('author')
+        self.client.force_login(self.user)
+        with self.assertNumQueries(0):
+            users.get('author')
+
+    def test_bus_event_clears_local(self):
+        """Запись в другом процессе сбрасывает LRU по шине."""
+        groups.get('humor')
+        caches['lookups'].clear()
+        Group.objects.filter(pk=self.group.pk).update(title='Авто')
+        bus._dispatch(bus.Event(1, 'group', str(self.group.pk),
+                                '{"slug": "humor"}', 'other'))
+        self.assertEqual(groups.get('humor').title, 'Авто')
+
+    def test_group_choices(self):
+        """Список групп формы строится один раз до записи группы."""
+        with self.assertNumQueries(1):
+            PostForm().as_p()
+            PostForm().as_p()
+        Group.objects.create(title='Авто', slug='auto')
+        choices = [label for _, label in PostForm().fields['group'].choices]
+        self.assertEqual(choices, ['---------', 'Юмор', 'Авто'])
+
+
+@override_settings(CACHES=LOOKUP_CACHES, LOOKUP_CACHE='lookups')
+class MissingLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+
+    def setUp(self):
+        caches['lookups'].clear()
+        groups.clear_local()
+        rebuild_filters()
+
+    def test_known_miss_skips_database(self):
+        """Повторный 404 по несуществующему адресу не ходит в базу."""
+        url = reverse('posts:post_detail', args=[self.post.pk + 100])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertIsNone(groups.get('ghosts'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 404)
+            self.assertIsNone(groups.get('ghosts'))
+
+    def test_requests_do_not_build_filters(self):
+        """Запрос не строит фильтр: пока его нет, промах идёт в базу."""
+        for missing in (groups.missing, missing_posts):
+            missing.bloom = None
+        self.assertIsNone(groups.get('ghosts'))
+        with self.assertNumQueries(1):
+            self.assertIsNone(groups.get('ghosts'))
+        self.assertIsNone(groups.missing.bloom)
+
+    def test_created_after_miss(self):
+        """Созданный после промаха объект сразу находится."""
+        post_id = self.post.pk + 1
+        self.assertRaises(Http404, get_post_or_404, post_id)
+        self.assertIsNone(groups.get('cats'))
+        post = Post.objects.create(text='Новый', author=self.user)
+        group = Group.objects.create(title='Животные', slug='cats')
+        self.assertEqual(post.pk, post_id)
+        self.assertEqual(get_post_or_404(post_id), post)
+        self.assertEqual(groups.get('cats'), group)
+
+    def test_created_in_other_process(self):
+        """Промах не действует, если объект пришёл по шине."""
+        self.assertIsNone(groups.get('cats'))
+        self.assertIsNone(groups.get('cats'))
+        # Другой процесс: кеш промахов он не трогал
+        Group.objects.bulk_create([Group(title='Животные', slug='cats')])
+        self.assertIsNone(groups.get('cats'))
+        bus._dispatch(bus.Event(1, 'group', '100', '{"slug": "cats"}',
+                                'other'))
+        self.assertEqual(groups.get('cats').slug, 'cats')
+
+    def test_filter_rebuild(self):
+        """Перестроенный фильтр знает о созданном во время постройки."""
+        missing = groups.missing
+        order_by = Group.objects.order_by
+
+        def created_meanwhile(*args):
+            missing.add('late')
+            return order_by(*args)
+
+        with mock.patch.object(Group.objects, 'order_by',
+                               created_meanwhile):
+            missing.rebuild()
+        self.assertIn('late', missing.bloom)
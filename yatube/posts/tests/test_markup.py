@@ -0,0 +1,84 @@
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.timezone import now
+from posts.archive import archive_posts
+from posts.markup import EXCERPT_LENGTH
+from posts.models import ArchivedPost, Post
+
+User = get_user_model()
+
+
+class MarkupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author_user = User.objects.create_user(username='author_user')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(MarkupTests.author_user)
+
+    def test_form_save_renders_sanitized_html(self):
+        """HTML и выжимка считаются при сохранении, скрипты вырезаются."""
+        self.authorized_client.post(reverse('posts:post_create'), {
+            'text': '**Жирный** текст <script>alert(1)</script>'})
+        post = Post.objects.get()
+        self.assertIn('<strong>Жирный</strong>', post.text_html)
+        self.assertNotIn('<script>', post.text_html)
+        self.assertEqual(post.excerpt, 'Жирный текст alert(1)')
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, '<strong>Жирный</strong>')
+        response = self.client.get(reverse('posts:index_rss'))
+        self.assertContains(response, '&lt;strong&gt;Жирный')
+
+    def test_excerpt_is_bounded(self):
+        """Выжимка не длиннее EXCERPT_LENGTH и режется по слову."""
+        post = Post.objects.create(author=MarkupTests.author_user,
+                                   text='слово ' * 200)
+        self.assertLessEqual(len(post.excerpt), EXCERPT_LENGTH)
+        self.assertTrue(post.excerpt.endswith('слово…'))
+
+    def test_render_command_fills_hot_and_archived_posts(self):
+        """Команда рендерит в пуле процессов и горячие, и архивные."""
+        Post.objects.bulk_create(
+            Post(author=MarkupTests.author_user, text=f'*Запись* {i}')
+            for i in range(5))
+        Post.objects.filter(pk__in=Post.objects.order_by('pk').values(
+            'pk')[:2]).update(pub_date=now() - timedelta(days=400))
+        archive_posts(now() - timedelta(days=365))
+        call_command('render_posts', missing=True, workers=2,
+                     batch_size=2, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(excerpt='').exists())
+        self.assertFalse(Post.objects.filter(
+            archived=False, text_html='').exists())
+        self.assertEqual(ArchivedPost.objects.filter(
+            text_html__startswith='<p><em>Запись</em>').count(), 2)
+
+    def test_migration_renders_existing_posts(self):
+        """Миграция Markdown заполняет HTML и выжимки старых записей."""
+        for i in range(3):
+            Post.objects.create(author=MarkupTests.author_user,
+                                text=f'*Старая* запись {i}')
+        Post.objects.filter(pk=Post.objects.order_by('pk').first().pk).update(
+            pub_date=now() - timedelta(days=400))
+        archive_posts(now() - timedelta(days=365))
+        # Как до миграции: ни HTML, ни выжимок
+        Post.objects.update(text_html='', excerpt='')
+        ArchivedPost.objects.update(text_html='')
+        migration = import_module('posts.migrations.0008_markdown')
+        with mock.patch.object(migration, 'BATCH_SIZE', 2):
+            migration.render_existing(apps, None)
+        self.assertFalse(Post.objects.filter(excerpt='').exists())
+        self.assertEqual(Post.objects.filter(
+            text_html__startswith='<p><em>Старая</em>').count(), 2)
+        self.assertTrue(ArchivedPost.objects.get().text_html.startswith(
+            '<p><em>Старая</em>'))
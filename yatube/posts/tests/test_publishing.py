@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from posts import publishing
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PublishingTests(TransactionTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.settings = override_settings(
+            PRERENDER_ROOT=self.root,
+            PRERENDER_PAGES=2,
+            PRERENDER_ON_WRITE=True,
+        )
+        self.settings.enable()
+        self.author_user = User.objects.create_user(username='author_user')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Другое описание',
+        )
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def read(self, url, page=None):
+        with open(publishing.output_path(url, page)) as page_file:
+            return page_file.read()
+
+    def exists(self, url, page=None):
+        return os.path.exists(publishing.output_path(url, page))
+
+    def test_full_rebuild_publishes_anonymous_pages(self):
+        """Полная публикация создаёт анонимные версии всех страниц."""
+        posts = Post.objects.bulk_create(
+            Post(author=self.author_user, group=self.group,
+                 text=f'Текст {i}') for i in range(13))
+        publishing.publish_all()
+        group_url = reverse('posts:group_list',
+                            kwargs={'slug': self.group.slug})
+        for url in (reverse('posts:index'), group_url,
+                    reverse('about:author'), reverse('about:tech')):
+            with self.subTest(url=url):
+                self.assertIn('Войти', self.read(url))
+        self.assertTrue(self.exists(group_url, 2))
+        self.assertFalse(self.exists(group_url, 3))
+        for post in Post.objects.all():
+            url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+            self.assertIn(post.text, self.read(url))
+        self.assertEqual(len(posts), Post.objects.count())
+
+    def test_post_writes_republish_affected_pages(self):
+        """Запись поста перепубликует только затронутые страницы."""
+        index_url = reverse('posts:index')
+        group_url = reverse('posts:group_list',
+                            kwargs={'slug': self.group.slug})
+        other_url = reverse('posts:group_list',
+                            kwargs={'slug': self.other_group.slug})
+        post = Post.objects.create(author=self.author_user,
+                                   group=self.group, text='Первая запись')
+        post_url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        self.assertIn('Первая запись', self.read(index_url))
+        self.assertIn('Первая запись', self.read(group_url, 1))
+        self.assertIn('Первая запись', self.read(post_url))
+        self.assertNotIn('Первая запись', self.read(other_url))
+
+        post.text = 'Исправленная запись'
+        post.group = self.other_group
+        post.save()
+        self.assertIn('Исправленная запись', self.read(post_url))
+        self.assertIn('Исправленная запись', self.read(other_url))
+        self.assertNotIn('Исправленная запись', self.read(group_url))
+
+        post.delete()
+        self.assertFalse(self.exists(post_url))
+        self.assertNotIn('Исправленная запись', self.read(index_url))
+        self.assertNotIn('Исправленная запись', self.read(other_url))
+
+    def test_archived_posts_add_no_pages(self):
+        """Архивные заглушки не дают лишних страниц лент."""
+        Post.objects.bulk_create(
+            Post(author=self.author_user, group=self.group,
+                 text=f'Текст {i}', archived=i >= 5) for i in range(15))
+        publishing.publish_all()
+        group_url = reverse('posts:group_list',
+                            kwargs={'slug': self.group.slug})
+        for url in (reverse('posts:index'), group_url):
+            with self.subTest(url=url):
+                self.assertTrue(self.exists(url, 1))
+                self.assertFalse(self.exists(url, 2))
+
+    def test_publishing_with_production_settings(self):
+        """Публикация работает с боевыми настройками: ленты потоком,
+        общие кеши страниц и поиска, опрос шины.
+        """
+        shared = {'BACKEND': 'core.shmcache.SharedMemoryCache',
+                  'OPTIONS': {'SLOTS': 256, 'SLOT_SIZE': 64 * 1024}}
+        production = override_settings(
+            STREAMING_PAGES=True,
+            CACHES={
+                **settings.CACHES,
+                'pages': dict(shared,
+                              LOCATION=os.path.join(self.root, '.pages')),
+                'lookups': dict(shared,
+                                LOCATION=os.path.join(self.root, '.lookups')),
+            },
+            LOOKUP_CACHE='lookups',
+            INVALIDATION_BUS_POLL_INTERVAL=0,
+        )
+        index_url = reverse('posts:index')
+        group_url = reverse('posts:group_list',
+                            kwargs={'slug': self.group.slug})
+        with production:
+            response = self.client.get(index_url)
+            self.assertTrue(response.streaming)
+            b''.join(response.streaming_content)
+            post = Post.objects.create(author=self.author_user,
+                                       group=self.group, text='Первая запись')
+            publishing.publish_all()
+            for url in (index_url, group_url):
+                with self.subTest(url=url):
+                    self.assertIn('Первая запись', self.read(url))
+            post.text = 'Исправленная запись'
+            post.save()
+            self.assertIn('Исправленная запись', self.read(index_url))
+            self.assertIn('Исправленная запись', self.read(group_url, 1))
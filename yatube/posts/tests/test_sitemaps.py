@@ -0,0 +1,118 @@
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Group, Post
+from posts.sitemaps import build_sitemaps
+
+User = get_user_model()
+
+
+@mock.patch('posts.sitemaps.SHARD_SIZE', 3)
+class SitemapsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author_user = User.objects.create_user(username='author_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [Post.objects.create(author=cls.author_user,
+                                         group=cls.group,
+                                         text=f'Текст {i}')
+                     for i in range(5)]
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.settings = override_settings(SITEMAP_ROOT=self.root,
+                                          SITE_URL='http://testserver')
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def post_shards(self, posts):
+        return {f'sitemap-posts-{(post.pk - 1) // 3}.xml' for post in posts}
+
+    def read(self, name):
+        with open(os.path.join(self.root, name)) as sitemap:
+            return sitemap.read()
+
+    def test_index_lists_all_shards(self):
+        """Индекс ссылается на все шарды, шарды содержат все адреса."""
+        rebuilt = build_sitemaps()
+        self.assertGreater(len(self.post_shards(SitemapsTests.posts)), 1)
+        self.assertTrue(
+            self.post_shards(SitemapsTests.posts).issubset(rebuilt))
+        self.assertTrue(any(name.startswith('sitemap-groups-')
+                            for name in rebuilt))
+        self.assertTrue(any(name.startswith('sitemap-profiles-')
+                            for name in rebuilt))
+        index = self.read('sitemap.xml')
+        content = ''.join(self.read(name) for name in rebuilt)
+        for name in rebuilt:
+            self.assertIn(reverse('posts:sitemap_file',
+                                  kwargs={'name': name}), index)
+        for post in SitemapsTests.posts:
+            self.assertIn('http://testserver' + reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}), content)
+        self.assertIn(reverse('posts:group_list',
+                              kwargs={'slug': SitemapsTests.group.slug}),
+                      content)
+        self.assertIn(reverse('posts:profile', kwargs={
+            'username': SitemapsTests.author_user.username}), content)
+
+    def test_unchanged_shards_are_not_rebuilt(self):
+        """Повторная сборка трогает только изменившиеся шарды."""
+        build_sitemaps()
+        self.assertEqual(build_sitemaps(), [])
+        post = Post.objects.create(author=SitemapsTests.author_user,
+                                   text='Новая запись')
+        shard, = self.post_shards([post])
+        self.assertEqual(build_sitemaps(), [shard])
+        self.assertIn(reverse('posts:post_detail',
+                              kwargs={'post_id': post.pk}),
+                      self.read(shard))
+        author = User.objects.get(pk=SitemapsTests.author_user.pk)
+        author.username = 'renamed_user'
+        author.save()
+        rebuilt = build_sitemaps()
+        self.assertEqual(len(rebuilt), 1)
+        self.assertTrue(rebuilt[0].startswith('sitemap-profiles-'))
+        self.assertIn('renamed_user', self.read(rebuilt[0]))
+
+    def test_emptied_shard_is_removed(self):
+        """Опустевший шард удаляется и пропадает из индекса."""
+        build_sitemaps()
+        last = SitemapsTests.posts[-1]
+        shard, = self.post_shards([last])
+        Post.objects.filter(
+            pk__in=[post.pk for post in SitemapsTests.posts
+                    if self.post_shards([post]) == {shard}]).delete()
+        build_sitemaps()
+        self.assertFalse(os.path.exists(os.path.join(self.root, shard)))
+        self.assertNotIn(shard, self.read('sitemap.xml'))
+
+    def test_files_are_served_precompressed(self):
+        """Клиенту с поддержкой gzip отдаётся готовый .gz-файл."""
+        build_sitemaps()
+        client = Client()
+        response = client.get(reverse('posts:sitemap'),
+                              HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)).decode(),
+            self.read('sitemap.xml'))
+        response = client.get(reverse('posts:sitemap'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        missing = client.get(reverse('posts:sitemap_file',
+                                     kwargs={'name': 'sitemap-posts-99.xml'}))
+        self.assertEqual(missing.status_code, 404)
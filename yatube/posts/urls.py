@@ -1,7 +1,7 @@
 # post/urls.py
-from django.urls import path
+from django.urls import path, re_path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
@@ -18,4 +18,26 @@ urlpatterns = [
     path('create/', views.post_create, name='post_create'),
     # Редактирование поста
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    # Комментарии
+    path('posts/<int:post_id>/comment/', views.add_comment,
+         name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.comments, name='comments'),
+    # Отметки «нравится»
+    path('posts/<int:post_id>/like/', views.post_like, name='post_like'),
+    path('posts/<int:post_id>/unlike/', views.post_unlike,
+         name='post_unlike'),
+    # Ленты RSS и Atom
+    path('rss/', feeds.index_rss, name='index_rss'),
+    path('atom/', feeds.index_atom, name='index_atom'),
+    path('group/<slug:slug>/rss/', feeds.group_rss, name='group_rss'),
+    path('group/<slug:slug>/atom/', feeds.group_atom, name='group_atom'),
+    path('profile/<str:username>/rss/', feeds.profile_rss,
+         name='profile_rss'),
+    path('profile/<str:username>/atom/', feeds.profile_atom,
+         name='profile_atom'),
+    # Карта сайта: индекс и шарды
+    path('sitemap.xml', views.sitemap_file, {'name': 'sitemap.xml'},
+         name='sitemap'),
+    re_path(r'^(?P<name>sitemap-[a-z]+-\d+\.xml)$', views.sitemap_file,
+            name='sitemap_file'),
 ]
@@ -1,15 +1,54 @@
+import os
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import patch_vary_headers
+from django.utils.http import is_safe_url
+from django.views.decorators.http import require_POST
+
+from core.shell import cache_page_shell, expect_holes
+from core.streaming import render_stream
+
+from .archive import hot_posts, rehydrate, restore
+from .comments import comments_page, create_comment, is_valid_cursor
+from .counters import counts_views
+from .forms import CommentForm, PostForm
+from .likes import like, unlike
+from .lookups import get_post_or_404, groups, users
+from .models import Comment, Post
+
+# Количество записей на странице ленты
+POSTS_PER_PAGE = 10
+# Карточки лент показывают выжимку, полный текст нужен только на
+# странице записи
+CARD_DEFERRED = ('text', 'text_html')
 
-from .forms import PostForm
-from .models import Group, Post, User
 
+def render_feed(request, template, context):
+    """Страница ленты: потоком, если включено STREAMING_PAGES.
 
+    Внутренние запросы (публикация, прогрев) получают страницу целиком:
+    публикации нужно готовое тело для файла.
+    """
+    if (settings.STREAMING_PAGES
+            and not request.META.get(settings.INTERNAL_REQUEST_ENVIRON_KEY)):
+        # Отметки всех записей страницы — одним запросом при первой
+        # карточке, когда записи страницы уже прочитаны
+        page_obj = context['page_obj']
+        expect_holes(request, 'like', lambda: [post.pk for post in page_obj])
+        return render_stream(request, template, context)
+    return render(request, template, context)
+
+
+@cache_page_shell
 def index(request):
-    post_list = Post.objects.all()
-    # Показывать по 10 записей на странице.
-    paginator = Paginator(post_list, 10)
+    post_list = hot_posts().select_related('author', 'group').defer(
+        *CARD_DEFERRED)
+    # Показывать по POSTS_PER_PAGE записей на странице.
+    paginator = Paginator(post_list, POSTS_PER_PAGE)
     # Из URL извлекаем номер запрошенной страницы - это значение параметра page
     page_number = request.GET.get('page')
     # Получаем набор записей для страницы с запрошенным номером
@@ -23,13 +62,16 @@ def index(request):
         'h1_text': h1_text,
         'page_obj': page_obj,
     }
-    return render(request, template, context)
+    return render_feed(request, template, context)
 
 
+@cache_page_shell
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.filter(group=group).all()
-    paginator = Paginator(post_list, 10)
+    group = groups.get_or_404(slug)
+    # Как на главной, только горячие записи; архивные — в профиле
+    post_list = group.posts.filter(archived=False).select_related(
+        'author', 'group').defer(*CARD_DEFERRED)
+    paginator = Paginator(post_list, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     template = 'posts/group_list.html'
@@ -43,15 +85,18 @@ def group_posts(request, slug):
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, template, context)
+    return render_feed(request, template, context)
 
 
+@cache_page_shell
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    post_list = user.posts.filter(author=user).all()
-    paginator = Paginator(post_list, 10)
+    user = users.get_or_404(username)
+    post_list = user.posts.select_related('author', 'group').defer(
+        *CARD_DEFERRED)
+    paginator = Paginator(post_list, POSTS_PER_PAGE)
     pages_amount = paginator.count
     page_number = request.GET.get('page')
+    # Архивные записи тоже листаются: их выжимка лежит в заглушке
     page_obj = paginator.get_page(page_number)
     template = 'posts/profile.html'
     context = {
@@ -59,18 +104,25 @@ def profile(request, username):
         'author': user,
         'pages_amount': pages_amount,
     }
-    return render(request, template, context)
+    return render_feed(request, template, context)
 
 
+@counts_views
+@cache_page_shell
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_post_or_404(post_id)
+    rehydrate([post])
     posts_amount = Post.objects.filter(author=post.author).count()
     template = 'posts/post_detail.html'
     title_text = post.text[:29]
+    comments, cursor = comments_page(post.pk)
     context = {
         'post': post,
         'posts_amount': posts_amount,
         'title_text': title_text,
+        'comments': comments,
+        'cursor': cursor,
+        'post_id': post.pk,
     }
     return render(request, template, context)
 
@@ -92,13 +144,105 @@ def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if request.user != post.author:
         return redirect('posts:post_detail', post_id=post_id)
+    rehydrate([post])
     form = PostForm(request.POST or None, instance=post)
     context = {'form': form,
                'is_edit': True,
                'post_id': post_id
                }
     if request.method == 'POST' and form.is_valid():
-        form.save()
+        post = form.save(commit=False)
+        # Только поля формы: просмотры, отметки и комментарии тем
+        # временем обновляются другими запросами
+        fields = PostForm.Meta.fields
+        if post.archived:
+            # Отредактированная запись снова горячая
+            restore(post, fields)
+        else:
+            post.save(update_fields=fields)
         return redirect('posts:post_detail', post_id=post_id)
 
     return render(request, 'posts/create_post.html', context)
+
+
+@login_required
+@require_POST
+def add_comment(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    form = CommentForm(request.POST)
+    if form.is_valid():
+        parent = None
+        parent_id = request.POST.get('parent', '')
+        if parent_id.isdigit():
+            parent = Comment.objects.filter(pk=parent_id, post=post).first()
+        create_comment(post, request.user, form.cleaned_data['text'], parent)
+    return redirect('posts:post_detail', post_id=post_id)
+
+
+def comments(request, post_id):
+    """Следующая страница комментариев после курсора ?after=.
+
+    С параметром ?root= отдаёт только поддерево этого комментария.
+    """
+    after = request.GET.get('after', '')
+    if after and not is_valid_cursor(after):
+        raise Http404('Неверный курсор')
+    root = None
+    root_id = request.GET.get('root', '')
+    if root_id:
+        if not root_id.isdigit():
+            raise Http404('Комментарий не найден')
+        root = get_object_or_404(Comment, pk=root_id, post_id=post_id)
+    page, cursor = comments_page(post_id, after, root)
+    context = {
+        'comments': page,
+        'cursor': cursor,
+        'post_id': post_id,
+        'root': root,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def _redirect_back(request, post_id):
+    next_url = request.POST.get('next')
+    if next_url and is_safe_url(next_url,
+                                allowed_hosts={request.get_host()},
+                                require_https=request.is_secure()):
+        return redirect(next_url)
+    return redirect('posts:post_detail', post_id=post_id)
+
+
+@login_required
+@require_POST
+def post_like(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404('Запись не найдена')
+    like(request.user, post_id)
+    return _redirect_back(request, post_id)
+
+
+@login_required
+@require_POST
+def post_unlike(request, post_id):
+    unlike(request.user, post_id)
+    return _redirect_back(request, post_id)
+
+
+def sitemap_file(request, name):
+    """Отдаёт собранный файл карты сайта, сжатый, если клиент это умеет.
+
+    В бою эти файлы раздаёт веб-сервер, view нужна для разработки.
+    """
+    path = os.path.join(settings.SITEMAP_ROOT, name)
+    encoding = None
+    if ('gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+            and os.path.exists(path + '.gz')):
+        path += '.gz'
+        encoding = 'gzip'
+    if not os.path.exists(path):
+        raise Http404('Карта сайта ещё не собрана')
+    response = FileResponse(open(path, 'rb'), content_type='application/xml')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -44,23 +45,45 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.admission.AdmissionControlMiddleware',
+    'core.middleware.bus.InvalidationBusMiddleware',
+    'core.middleware.profiling.ProfilingMiddleware',
+    'core.middleware.memory.MemoryTrackingMiddleware',
+    'core.middleware.compression.CompressionMiddleware',
+    'core.middleware.preload.PreloadMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Шаблоны HTML сжимаются при загрузке (core.loaders), скомпилированные
+# шаблоны кешируются, если не включена отладка
+TEMPLATE_LOADERS = [
+    ('core.loaders.MinifyingLoader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+# Шаблоны .html, которые не сжимаются: текст писем
+MINIFY_TEMPLATES_EXCLUDE = ['*_email.html']
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, запоминающий статику шаблонов для preload
+        'BACKEND': 'core.preload.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -82,10 +105,71 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение, открытое при прогреве, живёт между запросами
+        'CONN_MAX_AGE': 60,
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+# Каталог файлов кеша в разделяемой памяти (core.shmcache)
+SHARED_CACHE_DIR = os.environ.get(
+    'YATUBE_SHARED_CACHE_DIR',
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Готовые страницы в разделяемой памяти, одной на все процессы
+    # gunicorn
+    'pages': {
+        'BACKEND': 'core.shmcache.SharedMemoryCache',
+        'LOCATION': os.path.join(SHARED_CACHE_DIR, 'yatube-pages'),
+        'TIMEOUT': 60 * 10,
+        'OPTIONS': {'SLOTS': 2048, 'SLOT_SIZE': 64 * 1024},
+    },
+    # Вёдра ограничения частоты: общие для всех процессов машины
+    # (для нескольких машин нужен memcached или Redis)
+    'ratelimit': {
+        'BACKEND': 'core.shmcache.SharedMemoryCache',
+        'LOCATION': os.path.join(SHARED_CACHE_DIR, 'yatube-ratelimit'),
+        'OPTIONS': {'SLOTS': 8192, 'SLOT_SIZE': 256},
+    },
+    # Счётчики core.metrics, общие для всех процессов машины. Серий
+    # около тысячи (гистограммы памяти — 20 на view); слотов с запасом,
+    # чтобы вытеснение в корзине не обнуляло счётчики
+    'metrics': {
+        'BACKEND': 'core.shmcache.SharedMemoryCache',
+        'LOCATION': os.path.join(SHARED_CACHE_DIR, 'yatube-metrics'),
+        'TIMEOUT': None,
+        'OPTIONS': {'SLOTS': 8192, 'SLOT_SIZE': 256},
+    },
+    # Счётчики запросов в работе (core.middleware.admission), общие
+    # для всех процессов машины
+    'admission': {
+        'BACKEND': 'core.shmcache.SharedMemoryCache',
+        'LOCATION': os.path.join(SHARED_CACHE_DIR, 'yatube-admission'),
+        'OPTIONS': {'SLOTS': 256, 'SLOT_SIZE': 256},
+    },
+    # Группы и авторы по slug и username, см. posts.lookups
+    'lookups': {
+        'BACKEND': 'core.shmcache.SharedMemoryCache',
+        'LOCATION': os.path.join(SHARED_CACHE_DIR, 'yatube-lookups'),
+        'OPTIONS': {'SLOTS': 4096, 'SLOT_SIZE': 2048},
+    },
+}
+
+# Кеш поиска групп и авторов (posts.lookups), None — без кеша
+LOOKUP_CACHE = 'lookups'
+# Кеш, в котором cache_page_shell хранит тела страниц
+PAGE_SHELL_CACHE = 'pages'
+# Отдавать ленты потоком (core.streaming)
+STREAMING_PAGES = True
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -138,3 +222,125 @@ LOGOUT_REDIRECT_URL = ''
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+# Адрес сайта для абсолютных ссылок вне запроса (карта сайта)
+SITE_URL = 'http://127.0.0.1:8000'
+# Каталог, куда собирается карта сайта
+SITEMAP_ROOT = os.path.join(BASE_DIR, 'sitemaps')
+
+# Каталог статических копий страниц для анонимов
+PRERENDER_ROOT = os.path.join(BASE_DIR, 'prerendered')
+# Сколько первых страниц лент публиковать
+PRERENDER_PAGES = 3
+# Перепубликовывать затронутые страницы при записи поста
+PRERENDER_ON_WRITE = False
+
+# Как часто сбрасывать накопленные просмотры записей в базу, секунд
+VIEW_COUNTER_FLUSH_INTERVAL = 10
+# Сбрасывать раньше, если в буфере накопилось столько записей
+VIEW_COUNTER_MAX_PENDING = 1000
+# Ключ environ, которым помечены внутренние запросы (публикация страниц,
+# прогрев): их не считают просмотрами
+INTERNAL_REQUEST_ENVIRON_KEY = 'yatube.internal'
+
+# На сколько строк делить счётчик отметок одной записи
+LIKE_COUNTER_SHARDS = 8
+
+# Ограничение частоты запросов по имени адреса: 'число/период',
+# период — s, m, h или d. 'ip' — на адрес клиента, 'user' — на
+# вошедшего пользователя
+RATE_LIMIT_CACHE = 'ratelimit'
+RATE_LIMIT_METHODS = ('POST',)
+# Адреса или сети обратных прокси (nginx), которым можно верить
+# в X-Forwarded-For. Без них адрес клиента — REMOTE_ADDR
+TRUSTED_PROXIES = []
+RATE_LIMITS = {
+    'users:login': {'ip': '10/m'},
+    'users:signup': {'ip': '5/m'},
+    'users:password_reset_form': {'ip': '5/h'},
+    'users:password_reset_confirm': {'ip': '10/m'},
+    'users:password_change_form': {'user': '5/m'},
+    'posts:post_create': {'ip': '30/m', 'user': '10/m'},
+}
+
+# Сколько запросов к одной view все процессы обрабатывают
+# одновременно, None — без ограничения. Лишние сразу получают 503
+ADMISSION_MAX_IN_FLIGHT = 32
+# Отдельные лимиты по пути view, None — без лимита: проверка пароля
+# дорогая, а пробу готовности и метрики отсекать нельзя. Статику
+# отдаёт не Django
+ADMISSION_VIEW_LIMITS = {
+    'django.contrib.auth.views.LoginView': 4,
+    'users.views.SignUp': 4,
+    'django.contrib.auth.views.PasswordChangeView': 4,
+    'core.views.ready': None,
+    'core.views.metrics': None,
+}
+# Через сколько секунд повторить запрос после 503
+ADMISSION_RETRY_AFTER = 1
+# Кеш счётчиков запросов в работе и сколько секунд живёт счётчик
+ADMISSION_CACHE = 'admission'
+ADMISSION_COUNTER_TTL = 60
+
+# Адреса, которые рабочий процесс запрашивает у себя при прогреве
+WARMUP_URLS = ['/', '/about/author/', '/about/tech/']
+
+# Журнал шины инвалидации кешей между процессами, см. core.bus
+INVALIDATION_BUS_BACKEND = 'core.bus.DatabaseChangeLog'
+# Как часто процесс читает журнал, секунд. None — не читать
+INVALIDATION_BUS_POLL_INTERVAL = 1
+# Сколько ждать событие, пропущенное в журнале, прежде чем считать
+# его транзакцию откаченной
+INVALIDATION_BUS_GAP_TIMEOUT = 5
+
+# Ответы меньше этого размера в байтах не сжимаются
+COMPRESSION_MIN_SIZE = 200
+# Уровни сжатия по кодировкам: для первого тела и для повторного,
+# которое пережимается один раз и дальше отдаётся готовым
+COMPRESSION_LEVELS = {'br': 4, 'gzip': 6}
+COMPRESSION_CACHED_LEVELS = {'br': 9, 'gzip': 9}
+# Сколько байт сжатых тел процесс держит для повторной отдачи
+COMPRESSION_CACHE_SIZE = 8 * 2 ** 20
+
+# Кеш счётчиков core.metrics
+METRICS_CACHE = 'metrics'
+# С каких адресов доступны /metrics/ (и django-debug-toolbar)
+INTERNAL_IPS = ['127.0.0.1']
+
+# manage.py test: боевые настройки, файлы кешей во временном каталоге
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Статика, которую не нужно отдавать в Link: rel=preload: иконки
+# браузер грузит сам и не спеша, preload отнимал бы канал у стилей
+PRELOAD_IGNORE = ['img/fav/*']
+# Ключ environ, под которым сервер даёт функцию отправки 103 Early
+# Hints: send(headers). gunicorn с синхронными процессами её не даёт
+EARLY_HINTS_ENVIRON_KEY = 'wsgi.early_hints'
+
+# Каталог профилей запросов (core.profiling). None — профилирование
+# выключено
+PROFILING_DIR = os.environ.get('YATUBE_PROFILING_DIR')
+# Профилировать в среднем каждый N-й запрос; 0 — не выбирать случайно
+PROFILING_SAMPLE_RATE = 1000
+# Имена view, запросы к которым профилируются всегда
+PROFILING_VIEWS = []
+# Сохранять профиль любого запроса не короче стольких миллисекунд;
+# None — не профилировать все запросы ради медленных
+PROFILING_SLOW_MS = None
+# Как часто снимать стеки, секунд
+PROFILING_INTERVAL = 0.005
+
+# Учёт памяти запросов через tracemalloc (core.middleware.memory)
+MEMORY_TRACKING = bool(os.environ.get('YATUBE_MEMORY_TRACKING'))
+# Сколько кадров стека tracemalloc хранит на выделение
+MEMORY_TRACKING_FRAMES = 10
+# Раскладывать удержанное по местам выделения в среднем для каждого
+# N-го запроса; 0 — никогда
+MEMORY_SNAPSHOT_RATE = 100
+# Сколько мест выделения учитывать на запрос
+MEMORY_TOP_SITES = 5
+# Сколько серий memory_retained_site_bytes_total (view и место)
+# заводит процесс; остальные места копятся в site="other"
+MEMORY_SITE_SERIES_LIMIT = 200
+# Запрос, удержавший столько байт, пишется в лог
+MEMORY_RETAINED_THRESHOLD = 2 ** 20
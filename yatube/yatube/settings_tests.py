@@ -0,0 +1,22 @@
+"""Настройки прогона внешних тестов (pytest, см. pytest.ini).
+
+Боевые настройки с той же изоляцией, что у manage.py test
+(core.testing.TestRunner), но ленты рендерятся целиком: внешние тесты
+читают response.content и response.context.
+"""
+import atexit
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+from core.testing import ISOLATION, caches_in
+
+SHARED_CACHE_DIR = tempfile.mkdtemp(prefix='yatube-tests-')
+atexit.register(shutil.rmtree, SHARED_CACHE_DIR, ignore_errors=True)
+
+CACHES = caches_in(CACHES, SHARED_CACHE_DIR)  # noqa: F405
+# LOOKUP_CACHE, INVALIDATION_BUS_POLL_INTERVAL, VIEW_COUNTER_FLUSH_INTERVAL
+globals().update(ISOLATION)
+
+STREAMING_PAGES = False